@@ -0,0 +1,94 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of lookups of near-duplicate images in PerceptualIndex (requires NumPy and Pillow).
+
+The index is filled with random 64-bit hashes, then it's queried with stored hashes having
+a few bits flipped (hits) and with random hashes (misses). The numbers are to be compared with
+the round trip to a service (seconds at least).
+
+Usage: python benchmarks/phash_index.py [hashes] [queries]
+"""
+
+import pathlib
+import random
+import statistics
+import sys
+import time
+
+import numpy
+
+from multicaps.cache import PerceptualIndex, dhash, phash
+from multicaps._misc.phash import SIMILAR_MAX_DISTANCE
+
+IMAGE = (pathlib.Path(__file__).parent.parent / 'tests' / 'data' / 'image.jpg').read_bytes()
+
+
+def flip_bits(value, count, rnd):
+    """ Returns the value with the number of random bits flipped """
+    for bit in rnd.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def bench(index, queries):
+    """ Returns query times in microseconds and the number of queries with results """
+
+    times = []
+    found = 0
+    for query in queries:
+        start_time = time.perf_counter()
+        found += bool(index.query(query))
+        times.append((time.perf_counter() - start_time) * 1e6)
+    return times, found
+
+
+def report(name, times):
+    percentiles = statistics.quantiles(times, n=100)
+    print(f'{name:>24}: p50 {percentiles[49]:8.1f} us, p99 {percentiles[98]:8.1f} us')
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rnd = random.Random(1)
+
+    hashes = [rnd.getrandbits(64) for _ in range(size)]
+    index = PerceptualIndex()
+    start_time = time.perf_counter()
+    for number, image_hash in enumerate(hashes):
+        index.add(image_hash, str(number))
+    print(f'{"add":>24}: {(time.perf_counter() - start_time) / size * 1e6:8.1f} us/hash '
+          f'({size} hashes)')
+
+    hits = [flip_bits(rnd.choice(hashes), rnd.randint(0, SIMILAR_MAX_DISTANCE), rnd)
+            for _ in range(count)]
+    misses = [rnd.getrandbits(64) for _ in range(count)]
+    bench(index, hits[:100])  # warm up
+
+    times, found = bench(index, hits)
+    report(f'query (hit, d<={SIMILAR_MAX_DISTANCE})', times)
+    assert found == count, 'near-duplicates must be found'
+    times, found = bench(index, misses)
+    report('query (miss)', times)
+
+    # the full scan for reference
+    values = numpy.array(hashes, dtype=numpy.uint64)
+    times = []
+    for query in misses[:100]:
+        start_time = time.perf_counter()
+        numpy.flatnonzero(numpy.bitwise_count(values ^ numpy.uint64(query))
+                          <= SIMILAR_MAX_DISTANCE)
+        times.append((time.perf_counter() - start_time) * 1e6)
+    report('full scan (NumPy)', times)
+
+    for hash_function in (dhash, phash):
+        times = []
+        for _ in range(200):
+            start_time = time.perf_counter()
+            hash_function(IMAGE)
+            times.append((time.perf_counter() - start_time) * 1e6)
+        report(f'{hash_function.__name__} of test image', times)
+
+
+if __name__ == '__main__':
+    main()
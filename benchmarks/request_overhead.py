@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of the per-request overhead of services (no network).
+
+The transport is replaced with a stub returning canned responses, so the numbers show the time
+spent by the library itself on creating a task and getting its result.
+
+Usage: python benchmarks/request_overhead.py [iterations]
+"""
+
+import json
+import pathlib
+import sys
+import time
+
+from multicaps._service import anti_captcha, twocaptcha
+from multicaps.captcha import CaptchaType, HCaptcha, ImageCaptcha, RecaptchaV2
+
+IMAGE = (pathlib.Path(__file__).parent.parent / 'tests' / 'data' / 'image.jpg').read_bytes()
+
+RESPONSES = {
+    'twocaptcha': {
+        'in.php': {'status': 1, 'request': '123'},
+        'res.php': {'status': 1, 'request': 'token'},
+    },
+    'anti_captcha': {
+        'createTask': {'errorId': 0, 'taskId': 123},
+        'getTaskResult': {'errorId': 0, 'status': 'ready', 'cost': '0.002',
+                          'solution': {'gRecaptchaResponse': 'token', 'text': 'text'}},
+    },
+}
+
+
+class Response:  # pylint: disable=too-few-public-methods
+    """ Stub of an HTTP response """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def json(self):
+        """ Returns the decoded JSON """
+        return json.loads(self.text)
+
+
+def make_service(module):
+    """ Returns a service with the transport replaced by a stub """
+
+    service = module.Service('key')
+    responses = RESPONSES[module.__name__.rsplit('.', 1)[-1]]
+
+    texts = {key: json.dumps(value) for key, value in responses.items()}
+
+    def make_request(request_data):
+        return Response(next(text for key, text in texts.items()
+                             if request_data['url'].endswith(key)))
+
+    service._transport._make_request = make_request  # pylint: disable=protected-access
+    return service
+
+
+def bench(service, captcha, iterations):
+    """ Returns microseconds per create_task() + get_task_result() """
+
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        task = service.create_task(captcha)
+        service.get_task_result(task)
+    return (time.perf_counter() - start_time) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    captchas = [
+        RecaptchaV2('site_key', 'https://example.com', is_invisible=True),
+        HCaptcha('site_key', 'https://example.com'),
+        ImageCaptcha(IMAGE),
+    ]
+
+    for module in (twocaptcha, anti_captcha):
+        service = make_service(module)
+        for captcha in captchas:
+            bench(service, captcha, iterations // 10)  # warm up
+            micros = bench(service, captcha, iterations)
+            print(f'{module.__name__.rsplit(".", 1)[-1]:>14} '
+                  f'{captcha.get_type().value:>14}: {micros:8.1f} us/request pair')
+
+    service = make_service(twocaptcha)
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        service.supported_captchas  # pylint: disable=pointless-statement
+    print(f'{"supported_captchas":>30}: '
+          f'{(time.perf_counter() - start_time) / iterations * 1e6:8.2f} us')
+
+    assert CaptchaType.RECAPTCHAV2 in service.supported_captchas
+
+
+if __name__ == '__main__':
+    main()
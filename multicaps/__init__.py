@@ -7,6 +7,10 @@ Unicaps package
 # pylint: disable=unused-import,import-error
 from ._solver import CaptchaSolver
 from ._solver_async import AsyncCaptchaSolver
+from ._solver_failover import FailoverSolver, AsyncFailoverSolver
+from ._solver_router import RoutingSolver, AsyncRoutingSolver
+from ._solver_hedged import AsyncHedgedSolver
 from ._service import CaptchaSolvingService
 
-__all__ = ('CaptchaSolver', 'AsyncCaptchaSolver', 'CaptchaSolvingService')
+__all__ = ('CaptchaSolver', 'AsyncCaptchaSolver', 'FailoverSolver', 'AsyncFailoverSolver',
+           'RoutingSolver', 'AsyncRoutingSolver', 'AsyncHedgedSolver', 'CaptchaSolvingService')
@@ -0,0 +1,59 @@
+# -*- coding: UTF-8 -*-
+"""
+Batch solving stuff
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+from ._captcha.base import BaseCaptcha
+from ._misc.proxy import ProxyServer
+from .exceptions import UnicapsException
+
+BATCH_CONCURRENCY = 10  # default number of CAPTCHAs solved at the same time
+
+
+@dataclass
+class BatchItem:
+    """ CAPTCHA to solve in a batch with its own proxy, User-Agent and cookies """
+
+    captcha: BaseCaptcha
+    proxy: Optional[ProxyServer] = None
+    user_agent: Optional[str] = None
+    cookies: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def from_input(cls, item: Union[BaseCaptcha, 'BatchItem']) -> 'BatchItem':
+        """ Makes BatchItem from a batch input item """
+
+        if isinstance(item, cls):
+            return item
+        if isinstance(item, BaseCaptcha):
+            return cls(item)
+        raise UnicapsException(f"Unsupported batch item: {item!r}")
+
+
+@dataclass
+class BatchResult:
+    """ Result of solving a batch item: SolvedCaptcha object or an exception """
+
+    index: int  # position of the item in the input
+    item: Union[BatchItem, object]  # the input item itself if it's not supported
+    solved_captcha: Optional[object] = None
+    exception: Optional[BaseException] = None
+
+    @property
+    def captcha(self) -> Optional[BaseCaptcha]:
+        """ Source CAPTCHA """
+        return self.item.captcha if isinstance(self.item, BatchItem) else None
+
+    @property
+    def ok(self) -> bool:  # pylint: disable=invalid-name
+        """ Whether the CAPTCHA is solved """
+        return self.exception is None
+
+    def result(self):
+        """ Returns SolvedCaptcha object or raises the exception """
+        if self.exception is not None:
+            raise self.exception
+        return self.solved_captcha
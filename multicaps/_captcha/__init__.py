@@ -2,21 +2,26 @@
 
 """ CAPTCHAs """
 
-# pylint: disable=unused-import,import-error
-from .image import ImageCaptcha
-from .text import TextCaptcha
-from .recaptcha_v2 import RecaptchaV2
-from .recaptcha_v3 import RecaptchaV3
-from .hcaptcha import HCaptcha
-from .funcaptcha import FunCaptcha
-from .keycaptcha import KeyCaptcha
-from .geetest import GeeTest
-from .geetest_v4 import GeeTestV4
-from .capy import CapyPuzzle
-from .tiktok import TikTokCaptcha
-from .turnstile import TurnstileCaptcha
+import importlib
+
 from .base import CaptchaType
 
+# CAPTCHA classes by name and their modules, a module is imported on first use of its class
+_CAPTCHA_MODULES = {
+    'ImageCaptcha': 'image',
+    'TextCaptcha': 'text',
+    'RecaptchaV2': 'recaptcha_v2',
+    'RecaptchaV3': 'recaptcha_v3',
+    'HCaptcha': 'hcaptcha',
+    'FunCaptcha': 'funcaptcha',
+    'KeyCaptcha': 'keycaptcha',
+    'GeeTest': 'geetest',
+    'GeeTestV4': 'geetest_v4',
+    'CapyPuzzle': 'capy',
+    'TikTokCaptcha': 'tiktok',
+    'TurnstileCaptcha': 'turnstile',
+}
+
 __all__ = (
     'ImageCaptcha',
     'TextCaptcha',
@@ -32,3 +37,21 @@ __all__ = (
     'TurnstileCaptcha',
     'CaptchaType'
 )
+
+
+def get_captcha_class(captcha_type: CaptchaType):
+    """ Returns CAPTCHA class of the type """
+    return __getattr__(captcha_type.value)
+
+
+def __getattr__(name: str):
+    if name in _CAPTCHA_MODULES:
+        captcha_class = getattr(importlib.import_module(f'.{_CAPTCHA_MODULES[name]}', __name__),
+                                name)
+        globals()[name] = captcha_class
+        return captcha_class
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_CAPTCHA_MODULES))
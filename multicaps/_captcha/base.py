@@ -4,10 +4,11 @@ Base CAPTCHA stuff
 """
 
 import enum
+import functools
 import importlib
 from abc import ABC
 from dataclasses import asdict, dataclass, fields, MISSING
-from typing import Dict
+from typing import Dict, Tuple
 
 
 class CaptchaType(enum.Enum):
@@ -35,13 +36,16 @@ class BaseCaptcha(ABC):
     def get_type(cls) -> CaptchaType:
         """ Return CaptchaType """
 
-        return CaptchaType(cls.__name__)
+        return _get_captcha_type(cls.__name__)
 
     @classmethod
     def get_solution_class(cls) -> 'BaseCaptchaSolution':
         """ Return appropriate solution class """
 
-        return getattr(importlib.import_module(cls.__module__), cls.__name__ + "Solution")
+        return _get_solution_class(cls)
+
+    async def load_async(self) -> None:
+        """ Loads the CAPTCHA data (e.g. files) not blocking the event loop """
 
     def get_optional_data(self, **kwargs) -> Dict:
         """
@@ -56,10 +60,7 @@ class BaseCaptcha(ABC):
 
         if not kwargs:
             # get all optional params
-            kwargs = {
-                field.name: (field.name, None) for field in fields(self)
-                if field.default is not MISSING
-            }
+            kwargs = {name: (name, None) for name in _get_optional_fields(type(self))}
 
         for opt_field in kwargs:
             opt_field_value = getattr(self, opt_field)
@@ -71,6 +72,22 @@ class BaseCaptcha(ABC):
         return result
 
 
+@functools.lru_cache(maxsize=None)
+def _get_captcha_type(class_name: str) -> CaptchaType:
+    return CaptchaType(class_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_solution_class(captcha_class: type) -> 'BaseCaptchaSolution':
+    return getattr(importlib.import_module(captcha_class.__module__),
+                   captcha_class.__name__ + "Solution")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_optional_fields(captcha_class: type) -> Tuple[str, ...]:
+    return tuple(field.name for field in fields(captcha_class) if field.default is not MISSING)
+
+
 @dataclass
 class BaseCaptchaSolution(ABC):
     """ Base class for any CAPTCHA solution """
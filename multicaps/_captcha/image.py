@@ -3,11 +3,15 @@
 Image CAPTCHA
 """
 
+import asyncio
 import base64
 import io
+import mmap
+import os
 import pathlib
+import threading
 from dataclasses import dataclass
-from typing import Union, Optional
+from typing import Union, Optional, Tuple
 
 from .._compat import enforce_types
 
@@ -15,6 +19,8 @@ from .base import BaseCaptcha, BaseCaptchaSolution
 from ..common import CaptchaAlphabet, CaptchaCharType, WorkerLanguage
 from ..exceptions import BadInputDataError
 
+IMAGE_MMAP_MIN_SIZE = 256 * 1024  # min size of an image file to map into memory instead of reading
+
 
 def _detect_image_type(image_bytes: bytes) -> Optional[str]:
     """Detect common image formats from file signatures."""
@@ -63,38 +69,139 @@ class ImageCaptcha(BaseCaptcha):
     comment: Optional[str] = None
 
     def __post_init__(self):
-        self._image_bytes = None
-        self.get_image_bytes()
+        if not isinstance(self.image, (bytes, io.RawIOBase, io.BufferedIOBase, pathlib.Path)):
+            raise TypeError("Image must be bytes, a binary stream or a path!")
 
-    def get_image_bytes(self) -> bytes:
-        """ Bytes image """
+        self._image_bytes: Union[bytes, mmap.mmap, None] = None
+        self._lock = threading.Lock()
 
-        if self._image_bytes is None:
-            if isinstance(self.image, bytes):
-                self._image_bytes = self.image  # type: ignore
-            elif isinstance(self.image, (io.RawIOBase, io.BufferedIOBase)):
-                self._image_bytes = self.image.read()
-            elif isinstance(self.image, pathlib.Path):
-                self._image_bytes = self.image.read_bytes()
+        # an image file is read on first use, bytes are checked and streams are read at once
+        # (they may be closed later)
+        if not isinstance(self.image, pathlib.Path):
+            self.get_image_bytes()
+
+    def __getstate__(self):
+        # copies get their own lock and map the image file again on first use
+        state = self.__dict__.copy()
+        del state['_lock']
+        if isinstance(state['_image_bytes'], mmap.mmap):
+            state['_image_bytes'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'ImageCaptcha':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self) -> None:
+        """ Unmaps the image file (if it's mapped), it's mapped again on next use """
+
+        with self._lock:
+            if isinstance(self._image_bytes, mmap.mmap):
+                self._image_bytes.close()
+                self._image_bytes = None
 
-            # check image type
-            self.get_image_type()
+    def get_image_bytes(self) -> Union[bytes, mmap.mmap]:
+        """ Bytes image (a read-only memory map of a big image file) """
+
+        if self._image_bytes is None:
+            with self._lock:
+                if self._image_bytes is None:
+                    image_bytes = _read_image(self.image)
+                    _get_image_type(image_bytes)  # check image type
+                    self._image_bytes = image_bytes
 
         return self._image_bytes
 
+    async def load_async(self) -> None:
+        """ Reads the image file in a thread not to block the event loop """
+
+        if self._image_bytes is None:
+            await asyncio.to_thread(self.get_image_bytes)
+
     def get_image_base64(self) -> bytes:
         """ BASE64 image """
 
         return base64.b64encode(self.get_image_bytes())
 
+    def get_image_file(self) -> Tuple[str, Union[bytes, io.RawIOBase], str]:
+        """ Image file to upload: file name, bytes (or a reader) and content type """
+
+        image_bytes = self.get_image_bytes()
+        if isinstance(image_bytes, mmap.mmap):
+            # each upload reads the memory map with its own position
+            image_bytes = _BufferReader(image_bytes)  # type: ignore
+
+        image_type = self.get_image_type()
+        extension = 'jpg' if image_type == 'jpeg' else image_type
+        return f'captcha.{extension}', image_bytes, f'image/{image_type}'
+
     def get_image_type(self) -> str:
         """ Get type of image file/data """
 
-        image_type = _detect_image_type(self._image_bytes)  # type: ignore[arg-type]
+        return _get_image_type(self.get_image_bytes())
+
+
+def _read_image(image: Union[bytes, io.RawIOBase, io.BufferedIOBase, pathlib.Path]
+                ) -> Union[bytes, mmap.mmap]:
+    if isinstance(image, bytes):
+        return image
+    if isinstance(image, (io.RawIOBase, io.BufferedIOBase)):
+        return image.read()  # type: ignore
+
+    with image.open('rb') as file:
+        if os.fstat(file.fileno()).st_size >= IMAGE_MMAP_MIN_SIZE:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return file.read()
+
+
+def _get_image_type(image_bytes: Union[bytes, mmap.mmap]) -> str:
+    # only the signature is read (a memory map of a big file isn't loaded)
+    image_type = _detect_image_type(image_bytes[:12])
+
+    if not image_type:
+        raise BadInputDataError("Unable to recognize image type!")
+    return image_type
+
+
+class _BufferReader(io.RawIOBase):
+    """ Binary stream reading a buffer (e.g. a memory map) without copying it """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._buffer = memoryview(buffer)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._buffer[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._buffer)}
+        self._position = max(start[whence] + offset, 0)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
 
-        if not image_type:
-            raise BadInputDataError("Unable to recognize image type!")
-        return image_type
+    def close(self) -> None:
+        # the buffer is released, so the memory map can be closed
+        if not self.closed:
+            self._buffer.release()
+        super().close()
 
 
 @enforce_types
@@ -0,0 +1,175 @@
+# -*- coding: UTF-8 -*-
+"""
+Cache of solutions of image and text CAPTCHAs
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from .._captcha import CaptchaType
+
+CACHE_MAX_SIZE = 10000  # max number of cached solutions
+CACHE_TTL = 24 * 60 * 60.0  # seconds a solution is kept in the cache
+
+
+def get_cache_key(captcha) -> Optional[str]:
+    """
+    Returns the key of the CAPTCHA solution in the cache (None if it can't be cached).
+
+    The key is made of digests of the solving options of the CAPTCHA (e.g. the char type or
+    the language) and the image (or the normalized text of the question).
+    """
+
+    captcha_type = captcha.get_type()
+    if captcha_type == CaptchaType.IMAGE:
+        digest = hashlib.sha256(captcha.get_image_bytes())
+    elif captcha_type == CaptchaType.TEXT:
+        digest = hashlib.sha256(' '.join(captcha.text.split()).casefold().encode('utf-8'))
+    else:
+        return None
+
+    options = repr(sorted(captcha.get_optional_data().items())).encode('utf-8')
+    # the digest of the content goes last, so keys of the same options share the prefix
+    return f'{captcha_type.value}:{hashlib.sha256(options).hexdigest()}:{digest.hexdigest()}'
+
+
+class SolutionCache(ABC):
+    """
+    Base class for caches of solutions.
+
+    Entries are JSON-serializable dicts with the task ID, the solution data, the cost and
+    the extra data of the solved CAPTCHA. Caches are thread-safe and can be shared by several
+    solvers.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """ Returns the cached entry (None if there is no entry or it has expired) """
+
+    @abstractmethod
+    def set(self, key: str, entry: Dict) -> None:
+        """ Adds the entry to the cache """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """ Removes the entry from the cache (if any) """
+
+    def close(self) -> None:
+        """ Releases resources of the cache """
+
+
+class MemoryCache(SolutionCache):
+    """
+    In-memory cache of solutions evicting least recently used and expired entries.
+
+    :param max_size: (optional) Max number of entries.
+    :param ttl: (optional) Seconds an entry is kept (None to keep entries until evicted).
+    """
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE, ttl: Optional[float] = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, Tuple[Optional[float], Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            expires, entry = self._entries.get(key, (None, None))
+            if entry is None:
+                return None
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict) -> None:
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteCache(SolutionCache):
+    """
+    Persistent cache of solutions in a SQLite database evicting least recently used and
+    expired entries.
+
+    :param path: Path to the database file.
+    :param max_size: (optional) Max number of entries.
+    :param ttl: (optional) Seconds an entry is kept (None to keep entries until evicted).
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], max_size: int = CACHE_MAX_SIZE,
+                 ttl: Optional[float] = CACHE_TTL):
+        import sqlite3  # pylint: disable=import-outside-toplevel
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.fspath(path), check_same_thread=False,
+                                           isolation_level=None)
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, entry TEXT NOT NULL, "
+                "expires REAL, used REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT entry, expires FROM solutions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._connection.execute("DELETE FROM solutions WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE solutions SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, entry: Dict) -> None:
+        now = time.time()
+        expires = None if self.ttl is None else now + self.ttl
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO solutions (key, entry, expires, used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry), expires, now)
+            )
+            self._connection.execute("DELETE FROM solutions WHERE expires <= ?", (now,))
+            self._connection.execute(
+                "DELETE FROM solutions WHERE key IN "
+                "(SELECT key FROM solutions ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM solutions WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,169 @@
+# -*- coding: UTF-8 -*-
+"""
+Image limits of services and optional preprocessing of images
+"""
+
+import dataclasses
+import io
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional
+
+from ..exceptions import BadInputDataError
+
+IMAGE_TYPES = frozenset({'jpeg', 'png', 'gif', 'bmp', 'tiff', 'webp'})  # all detected types
+PREPROCESS_JPEG_QUALITY = 85  # quality of images re-encoded to JPEG
+PREPROCESS_SCALE_STEP = 0.75  # scale of each step downscaling an image to fit the max size
+PREPROCESS_MIN_SCALE = 0.25  # min scale of an image downscaled to fit the max size
+
+# formats of Pillow by image types
+_PIL_FORMATS = {'jpeg': 'JPEG', 'png': 'PNG', 'gif': 'GIF', 'bmp': 'BMP', 'tiff': 'TIFF',
+                'webp': 'WEBP'}
+
+
+@dataclass(frozen=True)
+class ImageLimits:
+    """ Limits of images accepted by a service """
+
+    max_size: Optional[int] = None  # max size of an image file in bytes (None if unknown)
+    image_types: FrozenSet[str] = IMAGE_TYPES  # accepted image types
+
+    def is_met(self, image_type: str, size: int) -> bool:
+        """ Checks if the image of the type and size is accepted """
+        return image_type in self.image_types and (self.max_size is None or size <= self.max_size)
+
+    def check(self, captcha) -> None:
+        """ Raises BadInputDataError if the image of the CAPTCHA isn't accepted """
+
+        image_type = captcha.get_image_type()
+        if image_type not in self.image_types:
+            raise BadInputDataError(f"Image type {image_type} is not supported by the service!")
+
+        size = len(captcha.get_image_bytes())
+        if self.max_size is not None and size > self.max_size:
+            raise BadInputDataError(
+                f"Image is too big for the service: {size} bytes, max {self.max_size} bytes!"
+            )
+
+
+@dataclass
+class PreprocessingStats:
+    """ Statistics of image preprocessing """
+
+    images: int = 0  # number of preprocessed images
+    shrunk: int = 0  # number of images replaced with smaller ones
+    bytes_before: int = 0  # total size of the images before preprocessing
+    bytes_after: int = 0  # total size of the images after preprocessing
+
+    @property
+    def bytes_saved(self) -> int:
+        """ Number of bytes saved by preprocessing """
+        return self.bytes_before - self.bytes_after
+
+
+class ImagePreprocessor:
+    """
+    Preprocessor shrinking images to fit limits of services (requires Pillow).
+
+    Images are downscaled to ``max_width`` x ``max_height``, converted to grayscale and
+    re-encoded to ``image_format`` if asked. Images of types the service doesn't accept are
+    re-encoded to PNG (or JPEG), images bigger than the max size of the service are re-encoded
+    and downscaled step by step until they fit. A preprocessed image is sent only if it's
+    smaller than the original one (or the original one doesn't fit the limits).
+
+    :param max_width: (optional) Max width of images in pixels.
+    :param max_height: (optional) Max height of images in pixels.
+    :param grayscale: (optional) Convert images to grayscale.
+    :param image_format: (optional) Image type to re-encode images to ('png' or 'jpeg').
+    :param jpeg_quality: (optional) Quality of images re-encoded to JPEG.
+    """
+
+    def __init__(self, max_width: Optional[int] = None, max_height: Optional[int] = None,
+                 grayscale: bool = False, image_format: Optional[str] = None,
+                 jpeg_quality: int = PREPROCESS_JPEG_QUALITY):
+        try:
+            import PIL  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+        except ImportError as exc:
+            raise ImportError(
+                'Pillow is required for image preprocessing: pip install "multicaps[image]"'
+            ) from exc
+        if image_format not in (None, 'png', 'jpeg'):
+            raise ValueError('"image_format" must be "png" or "jpeg"!')
+
+        self.max_width = max_width
+        self.max_height = max_height
+        self.grayscale = grayscale
+        self.image_format = image_format
+        self.jpeg_quality = jpeg_quality
+        self.stats = PreprocessingStats()
+        self._lock = threading.Lock()
+
+    def process(self, captcha, limits: ImageLimits):
+        """ Returns the image CAPTCHA with the image preprocessed to fit the limits """
+
+        image_bytes = captcha.get_image_bytes()
+        image_type = captcha.get_image_type()
+        is_met = limits.is_met(image_type, len(image_bytes))
+        is_asked = bool(self.max_width or self.max_height or self.grayscale or self.image_format)
+        if is_met and not is_asked:
+            return captcha
+
+        processed = self._shrink(captcha, image_type, limits)
+        if processed is not None and is_met and len(processed) >= len(image_bytes):
+            processed = None
+
+        with self._lock:
+            self.stats.images += 1
+            self.stats.bytes_before += len(image_bytes)
+            self.stats.bytes_after += len(image_bytes if processed is None else processed)
+            self.stats.shrunk += int(processed is not None)
+
+        if processed is None:
+            return captcha
+        return dataclasses.replace(captcha, image=processed)
+
+    def _shrink(self, captcha, image_type: str, limits: ImageLimits) -> Optional[bytes]:
+        """ Returns the re-encoded image (None if it can't fit the limits) """
+
+        from PIL import Image  # pylint: disable=import-outside-toplevel
+
+        image_file = captcha.get_image_file()[1]
+        with Image.open(io.BytesIO(image_file) if isinstance(image_file, bytes)
+                        else image_file) as image:
+            image.load()
+            if self.max_width or self.max_height:
+                image.thumbnail((self.max_width or image.width, self.max_height or image.height))
+            if self.grayscale:
+                image = image.convert('L')
+
+            target_type = self._get_target_type(image_type, limits)
+            scale = 1.0
+            while True:
+                resized = image if scale == 1.0 else image.resize(
+                    (max(int(image.width * scale), 1), max(int(image.height * scale), 1))
+                )
+                encoded = self._encode(resized, target_type)
+                if limits.is_met(target_type, len(encoded)):
+                    return encoded
+                scale *= PREPROCESS_SCALE_STEP
+                if scale < PREPROCESS_MIN_SCALE:
+                    return None
+
+    def _get_target_type(self, image_type: str, limits: ImageLimits) -> str:
+        for target_type in (self.image_format, image_type, 'png', 'jpeg'):
+            if target_type in limits.image_types:
+                return target_type  # type: ignore
+        raise BadInputDataError("No image type supported by the service can be encoded!")
+
+    def _encode(self, image, image_type: str) -> bytes:
+        options: Dict[str, Any] = {}
+        if image_type == 'jpeg':
+            if image.mode not in ('L', 'RGB'):
+                image = image.convert('RGB')
+            options.update(quality=self.jpeg_quality, optimize=True)
+        elif image_type == 'png':
+            options.update(optimize=True)
+
+        output = io.BytesIO()
+        image.save(output, format=_PIL_FORMATS[image_type], **options)
+        return output.getvalue()
@@ -0,0 +1,248 @@
+# -*- coding: UTF-8 -*-
+"""
+Perceptual hashes of images and the index of them for near-duplicate lookups
+"""
+
+import functools
+import io
+from array import array
+import itertools
+import threading
+from typing import Dict, List, Optional, Tuple
+
+SIMILAR_MAX_DISTANCE = 4  # max Hamming distance between hashes of near-duplicate images
+SIMILAR_INDEX_CHUNKS = 4  # number of hash chunks indexed by the multi-index hash table
+SIMILAR_INDEX_CAPACITY = 1024  # initial number of hashes the index has space for
+SIMILAR_INDEX_MAX_REMOVED = 0.5  # share of removed hashes the index is rebuilt without them at
+
+HASH_SIZE = 8  # width and height of the bit grid of a hash (64-bit hashes)
+HASH_BITS = HASH_SIZE * HASH_SIZE
+PHASH_FACTOR = 4  # pHash is taken from the low frequencies of a 4 times bigger image
+
+
+def _import_numpy():
+    """ Returns NumPy (raises ImportError if NumPy or Pillow isn't installed) """
+
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+        import PIL  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+    except ImportError as exc:
+        raise ImportError(
+            'NumPy and Pillow are required for perceptual hashes: pip install "multicaps[phash]"'
+        ) from exc
+    return numpy
+
+
+def _load_pixels(image, width: int, height: int):
+    """ Returns the image (bytes or file object) as a grayscale array of the given size """
+
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    numpy = _import_numpy()
+    with Image.open(io.BytesIO(image) if isinstance(image, bytes) else image) as source:
+        resized = source.convert('L').resize((width, height), Image.Resampling.LANCZOS)
+    return numpy.asarray(resized, dtype=numpy.float64)
+
+
+def _pack_bits(bits) -> int:
+    numpy = _import_numpy()
+    return int.from_bytes(numpy.packbits(bits.ravel()).tobytes(), 'big')
+
+
+@functools.lru_cache(maxsize=None)
+def _get_dct_matrix(size: int):
+    """ Returns the orthonormal DCT-II matrix """
+
+    numpy = _import_numpy()
+    indexes = numpy.arange(size)
+    matrix = numpy.cos(numpy.pi * numpy.outer(indexes, 2 * indexes + 1) / (2 * size))
+    matrix *= numpy.sqrt(2 / size)
+    matrix[0] /= numpy.sqrt(2)
+    return matrix
+
+
+def dhash(image) -> int:
+    """
+    Returns the difference hash of the image (bytes or file object): bits tell if pixels of
+    the downscaled grayscale image are brighter than their left neighbours.
+    """
+
+    pixels = _load_pixels(image, HASH_SIZE + 1, HASH_SIZE)
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image) -> int:
+    """
+    Returns the perceptual hash of the image (bytes or file object): bits tell if the lowest
+    frequencies of the DCT of the downscaled grayscale image are above their median.
+    """
+
+    numpy = _import_numpy()
+    size = HASH_SIZE * PHASH_FACTOR
+    matrix = _get_dct_matrix(size)
+    frequencies = (matrix @ _load_pixels(image, size, size) @ matrix.T)[:HASH_SIZE, :HASH_SIZE]
+    # the first (DC) coefficient is the mean brightness, it's too big to take into account
+    return _pack_bits(frequencies > numpy.median(frequencies.ravel()[1:]))
+
+
+HASH_FUNCTIONS = {'dhash': dhash, 'phash': phash}
+
+
+def _popcount(values):
+    """ Returns numbers of set bits of uint64 values """
+
+    numpy = _import_numpy()
+    if hasattr(numpy, 'bitwise_count'):  # NumPy 2.0+
+        return numpy.bitwise_count(values)
+    return _get_popcount_table()[values.view(numpy.uint8)].reshape(len(values), 8).sum(axis=1)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_popcount_table():
+    numpy = _import_numpy()
+    return numpy.array([bin(value).count('1') for value in range(256)], dtype=numpy.uint8)
+
+
+class PerceptualIndex:
+    """
+    Index of perceptual hashes of images for lookups of near-duplicate images (requires NumPy
+    and Pillow).
+
+    Hashes are kept in a multi-index hash table: a 64-bit hash is split into ``chunks`` parts
+    indexed by separate tables. Hashes within the Hamming distance D of the query have at least
+    one part within the distance D // chunks of the part of the query, so only hashes from a few
+    buckets are compared with the query. Removed hashes are skipped by queries until they make
+    up ``SIMILAR_INDEX_MAX_REMOVED`` of the index, which is rebuilt without them then.
+
+    :param max_distance: (optional) Max Hamming distance between hashes of near-duplicates.
+    :param hash_function: (optional) Perceptual hash to use ('dhash' or 'phash').
+    :param chunks: (optional) Number of hash parts indexed.
+    """
+
+    def __init__(self, max_distance: int = SIMILAR_MAX_DISTANCE, hash_function: str = 'dhash',
+                 chunks: int = SIMILAR_INDEX_CHUNKS):
+        numpy = _import_numpy()
+        if hash_function not in HASH_FUNCTIONS:
+            raise ValueError('"hash_function" must be "dhash" or "phash"!')
+        if HASH_BITS % chunks:
+            raise ValueError(f'"chunks" must be a divisor of {HASH_BITS}!')
+
+        self.max_distance = max_distance
+        self.hash_function = hash_function
+        self._chunk_bits = HASH_BITS // chunks
+        self._hashes = numpy.zeros(SIMILAR_INDEX_CAPACITY, dtype=numpy.uint64)
+        self._values: List[Optional[str]] = []  # values by positions (None if removed)
+        self._positions: Dict[str, int] = {}  # positions by values
+        # positions of hashes by values of their chunks
+        self._tables: List[Dict[int, array]] = [{} for _ in range(chunks)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def hash_image(self, captcha) -> Optional[int]:
+        """ Returns the perceptual hash of the image CAPTCHA (None if it can't be decoded) """
+
+        try:
+            return HASH_FUNCTIONS[self.hash_function](captcha.get_image_file()[1])
+        except (OSError, ValueError):
+            return None
+
+    def add(self, image_hash: int, value: str) -> None:
+        """ Adds the hash of an image with the value (e.g. the key of its solution) """
+
+        with self._lock:
+            self._remove(value)
+            self._insert(image_hash, value)
+
+    def remove(self, value: str) -> None:
+        """ Removes the hash with the value (if any) """
+
+        with self._lock:
+            self._remove(value)
+
+    def _insert(self, image_hash: int, value: str) -> None:
+        numpy = _import_numpy()
+        position = len(self._values)
+        if position == len(self._hashes):
+            self._hashes = numpy.concatenate([self._hashes, numpy.zeros_like(self._hashes)])
+        self._hashes[position] = image_hash
+        self._values.append(value)
+        self._positions[value] = position
+        for table, chunk in zip(self._tables, self._split(image_hash)):
+            bucket = table.get(chunk)
+            if bucket is None:
+                table[chunk] = bucket = array('q')
+            bucket.append(position)
+
+    def _remove(self, value: str) -> None:
+        # positions stay in the tables, the removed values are skipped by queries
+        # until there are too many of them
+        position = self._positions.pop(value, None)
+        if position is None:
+            return
+        self._values[position] = None
+        if len(self._values) - len(self._positions) > len(self._values) * SIMILAR_INDEX_MAX_REMOVED:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """ Rebuilds the index without the removed hashes """
+
+        numpy = _import_numpy()
+        entries = [(int(self._hashes[position]), value)
+                   for position, value in enumerate(self._values) if value is not None]
+        capacity = SIMILAR_INDEX_CAPACITY
+        while capacity < len(entries):
+            capacity *= 2
+
+        self._hashes = numpy.zeros(capacity, dtype=numpy.uint64)
+        self._values = []
+        self._positions = {}
+        self._tables = [{} for _ in self._tables]
+        for image_hash, value in entries:
+            self._insert(image_hash, value)
+
+    def query(self, image_hash: int,
+              max_distance: Optional[int] = None) -> List[Tuple[int, str]]:
+        """ Returns (distance, value) pairs of hashes within the distance, the nearest first """
+
+        numpy = _import_numpy()
+        if max_distance is None:
+            max_distance = self.max_distance
+        flips = _get_flips(self._chunk_bits, max_distance // len(self._tables))
+
+        with self._lock:
+            candidates = array('q')
+            for table, chunk in zip(self._tables, self._split(image_hash)):
+                for flip in flips:
+                    bucket = table.get(chunk ^ flip)
+                    if bucket is not None:
+                        candidates.extend(bucket)
+            if not candidates:
+                return []
+
+            positions = numpy.frombuffer(candidates, dtype=numpy.int64)
+            distances = _popcount(self._hashes[positions] ^ numpy.uint64(image_hash))
+            matched = numpy.flatnonzero(distances <= max_distance)
+            # a hash is a candidate as many times as many its chunks are close to the query
+            result = {self._values[position]: int(distance) for distance, position
+                      in zip(distances[matched], positions[matched])}
+        result.pop(None, None)  # removed hashes
+        return sorted(((distance, value) for value, distance in result.items()),
+                      key=lambda item: item[0])  # type: ignore
+
+    def _split(self, image_hash: int) -> List[int]:
+        mask = (1 << self._chunk_bits) - 1
+        return [(image_hash >> (index * self._chunk_bits)) & mask
+                for index in range(len(self._tables))]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_flips(bits: int, distance: int) -> Tuple[int, ...]:
+    """ Returns masks flipping up to the given number of bits of a chunk """
+
+    return tuple(
+        sum(1 << bit for bit in flipped)
+        for count in range(distance + 1)
+        for flipped in itertools.combinations(range(bits), count)
+    )
@@ -0,0 +1,193 @@
+# -*- coding: UTF-8 -*-
+"""
+Live statistics of solving services and routing objectives
+"""
+
+import collections
+import math
+import threading
+from typing import Any, Callable, Counter, Deque, Dict, Optional, Tuple
+
+from .stats import SolveTimeHistogram
+from .._captcha import CaptchaType
+
+ROUTER_WINDOW = 100  # number of recent attempts the statistics follow
+ROUTER_MIN_SAMPLES = 5  # attempts to make with a service before trusting its statistics
+ROUTER_EXPLORATION = 0.05  # share of CAPTCHAs sent to a random service other than the best one
+
+
+class ServiceStats:
+    """
+    Rolling statistics of a service solving CAPTCHAs of a type.
+
+    Solve times, costs and errors of about ``window`` recent attempts are kept.
+
+    :param window: Number of recent attempts to keep.
+    """
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self._solve_times = SolveTimeHistogram(max_samples=window)
+        self._costs: Deque[float] = collections.deque(maxlen=window)
+        self._outcomes: Deque[Optional[str]] = collections.deque(maxlen=window)
+
+    @property
+    def count(self) -> int:
+        """ Number of recent attempts """
+        return len(self._outcomes)
+
+    @property
+    def p50(self) -> Optional[float]:
+        """ Median solve time (None if unknown) """
+        return self._solve_times.quantile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        """ 95th percentile of solve times (None if unknown) """
+        return self._solve_times.quantile(0.95)
+
+    @property
+    def cost(self) -> Optional[float]:
+        """ Average cost of a solved CAPTCHA (None if unknown) """
+        if not self._costs:
+            return None
+        return sum(self._costs) / len(self._costs)
+
+    @property
+    def error_rate(self) -> float:
+        """ Share of recent attempts failed with an error """
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for outcome in self._outcomes if outcome is not None) / len(self._outcomes)
+
+    @property
+    def errors(self) -> Counter[str]:
+        """ Numbers of recent errors by exception class name """
+        return collections.Counter(outcome for outcome in self._outcomes if outcome is not None)
+
+    @property
+    def cost_per_success(self) -> float:
+        """ Expected cost of a solved CAPTCHA considering errors (inf if unknown) """
+        cost = self.cost
+        if cost is None or self.error_rate >= 1:
+            return math.inf
+        return cost / (1 - self.error_rate)
+
+    def solve_time(self, quantile: float = 0.95) -> float:
+        """ Returns the quantile of solve times (inf if unknown) """
+        solve_time = self._solve_times.quantile(quantile)
+        return math.inf if solve_time is None else solve_time
+
+    def add_success(self, solve_time: float, cost: Optional[float] = None):
+        """ Records a solved CAPTCHA """
+
+        self._solve_times.add(solve_time)
+        if cost is not None:
+            self._costs.append(cost)
+        self._outcomes.append(None)
+
+    def add_error(self, exc: BaseException):
+        """ Records an attempt failed with the exception """
+        self._outcomes.append(type(exc).__name__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Returns a summary of the statistics """
+
+        return dict(
+            count=self.count,
+            p50=self.p50,
+            p95=self.p95,
+            cost=self.cost,
+            error_rate=self.error_rate,
+            errors=dict(self.errors)
+        )
+
+
+class RouterStats:
+    """
+    Rolling statistics by service and CAPTCHA type.
+
+    :param window: Number of recent attempts to keep per service and CAPTCHA type.
+    """
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.window = window
+        self._stats: Dict[Tuple[str, CaptchaType], ServiceStats] = {}
+        self._lock = threading.Lock()
+
+    def get(self, service_name: str, captcha_type: CaptchaType) -> ServiceStats:
+        """ Returns statistics of the service for the CAPTCHA type """
+
+        with self._lock:
+            key = (service_name, captcha_type)
+            if key not in self._stats:
+                self._stats[key] = ServiceStats(self.window)
+            return self._stats[key]
+
+    def record(self, service_name: str, captcha_type: CaptchaType,
+               solve_time: Optional[float] = None, cost: Optional[float] = None,
+               exc: Optional[BaseException] = None):
+        """ Records a solved CAPTCHA (its solve time and cost) or an error """
+
+        stats = self.get(service_name, captcha_type)
+        with self._lock:
+            if exc is not None:
+                stats.add_error(exc)
+            else:
+                stats.add_success(solve_time or 0.0, cost)
+
+    def evaluate(self, service_name: str, captcha_type: CaptchaType,
+                 objective: 'Objective') -> Tuple[int, Any]:
+        """ Returns the number of recent attempts of the service and its objective value """
+
+        stats = self.get(service_name, captcha_type)
+        with self._lock:
+            return stats.count, objective(stats)
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """ Returns summaries of the statistics by CAPTCHA type and service """
+
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (service_name, captcha_type), stats in self._stats.items():
+                result.setdefault(captcha_type.value, {})[service_name] = stats.to_dict()
+        return result
+
+
+Objective = Callable[[ServiceStats], Any]
+
+
+def fastest(quantile: float = 0.95) -> Objective:
+    """ Prefers services with the lowest quantile of solve times """
+
+    def objective(stats: ServiceStats):
+        return stats.solve_time(quantile)
+
+    return objective
+
+
+def cheapest(max_solve_time: Optional[float] = None, quantile: float = 0.95,
+             max_error_rate: Optional[float] = None) -> Objective:
+    """
+    Prefers services with the lowest cost of a solved CAPTCHA among the ones meeting
+    the limits (the quantile of solve times and the error rate). If no service meets them,
+    the fastest one is preferred.
+    """
+
+    def objective(stats: ServiceStats):
+        solve_time = stats.solve_time(quantile)
+        is_acceptable = ((max_solve_time is None or solve_time <= max_solve_time)
+                         and (max_error_rate is None or stats.error_rate <= max_error_rate))
+        if is_acceptable:
+            return 0, stats.cost_per_success, solve_time
+        return 1, solve_time, stats.cost_per_success
+
+    return objective
+
+
+def most_reliable() -> Objective:
+    """ Prefers services with the lowest error rate (then the fastest ones) """
+
+    def objective(stats: ServiceStats):
+        return stats.error_rate, stats.solve_time(0.95)
+
+    return objective
@@ -0,0 +1,185 @@
+# -*- coding: UTF-8 -*-
+"""
+Solve time statistics
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Union
+
+HISTOGRAM_BUCKET_WIDTH = 1.0  # seconds
+HISTOGRAM_MAX_VALUE = 600.0  # seconds, longer solve times go to the last bucket
+HISTOGRAM_MAX_SAMPLES = 1000  # the histogram is aged (halved) after this number of samples
+STATS_SAVE_INTERVAL = 60  # min seconds between saves of statistics to disk
+
+
+class SolveTimeHistogram:
+    """
+    Histogram of solve times with fixed-width buckets.
+
+    When the number of samples exceeds ``max_samples`` all counts are halved, so the histogram
+    follows the recent distribution.
+    """
+
+    def __init__(self, bucket_width: float = HISTOGRAM_BUCKET_WIDTH,
+                 max_value: float = HISTOGRAM_MAX_VALUE,
+                 max_samples: int = HISTOGRAM_MAX_SAMPLES):
+        self.bucket_width = bucket_width
+        self.max_samples = max_samples
+        self._counts = [0.0] * int(max_value / bucket_width)
+        self._total = 0.0
+
+    @property
+    def count(self) -> float:
+        """ Number of samples (aged) """
+        return self._total
+
+    def add(self, value: float):
+        """ Adds a sample """
+
+        index = min(max(int(value / self.bucket_width), 0), len(self._counts) - 1)
+        self._counts[index] += 1
+        self._total += 1
+
+        if self._total > self.max_samples:
+            self._counts = [count / 2 for count in self._counts]
+            self._total /= 2
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns the q-quantile interpolated linearly inside the bucket containing it
+        (the upper bound of the bucket would move polling checkpoints up with every sample)
+        """
+
+        if not self._total:
+            return None
+
+        threshold = q * self._total
+        cumulative = 0.0
+        for index, count in enumerate(self._counts):
+            if count and cumulative + count >= threshold:
+                return (index + (threshold - cumulative) / count) * self.bucket_width
+            cumulative += count
+        return len(self._counts) * self.bucket_width
+
+    def to_dict(self) -> Dict:
+        """ Returns the histogram as a JSON-serializable dict """
+
+        return dict(
+            bucket_width=self.bucket_width,
+            counts={str(index): count for index, count in enumerate(self._counts) if count}
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SolveTimeHistogram':
+        """ Creates a histogram from a dict made by to_dict() """
+
+        histogram = cls(bucket_width=data['bucket_width'])
+        for index, count in data['counts'].items():
+            index = int(index)
+            if 0 <= index < len(histogram._counts):
+                histogram._counts[index] = count
+                histogram._total += count
+        return histogram
+
+
+class SolveTimeStats:
+    """
+    Solve time histograms by key, optionally persisted to a JSON file.
+
+    :param path: (optional) Path to the file to load the statistics from and save to.
+    """
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None):
+        self.path = path
+        self._histograms: Dict[str, SolveTimeHistogram] = {}
+        self._lock = threading.Lock()
+        self._is_dirty = False
+        self._is_saving = False  # a save is scheduled by record()
+        self._saved_at = time.monotonic()
+        self._save_lock = threading.Lock()
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def get(self, key: str) -> SolveTimeHistogram:
+        """ Returns the histogram for the key """
+
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = SolveTimeHistogram()
+            return self._histograms[key]
+
+    def record(self, key: str, value: float):
+        """
+        Records a solve time and saves the statistics from time to time (from a thread,
+        so callers running on an event loop aren't blocked by the file writes)
+        """
+
+        histogram = self.get(key)
+        with self._lock:
+            histogram.add(value)
+            self._is_dirty = True
+            is_due = (self.path is not None and not self._is_saving
+                      and time.monotonic() - self._saved_at > STATS_SAVE_INTERVAL)
+            self._is_saving = self._is_saving or is_due
+
+        if is_due:
+            threading.Thread(target=self._save_in_background, name='multicaps-stats',
+                             daemon=True).start()
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        finally:
+            with self._lock:
+                self._is_saving = False
+
+    def load(self):
+        """ Loads the statistics from the file """
+
+        with open(self.path, 'r', encoding='utf-8') as file:  # type: ignore
+            data = json.load(file)
+
+        with self._lock:
+            self._histograms = {
+                key: SolveTimeHistogram.from_dict(value) for key, value in data.items()
+            }
+
+    def save(self):
+        """ Saves the statistics to the file (if any) """
+
+        if self.path is None:
+            return
+
+        with self._save_lock:  # the explicit save and the one from record() may run at once
+            with self._lock:
+                if not self._is_dirty:
+                    return
+                data = {key: value.to_dict() for key, value in self._histograms.items()}
+                self._is_dirty = False
+                self._saved_at = time.monotonic()
+
+            tmp_path = f'{os.fspath(self.path)}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.path)
+
+
+_STATS_BY_PATH: Dict[str, SolveTimeStats] = {}
+_STATS_BY_PATH_LOCK = threading.Lock()
+
+
+def get_solve_time_stats(path: Optional[Union[str, os.PathLike]] = None) -> SolveTimeStats:
+    """ Returns statistics for the file (shared in the process) or a new in-memory one """
+
+    if path is None:
+        return SolveTimeStats()
+
+    path = os.path.abspath(path)
+    with _STATS_BY_PATH_LOCK:
+        if path not in _STATS_BY_PATH:
+            _STATS_BY_PATH[path] = SolveTimeStats(path)
+        return _STATS_BY_PATH[path]
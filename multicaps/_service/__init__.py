@@ -4,10 +4,15 @@ Certain services related stuff
 """
 
 import enum
-# pylint: disable=import-self
-from . import (
-    anti_captcha, azcaptcha, captcha_guru, cptch_net, deathbycaptcha, multibot, rucaptcha,
-    sctg, twocaptcha
+import importlib
+from collections.abc import Mapping
+from types import ModuleType
+from typing import Dict, Iterator
+
+# service modules are imported on first use
+_SERVICE_MODULES = (
+    'anti_captcha', 'azcaptcha', 'captcha_guru', 'cptch_net', 'deathbycaptcha', 'multibot',
+    'rucaptcha', 'sctg', 'twocaptcha'
 )
 
 
@@ -25,15 +30,37 @@ class CaptchaSolvingService(enum.Enum):
     TWOCAPTCHA = "2captcha.com"
 
 
+class _LazyServiceModules(Mapping):
+    """ Service modules by CaptchaSolvingService, a module is imported on first lookup """
+
+    def __init__(self, module_names: Dict[CaptchaSolvingService, str]):
+        self._module_names = module_names
+
+    def __getitem__(self, service: CaptchaSolvingService) -> ModuleType:
+        return importlib.import_module(f'.{self._module_names[service]}', __name__)
+
+    def __iter__(self) -> Iterator[CaptchaSolvingService]:
+        return iter(self._module_names)
+
+    def __len__(self) -> int:
+        return len(self._module_names)
+
+
 # supported CAPTCHA solving services
-SOLVING_SERVICE = {
-    CaptchaSolvingService.ANTI_CAPTCHA: anti_captcha,
-    CaptchaSolvingService.AZCAPTCHA: azcaptcha,
-    CaptchaSolvingService.CAPTCHA_GURU: captcha_guru,
-    CaptchaSolvingService.CPTCH_NET: cptch_net,
-    CaptchaSolvingService.DEATHBYCAPTCHA: deathbycaptcha,
-    CaptchaSolvingService.MULTIBOT: multibot,
-    CaptchaSolvingService.RUCAPTCHA: rucaptcha,
-    CaptchaSolvingService.SCTG: sctg,
-    CaptchaSolvingService.TWOCAPTCHA: twocaptcha
-}
+SOLVING_SERVICE = _LazyServiceModules({
+    CaptchaSolvingService.ANTI_CAPTCHA: 'anti_captcha',
+    CaptchaSolvingService.AZCAPTCHA: 'azcaptcha',
+    CaptchaSolvingService.CAPTCHA_GURU: 'captcha_guru',
+    CaptchaSolvingService.CPTCH_NET: 'cptch_net',
+    CaptchaSolvingService.DEATHBYCAPTCHA: 'deathbycaptcha',
+    CaptchaSolvingService.MULTIBOT: 'multibot',
+    CaptchaSolvingService.RUCAPTCHA: 'rucaptcha',
+    CaptchaSolvingService.SCTG: 'sctg',
+    CaptchaSolvingService.TWOCAPTCHA: 'twocaptcha'
+})
+
+
+def __getattr__(name: str) -> ModuleType:
+    if name in _SERVICE_MODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,9 +4,12 @@ anti-captcha.com service
 """
 
 import json
+from typing import Optional
 
 from .base import HTTPService
-from .._transport.http_transport import HTTPRequestJSON  # type: ignore
+from .._transport.http_transport import (HTTPRequestJSON, Base64JSONBody,  # type: ignore
+                                         HTTP_BASE64_STREAM_MIN_SIZE)
+from .._misc.image import ImageLimits
 from .. import exceptions
 from .._captcha import CaptchaType
 from ..common import WorkerLanguage
@@ -177,6 +180,8 @@ class ReportBadRequest(Request):
 class TaskRequest(Request):
     """ Request class for requests to /createTask """
 
+    IDEMPOTENT = False  # a repeated request creates another task
+
     # pylint: disable=arguments-differ,unused-argument
     def prepare(self, captcha, proxy, user_agent, cookies) -> dict:  # type: ignore
         """ Prepare a request """
@@ -288,6 +293,13 @@ class SolutionRequest(Request):
 class ImageCaptchaTaskRequest(TaskRequest):
     """ ImageCaptchaTask Request class """
 
+    # images accepted by the service
+    IMAGE_LIMITS = ImageLimits(max_size=500 * 1000,
+                               image_types=frozenset({'jpeg', 'png', 'gif'}))
+
+    # min image size to encode to base64 while sending (None to encode it beforehand)
+    BASE64_STREAM_MIN_SIZE: Optional[int] = HTTP_BASE64_STREAM_MIN_SIZE
+
     # pylint: disable=arguments-differ,signature-differs
     def prepare(self, captcha, proxy, user_agent, cookies) -> dict:  # type: ignore
         """ Prepare a request """
@@ -299,9 +311,13 @@ class ImageCaptchaTaskRequest(TaskRequest):
             cookies=None
         )
 
+        image_bytes = captcha.get_image_bytes()
+        is_streamed = (self.BASE64_STREAM_MIN_SIZE is not None
+                       and len(image_bytes) >= self.BASE64_STREAM_MIN_SIZE)
+
         task_data = dict(
             type="ImageToTextTask",
-            body=captcha.get_image_base64().decode('ascii')
+            body="" if is_streamed else captcha.get_image_base64().decode('ascii')
         )
         task_data.update(
             captcha.get_optional_data(
@@ -322,6 +338,11 @@ class ImageCaptchaTaskRequest(TaskRequest):
                 'rn' if captcha.language == WorkerLanguage.RUSSIAN else 'en'
             )
 
+        if is_streamed:
+            request['content'] = Base64JSONBody(request.pop('json'), ('task', 'body'),
+                                                image_bytes)
+            request['headers'].update(request['content'].headers)
+
         return request
 
 
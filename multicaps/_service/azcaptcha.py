@@ -2,8 +2,12 @@
 """
 azcaptcha.com service
 """
+from typing import Optional
+
 from .base import HTTPService
-from .._transport.http_transport import HTTPRequestJSON  # type: ignore
+from .._transport.http_transport import (HTTPRequestJSON, HTTP_MULTIPART_MIN_SIZE,  # type: ignore
+                                         is_multipart_upload)
+from .._misc.image import ImageLimits
 from .. import exceptions
 from .._captcha import CaptchaType
 from ..common import CaptchaAlphabet
@@ -65,9 +69,7 @@ class Request(HTTPRequestJSON):
         elif error_code in ('ERROR_ZERO_BALANCE',):
             raise exceptions.LowBalanceError(error_msg)
         elif error_code in ('ERROR_NO_SLOT_AVAILABLE',):
-            # If server returns ERROR_NO_SLOT_AVAILABLE make a 5 seconds timeout before sending
-            # next request.
-            # time.sleep(5)
+            # new tasks are held back by BusyGate of the service (if enabled)
             raise exceptions.ServiceTooBusy(error_msg)
         elif error_code in ('MAX_USER_TURN',) or error_code.startswith('ERROR:'):
             raise exceptions.TooManyRequestsError(error_msg)
@@ -204,6 +206,8 @@ class ReportBadRequest(ResRequest):
 class TaskRequest(InRequest):
     """ Common Task Request class """
 
+    IDEMPOTENT = False  # a repeated request creates another task
+
     # pylint: disable=arguments-differ,unused-argument
     def prepare(self, captcha, proxy, user_agent, cookies):
         request = super().prepare(
@@ -271,6 +275,12 @@ class SolutionRequest(ResRequest):
 class ImageCaptchaTaskRequest(TaskRequest):
     """ ImageCaptchaTask Request class """
 
+    # images accepted by the service (the max size isn't documented)
+    IMAGE_LIMITS = ImageLimits(image_types=frozenset({'jpeg', 'png', 'gif'}))
+
+    # min image size to upload as a file (None to always send base64)
+    MULTIPART_MIN_SIZE: Optional[int] = HTTP_MULTIPART_MIN_SIZE
+
     # pylint: disable=arguments-differ,unused-argument,signature-differs
     def prepare(self, captcha, proxy, user_agent, cookies) -> dict:  # type: ignore
         """ Prepare request """
@@ -283,12 +293,16 @@ class ImageCaptchaTaskRequest(TaskRequest):
         )
 
         # add required params
-        request['data'].update(
-            dict(
-                method="base64",
-                body=captcha.get_image_base64().decode('ascii')
+        if is_multipart_upload(captcha.get_image_bytes(), self.MULTIPART_MIN_SIZE):
+            request['data']['method'] = "post"
+            request['files'] = dict(file=captcha.get_image_file())
+        else:
+            request['data'].update(
+                dict(
+                    method="base64",
+                    body=captcha.get_image_base64().decode('ascii')
+                )
             )
-        )
 
         # add optional params
         request['data'].update(
@@ -4,63 +4,258 @@ Base service stuff
 """
 
 import asyncio
+import os
 import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import datetime
 from inspect import getmodule
 from timeit import default_timer as timer
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
-from .._transport.http_transport import StandardHTTPTransport  # type: ignore
 from .._captcha import CaptchaType
 from .._captcha.base import BaseCaptcha, BaseCaptchaSolution
+from .._misc.cache import MemoryCache, SolutionCache, get_cache_key
+from .._misc.image import ImagePreprocessor
+from .._misc.phash import PerceptualIndex
 from .._misc.proxy import ProxyServer
-from ..exceptions import UnicapsException, SolutionWaitTimeout, SolutionNotReadyYet
+from .._misc.stats import get_solve_time_stats
+from ..exceptions import (UnicapsException, SolutionWaitTimeout, SolutionNotReadyYet,
+                          CircuitOpenError, TooManyRequestsError, ServiceTooBusy)
+from .circuit_breaker import CircuitBreaker, CircuitState
+from .dispatch import get_dispatch_table
+from .rate_limit import get_rate_limiter, get_busy_gate
+from .polling import (BulkPoller, AsyncPollingScheduler, PollingThread, AdaptivePolling,
+                      SpeculativeResubmission, iter_polling_delays, get_solve_time,
+                      MAX_CONCURRENT_POLLS,
+                      SPECULATIVE_QUANTILE, SPECULATIVE_MAX_PER_MINUTE)
 
 
 class BaseService(ABC):
     """ Base class for all services """
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, bulk_polling: bool = False, shared_polling: bool = False,
+                 max_concurrent_polls: int = MAX_CONCURRENT_POLLS,
+                 adaptive_polling: Union[bool, str, os.PathLike] = False,
+                 circuit_breaker: Union[bool, CircuitBreaker] = False,
+                 rate_limit: Union[bool, Tuple[float, float]] = False,
+                 busy_backoff: bool = False, busy_max_wait: Optional[float] = None,
+                 speculative_resubmit: Union[bool, float] = False,
+                 speculative_max_per_minute: int = SPECULATIVE_MAX_PER_MINUTE,
+                 http2: Optional[bool] = None, max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None,
+                 image_preprocessing: Union[bool, ImagePreprocessor] = False,
+                 solution_cache: Union[bool, SolutionCache] = False,
+                 similar_images: Union[bool, PerceptualIndex] = False):
+        if speculative_resubmit and shared_polling:
+            # the shared pollers poll single tasks and can't race a task with its duplicate
+            raise ValueError('"speculative_resubmit" param can\'t be used with "shared_polling"!')
+
         self.api_key = api_key
-        self._transport = self._init_transport()
+        transport_settings = dict(
+            http2=http2,
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._transport = self._init_transport(
+            {key: value for key, value in transport_settings.items() if value is not None}
+        )
         self._module = getmodule(self)
+        self._dispatch = get_dispatch_table(self._module)  # type: ignore
         self._settings = {captcha_type: Settings() for captcha_type in self.supported_captchas}
+
+        self._bulk_poller = None
+        if bulk_polling and self.supports_bulk_polling:
+            bulk_request_class = self._dispatch.bulk_request_class
+            self._bulk_poller = BulkPoller(
+                self,
+                captcha_types=bulk_request_class.CAPTCHA_TYPES,
+                max_batch_size=bulk_request_class.MAX_TASKS
+            )
+
+        self._polling_scheduler = None
+        self._polling_thread = None
+        if shared_polling:
+            self._polling_scheduler = AsyncPollingScheduler(self, max_concurrent_polls)
+            self._polling_thread = PollingThread(self, max_concurrent_polls)
+
+        self._service_name = self._module.__name__.rsplit('.', 1)[-1]  # type: ignore
+
+        self._adaptive_polling = None
+        if adaptive_polling:
+            stats_path = None if adaptive_polling is True else adaptive_polling
+            self._adaptive_polling = AdaptivePolling(
+                get_solve_time_stats(stats_path),  # type: ignore
+                service_name=self._service_name
+            )
+
+        self._speculation = None
+        if speculative_resubmit:
+            self._speculation = SpeculativeResubmission(
+                # solve times are shared with adaptive polling (if enabled)
+                (self._adaptive_polling.stats if self._adaptive_polling is not None
+                 else get_solve_time_stats()),
+                service_name=self._service_name,
+                quantile=(SPECULATIVE_QUANTILE if speculative_resubmit is True
+                          else speculative_resubmit),
+                max_per_minute=speculative_max_per_minute
+            )
+
+        self._circuit_breaker = None
+        if circuit_breaker:
+            self._circuit_breaker = (circuit_breaker if isinstance(circuit_breaker, CircuitBreaker)
+                                     else CircuitBreaker())
+
+        self._rate_limiter = None
+        if rate_limit:
+            self._rate_limiter = get_rate_limiter(
+                self._service_name, api_key, None if rate_limit is True else rate_limit
+            )
+
+        self._busy_gate = get_busy_gate(self._service_name) if busy_backoff else None
+        self.busy_max_wait = busy_max_wait
+
+        self.image_preprocessor = None
+        if image_preprocessing:
+            self.image_preprocessor = (image_preprocessing
+                                       if isinstance(image_preprocessing, ImagePreprocessor)
+                                       else ImagePreprocessor())
+
+        self.solution_cache = None
+        if isinstance(solution_cache, SolutionCache):  # an empty cache is falsy
+            self.solution_cache = solution_cache
+        elif solution_cache:
+            self.solution_cache = MemoryCache()
+
+        self.similar_images = None
+        if isinstance(similar_images, PerceptualIndex):
+            self.similar_images = similar_images
+        elif similar_images:
+            self.similar_images = PerceptualIndex()
+        if self.similar_images is not None and self.solution_cache is None:
+            self.solution_cache = MemoryCache()
+
         self._post_init()
 
     @abstractmethod
-    def _init_transport(self):
+    def _init_transport(self, settings: Dict):
         pass
 
     def _post_init(self):
         pass
 
+    def _get_request(self, request_class):
+        return self._dispatch.get_request_class(request_class)(self)
+
     def _make_request(self, request_class, *args):
-        request_class = request_class + "Request"
-        if not hasattr(self._module, request_class):
-            raise UnicapsException(f"{request_class} is not supported by the current service!")
+        request = self._get_request(request_class)
+        # an open circuit fails fast without taking a token of the rate limiter
+        if self._circuit_breaker is not None and self._circuit_breaker.before_call():
+            self._probe_service()
+        if self._rate_limiter is not None:
+            time.sleep(self._rate_limiter.reserve(request_class.endswith("Task")))
 
-        request = getattr(self._module, request_class)(self)
-        return self._transport.make_request(request, *args)
+        try:
+            result = self._transport.make_request(request, *args)
+        except UnicapsException as exc:
+            self._on_request_result(request_class, exc)
+            raise
+        self._on_request_result(request_class)
+        return result
 
     async def _make_request_async(self, request_class, *args):
-        request_class = request_class + "Request"
-        if not hasattr(self._module, request_class):
-            raise UnicapsException(f"{request_class} is not supported by the current service!")
+        request = self._get_request(request_class)
+        if self._circuit_breaker is not None and self._circuit_breaker.before_call():
+            await self._probe_service_async()
+        if self._rate_limiter is not None:
+            await asyncio.sleep(self._rate_limiter.reserve(request_class.endswith("Task")))
 
-        request = getattr(self._module, request_class)(self)
-        return await self._transport.make_request_async(request, *args)
+        try:
+            result = await self._transport.make_request_async(request, *args)
+        except UnicapsException as exc:
+            self._on_request_result(request_class, exc)
+            raise
+        self._on_request_result(request_class)
+        return result
+
+    def _on_request_result(self, request_class: str, exc: Optional[Exception] = None):
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.on_result(exc)
+        if self._rate_limiter is not None and isinstance(exc, TooManyRequestsError):
+            self._rate_limiter.throttle(request_class.endswith("Task"))
+
+    def _probe_service(self):
+        try:
+            is_successful = bool(
+                self._transport.make_probe_request(self._get_request("GetStatus"))
+            )
+        except Exception:  # pylint: disable=broad-except
+            is_successful = False
+        self._on_probe(is_successful)
+
+    async def _probe_service_async(self):
+        try:
+            is_successful = bool(
+                await self._transport.make_probe_request_async(self._get_request("GetStatus"))
+            )
+        except Exception:  # pylint: disable=broad-except
+            is_successful = False
+        self._on_probe(is_successful)
+
+    def _on_probe(self, is_successful: bool):
+        self._circuit_breaker.on_probe(is_successful)  # type: ignore
+        if not is_successful:
+            raise CircuitOpenError("The service is unavailable, the circuit breaker is open")
+
+    def _preflight(self, captcha: BaseCaptcha) -> BaseCaptcha:
+        """ Preprocesses the image of the CAPTCHA to fit the limits of the service (if enabled)
+        and checks it before uploading, returns the CAPTCHA to upload """
+
+        # without preprocessing images are sent as is (the documented limits may be outdated)
+        if self.image_preprocessor is None:
+            return captcha
+
+        request_class = self._dispatch.get_request_class(f"{captcha.get_type().value}Task")
+        limits = getattr(request_class, 'IMAGE_LIMITS', None)
+        if limits is None:
+            return captcha
+
+        captcha = self.image_preprocessor.process(captcha, limits)
+        limits.check(captcha)
+        return captcha
 
     @property
     def supported_captchas(self) -> Tuple[CaptchaType, ...]:
         """ List of supported captchas """
 
-        captchas = []
-        for captcha_type in CaptchaType:
-            if hasattr(self._module, captcha_type.value + "TaskRequest"):
-                captchas.append(captcha_type)
-        return tuple(captchas)
+        return self._dispatch.supported_captchas
+
+    @property
+    def supports_bulk_polling(self) -> bool:
+        """ Whether the service can poll several tasks with a single request """
+
+        return self._dispatch.bulk_request_class is not None
+
+    def can_poll_in_bulk(self, task: 'CaptchaTask') -> bool:
+        """ Checks if the task is polled with bulk requests """
+
+        return self._bulk_poller is not None and self._bulk_poller.accepts(task)
+
+    @property
+    def circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """ Circuit breaker of the service (if enabled) """
+
+        return self._circuit_breaker
+
+    @property
+    def circuit_state(self) -> CircuitState:
+        """ Circuit breaker state (always closed if the circuit breaker is disabled) """
+
+        if self._circuit_breaker is None:
+            return CircuitState.CLOSED
+        return self._circuit_breaker.state
 
     @property
     def settings(self) -> Dict[CaptchaType, 'Settings']:
@@ -73,26 +268,120 @@ class BaseService(ABC):
                       cookies: Optional[Dict[str, str]] = None) -> 'SolvedCaptcha':
         """ Solves captcha and returns SolvedCaptcha object """
 
+        cache_key, image_hash, entry = self._find_cached_solution(captcha)
+        if entry is not None:
+            return self._get_cached_solution(
+                CaptchaTask, SolvedCaptcha, captcha, cache_key, entry,  # type: ignore
+                (proxy, user_agent, cookies)
+            )
+
         start_time = datetime.now()
         task = self.create_task(captcha, proxy, user_agent, cookies)
         solution, cost, extra = self.wait_for_solution(task)
         end_time = datetime.now()
 
-        return SolvedCaptcha(task, solution, start_time, end_time,
-                             cost=cost, extra=extra)
+        solved = SolvedCaptcha(task, solution, start_time, end_time,
+                               cost=cost, extra=extra, cache_key=cache_key)
+        self._cache_solution(solved, image_hash)
+        return solved
 
     async def solve_captcha_async(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer] = None,
                                   user_agent: Optional[str] = None,
                                   cookies: Optional[Dict[str, str]] = None) -> 'AsyncSolvedCaptcha':
         """ Solves captcha and returns SolvedCaptcha object (async) """
 
+        if self.solution_cache is not None:
+            await captcha.load_async()
+        if self.similar_images is None:
+            cache_key, image_hash, entry = self._find_cached_solution(captcha)
+        else:  # decoding of the image takes a while
+            cache_key, image_hash, entry = await asyncio.to_thread(
+                self._find_cached_solution, captcha
+            )
+        if entry is not None:
+            return self._get_cached_solution(  # type: ignore
+                AsyncCaptchaTask, AsyncSolvedCaptcha, captcha, cache_key, entry,  # type: ignore
+                (proxy, user_agent, cookies)
+            )
+
         start_time = datetime.now()
         task = await self.create_task_async(captcha, proxy, user_agent, cookies)
         solution, cost, extra = await self.wait_for_solution_async(task)
         end_time = datetime.now()
 
-        return AsyncSolvedCaptcha(task, solution, start_time, end_time,
-                                  cost=cost, extra=extra)
+        solved = AsyncSolvedCaptcha(task, solution, start_time, end_time,
+                                    cost=cost, extra=extra, cache_key=cache_key)
+        self._cache_solution(solved, image_hash)
+        return solved
+
+    def _find_cached_solution(
+            self, captcha: BaseCaptcha
+    ) -> Tuple[Optional[str], Optional[int], Optional[Dict]]:
+        """
+        Returns the cache key of the CAPTCHA, its perceptual hash (if near-duplicate images are
+        looked up) and the cached entry of the same CAPTCHA or a near-duplicate one (the key of
+        the near-duplicate is returned then)
+        """
+
+        if self.solution_cache is None:
+            return None, None, None
+        cache_key = get_cache_key(captcha)
+        if cache_key is None:
+            return None, None, None
+
+        entry = self.solution_cache.get(cache_key)
+        if entry is not None or self.similar_images is None:
+            return cache_key, None, entry
+
+        image_hash = self.similar_images.hash_image(captcha)
+        if image_hash is None:
+            return cache_key, None, None
+
+        # near-duplicates must have the same type and options (the key without the digest)
+        prefix = cache_key.rsplit(':', 1)[0]
+        for _, similar_key in self.similar_images.query(image_hash):
+            if similar_key.rsplit(':', 1)[0] != prefix:
+                continue
+            entry = self.solution_cache.get(similar_key)
+            if entry is not None:
+                return similar_key, image_hash, entry
+            self.similar_images.remove(similar_key)  # evicted from the cache
+        return cache_key, image_hash, None
+
+    def _get_cached_solution(self, task_class, solved_class, captcha: BaseCaptcha,
+                             cache_key: str, entry: Dict, create_args: Tuple) -> 'SolvedCaptcha':
+        """ Returns the solved CAPTCHA made of the cache entry """
+
+        # pylint: disable=protected-access
+        task = task_class(self, captcha, entry['task_id'], entry['extra'],
+                          create_args=create_args)
+        solution = captcha.get_solution_class()(**entry['solution'])  # type: ignore
+        # the same (solution, cost, extra) result as of get_task_result(), nothing is paid
+        task._result = (solution, 0.0, entry['extra'])
+        now = datetime.now()
+        return solved_class(task, solution, now, now, cost=0.0, extra=entry['extra'],
+                            cached=True, cache_key=cache_key)
+
+    def _cache_solution(self, solved: 'SolvedCaptcha', image_hash: Optional[int]):
+        if solved.cache_key is None:
+            return
+
+        self.solution_cache.set(solved.cache_key, dict(  # type: ignore
+            task_id=solved.captcha_id,
+            solution=solved.solution.as_dict(),
+            cost=solved.cost,
+            extra=solved.extra
+        ))
+        if image_hash is not None:
+            self.similar_images.add(image_hash, solved.cache_key)  # type: ignore
+
+    def _evict_solution(self, solved_captcha: 'SolvedCaptcha'):
+        if solved_captcha.cache_key is None or self.solution_cache is None:
+            return
+
+        self.solution_cache.delete(solved_captcha.cache_key)
+        if self.similar_images is not None:
+            self.similar_images.remove(solved_captcha.cache_key)
 
     def create_task(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer] = None,
                     user_agent: Optional[str] = None,
@@ -101,15 +390,33 @@ class BaseService(ABC):
 
         captcha_type = captcha.get_type()
 
-        if captcha_type not in self.supported_captchas:
+        if captcha_type not in self._dispatch.supported_captcha_set:
             raise UnicapsException(f"{captcha_type} is not supported by the current service!")
+        request_captcha = self._preflight(captcha)
 
-        result = self._make_request(
-            f"{captcha_type.value}Task", captcha, proxy, user_agent, cookies
-        )
+        start_time = timer()
+        while True:
+            delay = self._reserve_free_slot(start_time)
+            while delay:
+                time.sleep(delay)
+                delay = self._reserve_free_slot(start_time) if self._busy_gate.is_paused else 0
+
+            try:
+                result = self._make_request(
+                    f"{captcha_type.value}Task", request_captcha, proxy, user_agent, cookies
+                )
+            except ServiceTooBusy:
+                if not self._pause_task_creation(start_time):
+                    raise
+                continue
+            break
+
+        if self._busy_gate is not None:
+            self._busy_gate.on_success()
         task_id = str(result["task_id"])
 
-        return CaptchaTask(self, captcha, task_id, result.get("extra"))
+        return CaptchaTask(self, captcha, task_id, result.get("extra"),
+                           create_args=(proxy, user_agent, cookies))
 
     async def create_task_async(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer] = None,
                                 user_agent: Optional[str] = None,
@@ -118,76 +425,227 @@ class BaseService(ABC):
 
         captcha_type = captcha.get_type()
 
-        if captcha_type not in self.supported_captchas:
+        if captcha_type not in self._dispatch.supported_captcha_set:
             raise UnicapsException(f"{captcha_type} is not supported by the current service!")
+        await captcha.load_async()
+        if self.image_preprocessor is None:
+            request_captcha = self._preflight(captcha)
+        else:
+            request_captcha = await asyncio.to_thread(self._preflight, captcha)
 
-        result = await self._make_request_async(
-            f"{captcha_type.value}Task", captcha, proxy, user_agent, cookies
-        )
+        start_time = timer()
+        while True:
+            delay = self._reserve_free_slot(start_time)
+            while delay:
+                await asyncio.sleep(delay)
+                delay = self._reserve_free_slot(start_time) if self._busy_gate.is_paused else 0
+
+            try:
+                result = await self._make_request_async(
+                    f"{captcha_type.value}Task", request_captcha, proxy, user_agent, cookies
+                )
+            except ServiceTooBusy:
+                if not self._pause_task_creation(start_time):
+                    raise
+                continue
+            break
+
+        if self._busy_gate is not None:
+            self._busy_gate.on_success()
         task_id = str(result["task_id"])
 
-        return AsyncCaptchaTask(self, captcha, task_id, result.get("extra"))
+        return AsyncCaptchaTask(self, captcha, task_id, result.get("extra"),
+                                create_args=(proxy, user_agent, cookies))
+
+    def _reserve_free_slot(self, start_time: float) -> float:
+        """ Returns seconds to wait for free slots of the service before creating a task """
+
+        if self._busy_gate is None:
+            return 0.0
+
+        delay = self._busy_gate.reserve()
+        if (delay and self.busy_max_wait is not None
+                and timer() - start_time + delay > self.busy_max_wait):
+            raise ServiceTooBusy(f"No free slots within {self.busy_max_wait} seconds")
+        return delay
 
-    def get_task_result(self, task: 'CaptchaTask') -> Tuple[BaseCaptchaSolution,
-                                                            Optional[float], Dict]:
-        """ Returns CAPTCHA solution """
+    def _pause_task_creation(self, start_time: float) -> bool:
+        """ Pauses task creation after "no slots" error, returns False if it can't wait """
+
+        if self._busy_gate is None:
+            return False
+        self._busy_gate.on_busy()
+        return self.busy_max_wait is None or timer() - start_time < self.busy_max_wait
+
+    def get_task_result(self, task: 'CaptchaTask',
+                        bulk: bool = True) -> Tuple[BaseCaptchaSolution, Optional[float], Dict]:
+        """ Returns CAPTCHA solution (polled with bulk requests if possible and asked) """
+
+        if bulk and self.can_poll_in_bulk(task):
+            result = self._bulk_poller.get_result(task)  # type: ignore
+            if result is not None:
+                return result
 
         result = self._make_request(f"{task.captcha.get_type().value}Solution", task)
+        return _get_solution_tuple(result)
 
-        return (
-            result['solution'],  # type: ignore
-            float(result['cost']) if result.get('cost') else None,
-            result.get("extra") or {}
-        )
+    async def get_task_result_async(self, task: 'CaptchaTask',
+                                    bulk: bool = True) -> Tuple[BaseCaptchaSolution,
+                                                                Optional[float], Dict]:
+        """ Returns CAPTCHA solution (polled with bulk requests if possible and asked) """
 
-    async def get_task_result_async(self, task: 'CaptchaTask') -> Tuple[BaseCaptchaSolution,
-                                                                        Optional[float], Dict]:
-        """ Returns CAPTCHA solution """
+        if bulk and self.can_poll_in_bulk(task):
+            result = await self._bulk_poller.get_result_async(task)  # type: ignore
+            if result is not None:
+                return result
 
         result = await self._make_request_async(f"{task.captcha.get_type().value}Solution", task)
-
-        return (
-            result['solution'],  # type: ignore
-            float(result['cost']) if result.get('cost') else None,
-            result.get("extra") or {}
-        )
+        return _get_solution_tuple(result)
+
+    def get_task_results(self, tasks: List['CaptchaTask']) -> Dict[str, Union[Tuple, Exception]]:
+        """
+        Returns CAPTCHA solutions of several tasks using bulk requests.
+        The result is a dict of solutions (or exceptions) by task ID, tasks which results are
+        unknown are absent in the dict.
+        """
+
+        results = {}
+        for chunk in self._get_bulk_chunks(tasks):
+            results.update(self._make_request("BulkSolution", chunk))
+        return _get_solution_tuples(results)
+
+    async def get_task_results_async(self, tasks: List['CaptchaTask']) -> Dict[str, Union[
+            Tuple, Exception]]:
+        """
+        Returns CAPTCHA solutions of several tasks using bulk requests (async).
+        The result is a dict of solutions (or exceptions) by task ID, tasks which results are
+        unknown are absent in the dict.
+        """
+
+        results = {}
+        for chunk in self._get_bulk_chunks(tasks):
+            results.update(await self._make_request_async("BulkSolution", chunk))
+        return _get_solution_tuples(results)
+
+    def _get_bulk_chunks(self, tasks: List['CaptchaTask']) -> List[List['CaptchaTask']]:
+        if not self.supports_bulk_polling:
+            raise UnicapsException("Bulk polling is not supported by the current service!")
+
+        max_tasks = self._dispatch.bulk_request_class.MAX_TASKS  # type: ignore
+        return [tasks[i:i + max_tasks] for i in range(0, len(tasks), max_tasks)]
+
+    def get_polling_delays(self, captcha_type: CaptchaType) -> Iterator[float]:
+        """ Returns an iterator of delays before each poll of a task solution """
+
+        settings = self._settings[captcha_type]
+        if self._adaptive_polling is not None:
+            return self._adaptive_polling.get_delays(captcha_type, settings)
+        return iter_polling_delays(settings)
+
+    def record_solve_time(self, task: 'CaptchaTask', solve_time: float):
+        """ Records seconds spent on waiting for the task solution """
+
+        if self._adaptive_polling is not None:
+            self._adaptive_polling.record(task.captcha.get_type(), solve_time)
+        elif self._speculation is not None:
+            self._speculation.record(task.captcha.get_type(), solve_time)
+
+    def _should_resubmit(self, task: 'CaptchaTask', tasks: Dict['CaptchaTask', float]) -> bool:
+        """ Checks if a duplicate of the task must be created now (only the task is pending) """
+
+        # the task may be failed already, while its duplicate is still pending
+        return (self._speculation is not None and len(tasks) == 1 and task in tasks
+                and self._speculation.should_resubmit(task.captcha.get_type(),
+                                                      timer() - tasks[task]))
 
     def wait_for_solution(self, task) -> Tuple[BaseCaptchaSolution, Optional[float], Dict]:
         """ Wait for CAPTCHA solution """
 
-        settings = self._settings[task.captcha.get_type()]
+        if self._polling_thread is not None:
+            return self._polling_thread.schedule(task).result()
+
+        captcha_type = task.captcha.get_type()
+        settings = self._settings[captcha_type]
+        delays = self.get_polling_delays(captcha_type)
 
         start_time = timer()
-        time.sleep(settings.polling_delay)
+        tasks = {task: start_time}  # pending tasks (the task and its duplicate) by start time
+        time.sleep(next(delays))
+        polled_at = start_time  # time of the previous poll
         while True:
-            if timer() - start_time > settings.solution_timeout:
+            poll_time = timer()
+            if poll_time - start_time > settings.solution_timeout:
                 raise SolutionWaitTimeout(
                     f"Couldn't receive a solution in {settings.solution_timeout} seconds!"
                 )
 
-            try:
-                return task.get_result()
-            except SolutionNotReadyYet:
-                time.sleep(settings.polling_interval)
+            for pending_task, task_start_time in list(tasks.items()):
+                try:
+                    result = pending_task.get_result()
+                except (SolutionNotReadyYet, CircuitOpenError):
+                    continue
+                except UnicapsException:
+                    del tasks[pending_task]
+                    if not tasks:
+                        raise
+                    continue
+                self.record_solve_time(pending_task,
+                                       get_solve_time(task_start_time, polled_at, poll_time))
+                task.take_over(pending_task)
+                return result
+
+            if self._should_resubmit(task, tasks):
+                try:
+                    tasks[self.create_task(task.captcha, *task.create_args)] = timer()
+                except UnicapsException:
+                    pass
+            polled_at = poll_time
+            time.sleep(next(delays))
 
     async def wait_for_solution_async(self, task) -> Tuple[BaseCaptchaSolution,
                                                            Optional[float], Dict]:
         """ Wait for CAPTCHA solution """
 
-        settings = self._settings[task.captcha.get_type()]
+        if self._polling_scheduler is not None:
+            return await self._polling_scheduler.schedule(task)
+
+        captcha_type = task.captcha.get_type()
+        settings = self._settings[captcha_type]
+        delays = self.get_polling_delays(captcha_type)
 
         start_time = timer()
-        await asyncio.sleep(settings.polling_delay)
+        tasks = {task: start_time}  # pending tasks (the task and its duplicate) by start time
+        await asyncio.sleep(next(delays))
+        polled_at = start_time  # time of the previous poll
         while True:
-            if timer() - start_time > settings.solution_timeout:
+            poll_time = timer()
+            if poll_time - start_time > settings.solution_timeout:
                 raise SolutionWaitTimeout(
                     f"Couldn't receive a solution in {settings.solution_timeout} seconds!"
                 )
 
-            try:
-                return await task.get_result()
-            except SolutionNotReadyYet:
-                await asyncio.sleep(settings.polling_interval)
+            for pending_task, task_start_time in list(tasks.items()):
+                try:
+                    result = await pending_task.get_result()
+                except (SolutionNotReadyYet, CircuitOpenError):
+                    continue
+                except UnicapsException:
+                    del tasks[pending_task]
+                    if not tasks:
+                        raise
+                    continue
+                self.record_solve_time(pending_task,
+                                       get_solve_time(task_start_time, polled_at, poll_time))
+                task.take_over(pending_task)
+                return result
+
+            if self._should_resubmit(task, tasks):
+                try:
+                    tasks[await self.create_task_async(task.captcha, *task.create_args)] = timer()
+                except UnicapsException:
+                    pass
+            polled_at = poll_time
+            await asyncio.sleep(next(delays))
 
     def get_balance(self):
         """ Get account balance """
@@ -219,6 +677,9 @@ class BaseService(ABC):
     def report_good(self, solved_captcha: 'SolvedCaptcha', raise_exc: bool = False) -> bool:
         """ Report good CAPTCHA """
 
+        if solved_captcha.is_cached:
+            return True  # the solution was reported with the solved CAPTCHA it's cached from
+
         result = False
         try:
             result = self._make_request("ReportGood", solved_captcha)
@@ -231,6 +692,9 @@ class BaseService(ABC):
                                 raise_exc: bool = False) -> bool:
         """ Report good CAPTCHA """
 
+        if solved_captcha.is_cached:
+            return True
+
         result = False
         try:
             result = await self._make_request_async("ReportGood", solved_captcha)
@@ -242,6 +706,10 @@ class BaseService(ABC):
     def report_bad(self, solved_captcha: 'SolvedCaptcha', raise_exc: bool = False) -> bool:
         """ Report bad CAPTCHA """
 
+        self._evict_solution(solved_captcha)
+        if solved_captcha.is_cached:
+            return True  # the cached solution wasn't paid, so only the entry is evicted
+
         result = False
         try:
             result = self._make_request("ReportBad", solved_captcha)
@@ -254,6 +722,10 @@ class BaseService(ABC):
                                raise_exc: bool = False) -> bool:
         """ Report bad CAPTCHA """
 
+        self._evict_solution(solved_captcha)
+        if solved_captcha.is_cached:
+            return True
+
         result = False
         try:
             result = await self._make_request_async("ReportBad", solved_captcha)
@@ -262,6 +734,32 @@ class BaseService(ABC):
                 raise
         return bool(result)
 
+    def report_task_bad(self, task: 'CaptchaTask', raise_exc: bool = False) -> bool:
+        """ Report bad CAPTCHA of the task given up before its solution is received """
+
+        result = False
+        try:
+            result = self._make_request("ReportBad", _TaskReport(task))
+        except UnicapsException:
+            if raise_exc:
+                raise
+        return bool(result)
+
+    async def report_task_bad_async(self, task: 'CaptchaTask', raise_exc: bool = False) -> bool:
+        """ Report bad CAPTCHA of the task given up before its solution is received """
+
+        result = False
+        try:
+            result = await self._make_request_async("ReportBad", _TaskReport(task))
+        except UnicapsException:
+            if raise_exc:
+                raise
+        return bool(result)
+
+    def _save_solve_times(self):
+        if self._adaptive_polling is not None:
+            self._adaptive_polling.save()
+
     @abstractmethod
     def close(self):
         """ Close connections """
@@ -274,18 +772,49 @@ class BaseService(ABC):
 class HTTPService(BaseService):
     """ Standard HTTP Service """
 
-    def _init_transport(self):
-        return StandardHTTPTransport()
+    def _init_transport(self, settings: Dict):
+        # pylint: disable=import-outside-toplevel
+        # httpx is imported only when a transport is built
+        from .._transport.http_transport import StandardHTTPTransport  # type: ignore
+
+        # many polls share one TLS connection with HTTP/2
+        base_url = getattr(self, 'BASE_URL', '')
+        settings.setdefault('http2', base_url.startswith('https://'))
+        # HTTP clients are shared by all services talking to the host (API keys are
+        # sent in requests)
+        settings.setdefault('base_url', base_url)
+        return StandardHTTPTransport(settings)
 
     def close(self):
         """ Close connections """
+        if self._polling_thread is not None:
+            self._polling_thread.close()
+        self._save_solve_times()
         self._transport.close()
 
     async def close_async(self):
         """ Close connections (async) """
+        if self._polling_scheduler is not None:
+            self._polling_scheduler.close()
+        self._save_solve_times()
         await self._transport.close_async()
 
 
+def _get_solution_tuple(result: Dict) -> Tuple[BaseCaptchaSolution, Optional[float], Dict]:
+    return (
+        result['solution'],  # type: ignore
+        float(result['cost']) if result.get('cost') else None,
+        result.get("extra") or {}
+    )
+
+
+def _get_solution_tuples(results: Dict) -> Dict[str, Union[Tuple, Exception]]:
+    return {
+        task_id: result if isinstance(result, Exception) else _get_solution_tuple(result)
+        for task_id, result in results.items()
+    }
+
+
 @dataclass
 class Settings:
     """ Service settings """
@@ -298,11 +827,13 @@ class Settings:
 class CaptchaTask:
     """ Task for CAPTCHA solving """
 
-    def __init__(self, service, captcha: BaseCaptcha, task_id: str, extra: Dict = None):
+    def __init__(self, service, captcha: BaseCaptcha, task_id: str, extra: Dict = None,
+                 create_args: Tuple = (None, None, None)):
         self._service = service
         self._captcha = captcha
         self._task_id = task_id
         self._extra = extra or {}
+        self._create_args = create_args
         self._result = None
 
     @property
@@ -320,6 +851,18 @@ class CaptchaTask:
         """ Task extra data """
         return self._extra
 
+    @property
+    def create_args(self) -> Tuple:
+        """ Proxy, User-Agent and cookies the task was created with """
+        return self._create_args
+
+    def take_over(self, task: 'CaptchaTask'):
+        """ Takes over the ID and result of the task solved instead of this one (duplicate) """
+        if task is not self:
+            self._task_id = task.task_id
+            self._extra = task.extra
+            self._result = task._result  # pylint: disable=protected-access
+
     def get_result(self) -> Optional[BaseCaptchaSolution]:
         """ Gets solution """
         if self._result is None:
@@ -349,12 +892,27 @@ class AsyncCaptchaTask(CaptchaTask):
         return await self._service.wait_for_solution_async(self)
 
 
+class _TaskReport:  # pylint: disable=too-few-public-methods
+    """ Unsolved task in place of the solved CAPTCHA reported by report requests """
+
+    is_cached = False
+    cache_key = None
+
+    def __init__(self, task: CaptchaTask):
+        self.task = task
+
+    @property
+    def captcha_id(self) -> str:
+        """ CAPTCHA ID """
+        return self.task.task_id
+
+
 class SolvedCaptcha:
     """ Solved CAPTCHA object """
 
     def __init__(self, task: CaptchaTask, solution: BaseCaptchaSolution, start_time: datetime,
                  end_time: datetime, cost: Optional[float] = None, cookies: Optional[dict] = None,
-                 extra: dict = None):
+                 extra: dict = None, cached: bool = False, cache_key: Optional[str] = None):
         if not task.is_done():
             raise UnicapsException("CAPTCHA is not solved yet!")
 
@@ -365,6 +923,8 @@ class SolvedCaptcha:
         self._cost = cost
         self._cookies = cookies or {}
         self._extra = extra or {}
+        self._cached = cached
+        self._cache_key = cache_key
 
     @property
     def captcha_id(self) -> str:
@@ -406,6 +966,16 @@ class SolvedCaptcha:
         """ Extra data from the service """
         return self._extra
 
+    @property
+    def is_cached(self) -> bool:
+        """ The solution is taken from the solution cache (and not paid) """
+        return self._cached
+
+    @property
+    def cache_key(self) -> Optional[str]:
+        """ Key of the solution in the solution cache (None if the cache isn't used) """
+        return self._cache_key
+
     def report_good(self, raise_exc: bool = False) -> bool:
         """ Report good CAPTCHA """
         # pylint: disable=protected-access
@@ -7,7 +7,7 @@ SOFT_ID = 136024
 # pylint: disable=unused-import
 from .twocaptcha import (
     Service as Service2Captcha, GetBalanceRequest, GetStatusRequest,
-    ReportGoodRequest, ReportBadRequest,
+    ReportGoodRequest, ReportBadRequest, BulkSolutionRequest,
     ImageCaptchaTaskRequest, ImageCaptchaSolutionRequest,
     RecaptchaV2TaskRequest, RecaptchaV2SolutionRequest,
     RecaptchaV3TaskRequest, RecaptchaV3SolutionRequest,
@@ -17,7 +17,7 @@ from .twocaptcha import (
 
 __all__ = [
     'Service', 'GetBalanceRequest', 'GetStatusRequest',
-    'ReportGoodRequest', 'ReportBadRequest',
+    'ReportGoodRequest', 'ReportBadRequest', 'BulkSolutionRequest',
     'ImageCaptchaTaskRequest', 'ImageCaptchaSolutionRequest',
     'RecaptchaV2TaskRequest', 'RecaptchaV2SolutionRequest',
     'RecaptchaV3TaskRequest', 'RecaptchaV3SolutionRequest',
@@ -38,6 +38,8 @@ def _decorator(cls):
     # pylint: disable=missing-function-docstring
     class Wrapper:
         """ A wrapper for *TaskRequest class """
+        IDEMPOTENT = cls.IDEMPOTENT
+
         def __init__(self, *args, **kwargs):
             self.decorated_obj = cls(*args, **kwargs)
 
@@ -0,0 +1,142 @@
+# -*- coding: UTF-8 -*-
+"""
+Circuit breaker
+"""
+
+import collections
+import enum
+import threading
+import time
+from typing import Deque, Optional, Tuple
+
+from ..exceptions import CircuitOpenError, NetworkError, ServiceTooBusy
+
+CIRCUIT_BREAKER_WINDOW = 60  # seconds of recent calls to calculate the failure rate for
+CIRCUIT_BREAKER_MIN_CALLS = 10  # min number of recent calls to open the circuit
+CIRCUIT_BREAKER_FAILURE_RATE = 0.5  # failure rate to open the circuit at
+CIRCUIT_BREAKER_OPEN_TIME = 30  # seconds to fail fast before probing the service again
+
+# exceptions showing the service is down
+CIRCUIT_BREAKER_FAILURES = (NetworkError, ServiceTooBusy)
+
+
+class CircuitState(str, enum.Enum):
+    """ Circuit breaker state """
+
+    CLOSED = 'closed'  # requests are sent
+    OPEN = 'open'  # requests fail fast
+    HALF_OPEN = 'half_open'  # the service is being probed
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a service.
+
+    The circuit opens when the failure rate of calls made within the last ``window`` seconds
+    reaches ``failure_rate``. While open, calls fail fast with CircuitOpenError. After
+    ``open_time`` seconds the circuit becomes half-open: the next caller probes the service,
+    and the circuit closes if the probe succeeds or opens again otherwise.
+
+    :param window: Seconds of recent calls to calculate the failure rate for.
+    :param min_calls: Min number of recent calls to open the circuit.
+    :param failure_rate: Failure rate to open the circuit at.
+    :param open_time: Seconds to fail fast before probing the service.
+    """
+
+    def __init__(self, window: float = CIRCUIT_BREAKER_WINDOW,
+                 min_calls: int = CIRCUIT_BREAKER_MIN_CALLS,
+                 failure_rate: float = CIRCUIT_BREAKER_FAILURE_RATE,
+                 open_time: float = CIRCUIT_BREAKER_OPEN_TIME):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate
+        self.open_time = open_time
+
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[float, bool]] = collections.deque()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._is_probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        """ Current state """
+        with self._lock:
+            return self._get_state()
+
+    @property
+    def failure_rate(self) -> float:
+        """ Failure rate of recent calls """
+        with self._lock:
+            self._drop_old_calls()
+            if not self._calls:
+                return 0.0
+            return sum(is_failure for _, is_failure in self._calls) / len(self._calls)
+
+    @property
+    def retry_after(self) -> float:
+        """ Seconds until the service is probed again (zero if the circuit is not open) """
+        with self._lock:
+            if self._get_state() is not CircuitState.OPEN:
+                return 0.0
+            return max(self._opened_at + self.open_time - time.monotonic(), 0.0)
+
+    def before_call(self) -> bool:
+        """
+        Checks if a call is allowed, raises CircuitOpenError otherwise.
+        Returns True if the caller must probe the service and report it with on_probe().
+        """
+
+        with self._lock:
+            state = self._get_state()
+            if state is CircuitState.CLOSED:
+                return False
+            if state is CircuitState.HALF_OPEN and not self._is_probing:
+                self._is_probing = True
+                return True
+
+        raise CircuitOpenError("The service is unavailable, the circuit breaker is open")
+
+    def on_probe(self, is_successful: bool):
+        """ Reports the result of the service probe """
+
+        with self._lock:
+            self._is_probing = False
+            if is_successful:
+                self._state = CircuitState.CLOSED
+                self._calls.clear()
+            else:
+                self._open()
+
+    def on_result(self, exc: Optional[BaseException] = None):
+        """ Reports the result of a call (an exception raised by the call if any) """
+
+        is_failure = isinstance(exc, CIRCUIT_BREAKER_FAILURES) and not isinstance(
+            exc, CircuitOpenError)
+
+        with self._lock:
+            self._calls.append((time.monotonic(), is_failure))
+            self._drop_old_calls()
+
+            if self._state is not CircuitState.CLOSED or len(self._calls) < self.min_calls:
+                return
+
+            failures = sum(is_failure for _, is_failure in self._calls)
+            if failures / len(self._calls) >= self.failure_rate_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+
+    def _get_state(self) -> CircuitState:
+        if (self._state is CircuitState.OPEN
+                and time.monotonic() - self._opened_at >= self.open_time):
+            self._state = CircuitState.HALF_OPEN
+        return self._state
+
+    def _drop_old_calls(self):
+        min_time = time.monotonic() - self.window
+        while self._calls and self._calls[0][0] < min_time:
+            self._calls.popleft()
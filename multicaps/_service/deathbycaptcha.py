@@ -3,9 +3,12 @@
 deathbycaptcha.com service
 """
 import json
+from typing import Optional
 
 from .base import HTTPService
-from .._transport.http_transport import HTTPRequestJSON  # type: ignore
+from .._transport.http_transport import (HTTPRequestJSON, HTTP_MULTIPART_MIN_SIZE,  # type: ignore
+                                         is_multipart_upload)
+from .._misc.image import ImageLimits
 from .. import exceptions
 from .._captcha import CaptchaType
 
@@ -176,6 +179,8 @@ class ReportBadRequest(PostRequest):
 class TaskRequest(PostRequest):
     """ Common Task Request class """
 
+    IDEMPOTENT = False  # a repeated request creates another task
+
     # pylint: disable=arguments-differ,unused-argument
     def prepare(self, captcha, proxy, user_agent, cookies):
         """ Prepare a request """
@@ -245,6 +250,13 @@ class SolutionRequest(GetRequest):
 class ImageCaptchaTaskRequest(TaskRequest):
     """ ImageCaptchaTask Request class """
 
+    # images accepted by the service
+    IMAGE_LIMITS = ImageLimits(max_size=180 * 1024,
+                               image_types=frozenset({'jpeg', 'png', 'gif', 'bmp'}))
+
+    # min image size to upload as a file (None to always send base64)
+    MULTIPART_MIN_SIZE: Optional[int] = HTTP_MULTIPART_MIN_SIZE
+
     # pylint: disable=arguments-differ,unused-argument,signature-differs
     def prepare(self, captcha, proxy, user_agent, cookies) -> dict:  # type: ignore
         """ Prepare request """
@@ -257,9 +269,12 @@ class ImageCaptchaTaskRequest(TaskRequest):
         )
 
         # add required params
-        request['data'].update(dict(
-            captchafile='base64:' + captcha.get_image_base64().decode('ascii')
-        ))
+        if is_multipart_upload(captcha.get_image_bytes(), self.MULTIPART_MIN_SIZE):
+            request['files'] = dict(captchafile=captcha.get_image_file())
+        else:
+            request['data'].update(dict(
+                captchafile='base64:' + captcha.get_image_base64().decode('ascii')
+            ))
         return request
 
 
@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+"""
+Dispatch tables of services
+"""
+
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType, ModuleType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+from .._captcha import CaptchaType
+from ..exceptions import UnicapsException
+
+
+@dataclass(frozen=True)
+class DispatchTable:
+    """
+    Request classes of a service module and the CAPTCHA types they support.
+
+    The table is built once per module, so requests don't look up the module attributes.
+    """
+
+    # request name (the class name without "Request" suffix) -> request class
+    request_classes: Mapping[str, type]
+    # supported CAPTCHA types in the order of CaptchaType
+    supported_captchas: Tuple[CaptchaType, ...]
+    supported_captcha_set: FrozenSet[CaptchaType]
+
+    @classmethod
+    def from_module(cls, module: ModuleType) -> 'DispatchTable':
+        """ Builds the table of the service module """
+
+        request_classes = {
+            name[:-len("Request")]: value for name, value in vars(module).items()
+            if name.endswith("Request") and isinstance(value, type)
+        }
+        supported_captchas = tuple(
+            captcha_type for captcha_type in CaptchaType
+            if f"{captcha_type.value}Task" in request_classes
+        )
+        return cls(
+            request_classes=MappingProxyType(request_classes),
+            supported_captchas=supported_captchas,
+            supported_captcha_set=frozenset(supported_captchas)
+        )
+
+    @property
+    def bulk_request_class(self) -> Optional[type]:
+        """ Request class polling several tasks at once (None if not supported) """
+        return self.request_classes.get("BulkSolution")
+
+    def get_request_class(self, request_name: str) -> type:
+        """ Returns the request class by the name without "Request" suffix """
+
+        try:
+            return self.request_classes[request_name]
+        except KeyError:
+            raise UnicapsException(
+                f"{request_name}Request is not supported by the current service!"
+            ) from None
+
+
+_DISPATCH_TABLES: Dict[str, DispatchTable] = {}
+_DISPATCH_TABLES_LOCK = threading.Lock()
+
+
+def get_dispatch_table(module: ModuleType) -> DispatchTable:
+    """ Returns the dispatch table of the service module (shared in the process) """
+
+    with _DISPATCH_TABLES_LOCK:
+        if module.__name__ not in _DISPATCH_TABLES:
+            _DISPATCH_TABLES[module.__name__] = DispatchTable.from_module(module)
+        return _DISPATCH_TABLES[module.__name__]
@@ -179,6 +179,8 @@ class ReportBadRequest(ResRequest):
 class TaskRequest(InRequest):
     """Common task request class."""
 
+    IDEMPOTENT = False  # a repeated request creates another task
+
     # pylint: disable=arguments-differ,unused-argument
     def prepare(self, captcha, proxy, user_agent, cookies):
         request = super().prepare(
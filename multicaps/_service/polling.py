@@ -0,0 +1,571 @@
+# -*- coding: UTF-8 -*-
+"""
+Solution polling stuff
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .._captcha import CaptchaType
+from .._misc.stats import SolveTimeStats
+from ..exceptions import SolutionNotReadyYet, SolutionWaitTimeout, CircuitOpenError
+
+BULK_POLLING_WINDOW = 1.0  # seconds to collect polls of concurrent tasks into one bulk request
+POLLING_JITTER = 0.1  # max deviation of polling delays (as a fraction of the delay)
+MAX_CONCURRENT_POLLS = 16  # max number of concurrent poll requests of the shared poller
+ADAPTIVE_POLLING_QUANTILES = (0.3, 0.6, 0.9)  # solve time quantiles to poll at
+ADAPTIVE_POLLING_MIN_SAMPLES = 20  # min number of solve times to start polling adaptively
+MIN_POLLING_INTERVAL = 1.0  # min seconds between adaptive polls
+SPECULATIVE_QUANTILE = 0.9  # solve time quantile to resubmit pending tasks after
+SPECULATIVE_MIN_SAMPLES = 20  # min number of solve times to start resubmitting tasks
+SPECULATIVE_MAX_PER_MINUTE = 5  # max number of resubmitted tasks per minute
+
+
+def iter_polling_delays(settings) -> Iterator[float]:
+    """ Yields delays before each poll according to the service settings """
+
+    yield settings.polling_delay
+    while True:
+        yield settings.polling_interval
+
+
+def get_solve_time(start_time: float, previous_poll_time: float, poll_time: float) -> float:
+    """
+    Returns the solve time of a task seen solved by the poll: the midpoint of the last poll
+    interval, as the task was solved somewhere between the previous poll and this one
+    """
+
+    return (max(previous_poll_time, start_time) + poll_time) / 2 - start_time
+
+
+class AdaptivePolling:
+    """
+    Picks polling delays from observed solve times.
+
+    Once there are enough solve times for the CAPTCHA type, the task is polled at the
+    ``quantiles`` of the solve time distribution (p30, p60 and p90 by default) and then
+    every ``polling_interval`` seconds. Until then the service settings are used.
+
+    :param stats: Solve time statistics (may be shared and persisted).
+    :param service_name: Name of the service to keep statistics for.
+    :param quantiles: Quantiles of solve time to poll at.
+    :param min_samples: Min number of solve times to use the quantiles.
+    """
+
+    def __init__(self, stats: SolveTimeStats, service_name: str,
+                 quantiles: Tuple[float, ...] = ADAPTIVE_POLLING_QUANTILES,
+                 min_samples: int = ADAPTIVE_POLLING_MIN_SAMPLES):
+        self.stats = stats
+        self.service_name = service_name
+        self.quantiles = tuple(sorted(quantiles))
+        self.min_samples = min_samples
+
+    def _get_key(self, captcha_type: CaptchaType) -> str:
+        return f"{self.service_name}:{captcha_type.value}"
+
+    def get_delays(self, captcha_type: CaptchaType, settings) -> Iterator[float]:
+        """ Yields delays before each poll of a task """
+
+        histogram = self.stats.get(self._get_key(captcha_type))
+        if histogram.count < self.min_samples:
+            yield from iter_polling_delays(settings)
+            return
+
+        checkpoints = [histogram.quantile(q) for q in self.quantiles]
+        elapsed = 0.0
+        for checkpoint in checkpoints:
+            delay = max(checkpoint - elapsed, MIN_POLLING_INTERVAL)
+            elapsed += delay
+            yield delay
+
+        while True:
+            yield max(settings.polling_interval, MIN_POLLING_INTERVAL)
+
+    def record(self, captcha_type: CaptchaType, solve_time: float):
+        """ Records solve time of a task """
+
+        self.stats.record(self._get_key(captcha_type), solve_time)
+
+    def save(self):
+        """ Saves statistics """
+
+        self.stats.save()
+
+
+class SpeculativeResubmission:
+    """
+    Decides when to resubmit tasks pending for too long.
+
+    Once a task is pending longer than the ``quantile`` of recent solve times of its CAPTCHA
+    type, a duplicate task is created and the first solution of the two wins. At most
+    ``max_per_minute`` duplicates are created per minute to cap the extra spend.
+
+    :param stats: Solve time statistics (may be shared with AdaptivePolling).
+    :param service_name: Name of the service to keep statistics for.
+    :param quantile: Quantile of solve time to resubmit the task after.
+    :param max_per_minute: Max number of duplicate tasks per minute.
+    :param min_samples: Min number of solve times to start resubmitting tasks.
+    """
+
+    def __init__(self, stats: SolveTimeStats, service_name: str,
+                 quantile: float = SPECULATIVE_QUANTILE,
+                 max_per_minute: int = SPECULATIVE_MAX_PER_MINUTE,
+                 min_samples: int = SPECULATIVE_MIN_SAMPLES):
+        self.stats = stats
+        self.service_name = service_name
+        self.quantile = quantile
+        self.max_per_minute = max_per_minute
+        self.min_samples = min_samples
+
+        self._resubmitted: Deque[float] = collections.deque()
+        self._lock = threading.Lock()
+
+    def _get_key(self, captcha_type: CaptchaType) -> str:
+        return f"{self.service_name}:{captcha_type.value}"
+
+    def get_threshold(self, captcha_type: CaptchaType) -> Optional[float]:
+        """ Returns seconds to resubmit a pending task after (None if unknown yet) """
+
+        histogram = self.stats.get(self._get_key(captcha_type))
+        if histogram.count < self.min_samples:
+            return None
+        return histogram.quantile(self.quantile)
+
+    def should_resubmit(self, captcha_type: CaptchaType, elapsed: float) -> bool:
+        """ Checks if a task pending for ``elapsed`` seconds must be resubmitted now """
+
+        threshold = self.get_threshold(captcha_type)
+        if threshold is None or elapsed < threshold:
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            while self._resubmitted and self._resubmitted[0] <= now - 60:
+                self._resubmitted.popleft()
+            if len(self._resubmitted) >= self.max_per_minute:
+                return False
+            self._resubmitted.append(now)
+            return True
+
+    def record(self, captcha_type: CaptchaType, solve_time: float):
+        """ Records solve time of a task """
+
+        self.stats.record(self._get_key(captcha_type), solve_time)
+
+
+class _Batch:  # pylint: disable=too-few-public-methods
+    """ Tasks to be polled with a single bulk request """
+
+    def __init__(self, future):
+        self.tasks = []
+        self.future = future
+
+
+class BulkPoller:
+    """
+    Coalesces solution polls of concurrent tasks into bulk requests.
+
+    The first poll opens a batch, all polls made within the next ``window`` seconds join it
+    and the whole batch is resolved with a single request to the service.
+
+    :param service: Service instance (must support bulk polling).
+    :param captcha_types: CAPTCHA types that can be polled in bulk.
+    :param max_batch_size: Max number of tasks per request.
+    :param window: Seconds to collect polls before sending a request.
+    """
+
+    def __init__(self, service, captcha_types: Iterable[CaptchaType], max_batch_size: int,
+                 window: float = BULK_POLLING_WINDOW):
+        self._service = service
+        self.captcha_types = frozenset(captcha_types)
+        self.max_batch_size = max_batch_size
+        self.window = window
+
+        self._lock = threading.Lock()
+        self._batch: Optional[_Batch] = None
+        self._async_batch: Optional[_Batch] = None
+
+    def accepts(self, task) -> bool:
+        """ Checks if the task can be polled in bulk """
+        return task.captcha.get_type() in self.captcha_types
+
+    def get_result(self, task) -> Optional[tuple]:
+        """
+        Gets the task result as a part of bulk request.
+        Returns None if the result can't be taken from the bulk response.
+        """
+
+        with self._lock:
+            batch = self._batch
+            is_leader = batch is None or len(batch.tasks) >= self.max_batch_size
+            if is_leader:
+                batch = self._batch = _Batch(concurrent.futures.Future())
+            batch.tasks.append(task)
+
+        if is_leader:
+            time.sleep(self.window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+
+            try:
+                batch.future.set_result(self._service.get_task_results(batch.tasks))
+            except Exception as exc:  # pylint: disable=broad-except
+                batch.future.set_exception(exc)
+
+        return self._pick_result(batch.future.result(), task)
+
+    async def get_result_async(self, task) -> Optional[tuple]:
+        """
+        Gets the task result as a part of bulk request (async).
+        Returns None if the result can't be taken from the bulk response.
+        """
+
+        loop = asyncio.get_running_loop()
+        batch = self._async_batch
+        if (batch is None or len(batch.tasks) >= self.max_batch_size
+                or batch.future.get_loop() is not loop):
+            batch = self._async_batch = _Batch(loop.create_future())
+            loop.create_task(self._flush_async(batch))
+        batch.tasks.append(task)
+
+        return self._pick_result(await asyncio.shield(batch.future), task)
+
+    async def _flush_async(self, batch: _Batch):
+        await asyncio.sleep(self.window)
+        if self._async_batch is batch:
+            self._async_batch = None
+
+        try:
+            batch.future.set_result(await self._service.get_task_results_async(batch.tasks))
+        except Exception as exc:  # pylint: disable=broad-except
+            batch.future.set_exception(exc)
+
+    @staticmethod
+    def _pick_result(results: Dict, task) -> Optional[tuple]:
+        result = results.get(task.task_id)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class _PollEntry:  # pylint: disable=too-few-public-methods
+    """ Pending task of the polling scheduler """
+
+    def __init__(self, task, future, settings, delays: Iterator[float], start_time: float):
+        self.task = task
+        self.future = future
+        self.settings = settings
+        self.delays = delays
+        self.start_time = start_time
+        self.polled_at = start_time  # time of the previous poll
+        self.deadline = start_time + settings.solution_timeout
+
+
+class AsyncPollingScheduler:
+    """
+    Polls all pending tasks of the service from a single coroutine.
+
+    Next polls are kept in a heap ordered by time, so there is only one timer per service
+    regardless of the number of tasks. Polling delays are spread with a random jitter and
+    the number of concurrent poll requests is limited (polls made in bulk are not limited
+    as they are coalesced into a few requests anyway).
+
+    :param service: Service instance.
+    :param max_concurrent_polls: Max number of concurrent poll requests.
+    :param jitter: Max deviation of polling delays as a fraction of the delay.
+    """
+
+    def __init__(self, service, max_concurrent_polls: int = MAX_CONCURRENT_POLLS,
+                 jitter: float = POLLING_JITTER):
+        self._service = service
+        self.max_concurrent_polls = max_concurrent_polls
+        self.jitter = jitter
+
+        self._heap: List[Tuple[float, int, _PollEntry]] = []
+        self._counter = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._polls: Set[asyncio.Task] = set()
+
+    @property
+    def pending_count(self) -> int:
+        """ Number of scheduled polls """
+        return len(self._heap)
+
+    def schedule(self, task) -> asyncio.Future:
+        """ Schedules polling of the task and returns a future of its result """
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._reset(loop)
+
+        captcha_type = task.captcha.get_type()
+        entry = _PollEntry(task, loop.create_future(), self._service.settings[captcha_type],
+                           self._service.get_polling_delays(captcha_type), loop.time())
+        self._push(entry, next(entry.delays))
+        return entry.future
+
+    def close(self):
+        """ Stops polling and cancels all pending futures """
+
+        if self._runner is not None:
+            self._runner.cancel()
+        for poll in self._polls:
+            poll.cancel()
+        for _, _, entry in self._heap:
+            entry.future.cancel()
+        self._heap.clear()
+        self._loop = None
+
+    def _reset(self, loop: asyncio.AbstractEventLoop):
+        # futures of the previous event loop can't be resolved anymore
+        self._heap.clear()
+        self._loop = loop
+        self._runner = None
+        self._polls = set()
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_polls)
+
+    def _push(self, entry: _PollEntry, delay: float):
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        heapq.heappush(self._heap, (self._loop.time() + delay, next(self._counter), entry))
+
+        if self._runner is None or self._runner.done():
+            self._runner = self._loop.create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self):
+        while self._heap:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - self._loop.time()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, entry = heapq.heappop(self._heap)
+            if entry.future.done():  # cancelled by the caller
+                continue
+
+            if self._loop.time() > entry.deadline:
+                entry.future.set_exception(SolutionWaitTimeout(
+                    f"Couldn't receive a solution in {entry.settings.solution_timeout} seconds!"
+                ))
+                continue
+
+            is_limited = not self._service.can_poll_in_bulk(entry.task)
+            if is_limited:
+                await self._semaphore.acquire()
+            poll = self._loop.create_task(self._poll(entry, is_limited))
+            self._polls.add(poll)
+            poll.add_done_callback(self._polls.discard)
+
+    async def _poll(self, entry: _PollEntry, is_limited: bool):
+        poll_time = self._loop.time()
+        try:
+            result = await entry.task.get_result()
+        except (SolutionNotReadyYet, CircuitOpenError):
+            entry.polled_at = poll_time
+            if not entry.future.done():
+                self._push(entry, next(entry.delays))
+        except Exception as exc:  # pylint: disable=broad-except
+            if not entry.future.done():
+                entry.future.set_exception(exc)
+        else:
+            self._service.record_solve_time(
+                entry.task, get_solve_time(entry.start_time, entry.polled_at, poll_time)
+            )
+            if not entry.future.done():
+                entry.future.set_result(result)
+        finally:
+            if is_limited:
+                self._semaphore.release()
+
+
+class PollingThread:
+    """
+    Schedules polls of all pending tasks of the service from a single daemon thread.
+
+    Next polls are kept in a heap ordered by time. The scheduler thread doesn't send
+    requests itself: due polls are sent by a small pool of ``max_concurrent_polls`` threads
+    (started with the scheduler), so one slow response doesn't hold back the other polls.
+    Due tasks that can be polled in bulk are polled together with bulk requests. Waiting
+    callers block on the future of their task only.
+
+    :param service: Service instance.
+    :param max_concurrent_polls: Max number of concurrent poll requests.
+    :param jitter: Max deviation of polling delays as a fraction of the delay.
+    """
+
+    def __init__(self, service, max_concurrent_polls: int = MAX_CONCURRENT_POLLS,
+                 jitter: float = POLLING_JITTER):
+        self._service = service
+        self.max_concurrent_polls = max_concurrent_polls
+        self.jitter = jitter
+
+        self._heap: List[Tuple[float, int, _PollEntry]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._is_closed = False
+
+    @property
+    def pending_count(self) -> int:
+        """ Number of scheduled polls """
+        return len(self._heap)
+
+    def schedule(self, task) -> concurrent.futures.Future:
+        """ Schedules polling of the task and returns a future of its result """
+
+        captcha_type = task.captcha.get_type()
+        entry = _PollEntry(task, concurrent.futures.Future(),
+                           self._service.settings[captcha_type],
+                           self._service.get_polling_delays(captcha_type), time.monotonic())
+
+        with self._condition:
+            self._is_closed = False
+            if self._thread is None or not self._thread.is_alive():
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrent_polls,
+                    thread_name_prefix='multicaps-poll'
+                )
+                self._thread = threading.Thread(target=self._run, name='multicaps-poller',
+                                                daemon=True)
+                self._thread.start()
+            self._push(entry, next(entry.delays))
+        return entry.future
+
+    def close(self):
+        """ Stops polling and cancels all pending futures """
+
+        with self._condition:
+            self._is_closed = True
+            thread, self._thread = self._thread, None
+            executor, self._executor = self._executor, None
+            for _, _, entry in self._heap:
+                entry.future.cancel()
+            self._heap.clear()
+            self._condition.notify_all()
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if executor is not None:
+            # submitted polls are finished, so their futures are resolved or cancelled
+            executor.shutdown(wait=False)
+
+    def _push(self, entry: _PollEntry, delay: float):
+        # must be called with the condition acquired
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), entry))
+        self._condition.notify()
+
+    def _reschedule(self, entry: _PollEntry, poll_time: float):
+        entry.polled_at = poll_time
+        with self._condition:
+            if self._is_closed:
+                entry.future.cancel()  # polls in flight finish after close()
+            elif not entry.future.done():
+                self._push(entry, next(entry.delays))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # the thread stops once it isn't the poller of the service (closed or replaced
+                # by schedule() right after close())
+                while self._thread is threading.current_thread() and (
+                        not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._condition.wait(self._heap[0][0] - time.monotonic()
+                                         if self._heap else None)
+                if self._thread is not threading.current_thread():
+                    return
+
+                # due polls are submitted under the lock, so the executor isn't shut down
+                # by close() meanwhile
+                now = time.monotonic()
+                bulk_entries = []
+                while self._heap and self._heap[0][0] <= now:
+                    entry = heapq.heappop(self._heap)[2]
+                    if entry.future.done():  # cancelled by the caller
+                        continue
+                    if now > entry.deadline:
+                        _set_future_exception(entry.future, SolutionWaitTimeout(
+                            f"Couldn't receive a solution in {entry.settings.solution_timeout} "
+                            f"seconds!"
+                        ))
+                    elif self._service.can_poll_in_bulk(entry.task):
+                        bulk_entries.append(entry)
+                    else:
+                        self._executor.submit(self._poll, entry)  # type: ignore
+
+                if bulk_entries:
+                    self._executor.submit(self._poll_bulk, bulk_entries)  # type: ignore
+
+    def _poll(self, entry: _PollEntry, bulk: bool = True):
+        poll_time = time.monotonic()
+        try:
+            if bulk:
+                result = entry.task.get_result()
+            else:
+                result = self._service.get_task_result(entry.task, bulk=False)
+                entry.task._result = result  # pylint: disable=protected-access
+        except (SolutionNotReadyYet, CircuitOpenError):
+            self._reschedule(entry, poll_time)
+        except Exception as exc:  # pylint: disable=broad-except
+            _set_future_exception(entry.future, exc)
+        else:
+            self._set_result(entry, result, poll_time)
+
+    def _poll_bulk(self, entries: List[_PollEntry]):
+        poll_time = time.monotonic()
+        try:
+            results = self._service.get_task_results([entry.task for entry in entries])
+        except CircuitOpenError:
+            for entry in entries:
+                self._reschedule(entry, poll_time)
+            return
+        except Exception as exc:  # pylint: disable=broad-except
+            for entry in entries:
+                _set_future_exception(entry.future, exc)
+            return
+
+        for entry in entries:
+            result = results.get(entry.task.task_id)
+            if result is None:
+                # the result is unknown, poll the task alone (not with another bulk request)
+                self._poll(entry, bulk=False)
+            elif isinstance(result, SolutionNotReadyYet):
+                self._reschedule(entry, poll_time)
+            elif isinstance(result, Exception):
+                _set_future_exception(entry.future, result)
+            else:
+                entry.task._result = result  # pylint: disable=protected-access
+                self._set_result(entry, result, poll_time)
+
+    def _set_result(self, entry: _PollEntry, result: tuple, poll_time: float):
+        self._service.record_solve_time(
+            entry.task, get_solve_time(entry.start_time, entry.polled_at, poll_time)
+        )
+        try:
+            entry.future.set_result(result)
+        except concurrent.futures.InvalidStateError:  # cancelled
+            pass
+
+
+def _set_future_exception(future: concurrent.futures.Future, exc: BaseException):
+    try:
+        future.set_exception(exc)
+    except concurrent.futures.InvalidStateError:  # cancelled
+        pass
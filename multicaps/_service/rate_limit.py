@@ -0,0 +1,230 @@
+# -*- coding: UTF-8 -*-
+"""
+Request rate limiting
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+RATE_LIMIT_CREATE = 5.0  # default max task creations per second
+RATE_LIMIT_POLL = 10.0  # default max other requests (polls, etc.) per second
+RATE_LIMIT_DECREASE = 0.5  # the rate is multiplied by this factor on "too many requests" error
+RATE_LIMIT_MIN_FRACTION = 0.05  # min rate as a fraction of the max rate
+RATE_LIMIT_RECOVERY = 0.01  # fraction of the max rate recovered per second
+BUSY_BACKOFF_MIN = 5.0  # seconds to pause task creation after "no slots" error
+BUSY_BACKOFF_MAX = 60.0  # max pause of task creation while the service stays busy
+BUSY_DRAIN_INTERVAL = 0.2  # seconds between queued task creations after the pause
+
+
+class TokenBucket:
+    """
+    Token bucket with adaptive rate.
+
+    The rate is decreased by throttle() and then slowly recovers up to ``max_rate``.
+    Callers reserve tokens and wait for the returned delay, so concurrent callers are queued
+    instead of racing for the same token.
+
+    :param max_rate: Max tokens per second.
+    :param burst: (optional) Bucket size (the max rate rounded up by default).
+    """
+
+    def __init__(self, max_rate: float, burst: Optional[float] = None):
+        self.max_rate = max_rate
+        self.burst = burst or max(int(max_rate + 0.99), 1)
+        self._is_default_burst = not burst
+        self._rate = max_rate
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """ Current tokens per second """
+        with self._lock:
+            self._refill()
+            return self._rate
+
+    def reserve(self) -> float:
+        """ Takes a token and returns seconds to wait before using it """
+
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def throttle(self):
+        """ Decreases the rate and drops accumulated tokens """
+
+        with self._lock:
+            self._refill()
+            self._rate = max(self._rate * RATE_LIMIT_DECREASE,
+                             self.max_rate * RATE_LIMIT_MIN_FRACTION)
+            self._tokens = min(self._tokens, 0.0)
+
+    def set_max_rate(self, max_rate: float):
+        """ Changes the max rate (and the default bucket size) keeping accumulated tokens """
+
+        with self._lock:
+            self._refill()
+            # a throttled rate stays throttled by the same factor
+            self._rate *= max_rate / self.max_rate
+            self.max_rate = max_rate
+            if self._is_default_burst:
+                self.burst = max(int(max_rate + 0.99), 1)
+            self._tokens = min(self._tokens, self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+
+        self._rate = min(self._rate + self.max_rate * RATE_LIMIT_RECOVERY * elapsed,
+                         self.max_rate)
+        self._tokens = min(self._tokens + elapsed * self._rate, self.burst)
+
+
+class RateLimiter:
+    """
+    Rate limiter of an API key with separate buckets for task creation and other requests.
+
+    :param create_rate: Max task creations per second.
+    :param poll_rate: Max other requests (polls, etc.) per second.
+    """
+
+    def __init__(self, create_rate: float = RATE_LIMIT_CREATE,
+                 poll_rate: float = RATE_LIMIT_POLL):
+        self.create_bucket = TokenBucket(create_rate)
+        self.poll_bucket = TokenBucket(poll_rate)
+
+    @property
+    def rates(self) -> Tuple[float, float]:
+        """ Max task creations and other requests per second """
+        return self.create_bucket.max_rate, self.poll_bucket.max_rate
+
+    def set_rates(self, create_rate: float, poll_rate: float):
+        """ Changes max task creations and other requests per second """
+
+        if create_rate != self.create_bucket.max_rate:
+            self.create_bucket.set_max_rate(create_rate)
+        if poll_rate != self.poll_bucket.max_rate:
+            self.poll_bucket.set_max_rate(poll_rate)
+
+    def get_bucket(self, is_task_creation: bool) -> TokenBucket:
+        """ Returns the bucket for the request kind """
+        return self.create_bucket if is_task_creation else self.poll_bucket
+
+    def reserve(self, is_task_creation: bool) -> float:
+        """ Takes a token and returns seconds to wait before making the request """
+        return self.get_bucket(is_task_creation).reserve()
+
+    def throttle(self, is_task_creation: bool):
+        """ Decreases the rate after "too many requests" error """
+        self.get_bucket(is_task_creation).throttle()
+
+
+class BusyGate:
+    """
+    Pauses task creation while the service has no free slots.
+
+    A "no slots" error pauses all new tasks for ``min_backoff`` seconds, the pause doubles
+    (up to ``max_backoff``) if the service is still busy right after it. Callers arriving during
+    the pause are queued and released one by one every ``drain_interval`` seconds.
+
+    :param min_backoff: Seconds to pause task creation for.
+    :param max_backoff: Max seconds to pause task creation for.
+    :param drain_interval: Seconds between queued callers released after the pause.
+    """
+
+    def __init__(self, min_backoff: float = BUSY_BACKOFF_MIN,
+                 max_backoff: float = BUSY_BACKOFF_MAX,
+                 drain_interval: float = BUSY_DRAIN_INTERVAL):
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.drain_interval = drain_interval
+
+        self._backoff = min_backoff
+        self._paused_until = float('-inf')
+        self._next_slot = float('-inf')
+        self._lock = threading.Lock()
+
+    @property
+    def is_paused(self) -> bool:
+        """ Whether task creation is paused """
+        return time.monotonic() < self._paused_until
+
+    @property
+    def backoff(self) -> float:
+        """ Current pause length """
+        return self._backoff
+
+    def reserve(self) -> float:
+        """ Takes a place in the queue and returns seconds to wait before creating a task """
+
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._paused_until and now >= self._next_slot:
+                return 0.0
+
+            slot = max(now, self._paused_until, self._next_slot)
+            self._next_slot = slot + self.drain_interval
+            return slot - now
+
+    def on_busy(self):
+        """ Pauses task creation after "no slots" error """
+
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                # a response to a request sent before the pause
+                return
+
+            if now <= self._paused_until + self._backoff:
+                # still busy right after the pause
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+            else:
+                self._backoff = self.min_backoff
+            self._paused_until = now + self._backoff
+
+    def on_success(self):
+        """ Resets the pause length after a task is created """
+
+        with self._lock:
+            self._backoff = self.min_backoff
+
+
+_RATE_LIMITERS: Dict[Tuple[str, str], RateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(service_name: str, api_key: str,
+                     rates: Optional[Tuple[float, float]] = None) -> RateLimiter:
+    """
+    Returns the rate limiter of the API key (shared in the process).
+
+    ``rates`` are max task creations and other requests per second. If the limiter already
+    exists, the given rates replace its rates (they apply to all solvers sharing it), while
+    None keeps them. A new limiter gets the default rates if None.
+    """
+
+    with _RATE_LIMITERS_LOCK:
+        key = (service_name, api_key)
+        if key not in _RATE_LIMITERS:
+            _RATE_LIMITERS[key] = RateLimiter(*(rates or ()))
+        elif rates is not None:
+            _RATE_LIMITERS[key].set_rates(*rates)
+        return _RATE_LIMITERS[key]
+
+
+_BUSY_GATES: Dict[str, BusyGate] = {}
+
+
+def get_busy_gate(service_name: str) -> BusyGate:
+    """ Returns the busy gate of the service (shared in the process) """
+
+    with _RATE_LIMITERS_LOCK:
+        if service_name not in _BUSY_GATES:
+            _BUSY_GATES[service_name] = BusyGate()
+        return _BUSY_GATES[service_name]
@@ -6,7 +6,7 @@ sctg.xyz service
 # pylint: disable=unused-import
 from .twocaptcha import (
     Service as Service2Captcha, GetBalanceRequest, GetStatusRequest,
-    ReportGoodRequest, ReportBadRequest,
+    ReportGoodRequest, ReportBadRequest, BulkSolutionRequest,
     TaskRequest as BaseTaskRequest, SolutionRequest as BaseSolutionRequest,
     ImageCaptchaTaskRequest as BaseImageCaptchaTaskRequest, ImageCaptchaSolutionRequest,
     RecaptchaV2TaskRequest as BaseRecaptchaV2TaskRequest, RecaptchaV2SolutionRequest,
@@ -23,7 +23,7 @@ from .twocaptcha import (
 
 __all__ = [
     'Service', 'GetBalanceRequest', 'GetStatusRequest',
-    'ReportGoodRequest', 'ReportBadRequest',
+    'ReportGoodRequest', 'ReportBadRequest', 'BulkSolutionRequest',
     'ImageCaptchaTaskRequest', 'ImageCaptchaSolutionRequest',
     'RecaptchaV2TaskRequest', 'RecaptchaV2SolutionRequest',
     'RecaptchaV3TaskRequest', 'RecaptchaV3SolutionRequest',
@@ -45,8 +45,8 @@ class Service(Service2Captcha):
     BASE_URL = 'http://api.sctg.xyz'
     SOFT_ID_SUFFIX = '|SOFTID697985346'
 
-    def __init__(self, api_key: str):
-        super().__init__(self._with_soft_id(api_key))
+    def __init__(self, api_key: str, **kwargs):
+        super().__init__(self._with_soft_id(api_key), **kwargs)
 
     @classmethod
     def _with_soft_id(cls, api_key: str) -> str:
@@ -2,16 +2,22 @@
 """
 2captcha.com service
 """
-SOFT_ID = 4745
+
+from typing import Optional
+
 from .base import HTTPService
-from .._transport.http_transport import HTTPRequestJSON  # type: ignore
+from .._transport.http_transport import (HTTPRequestJSON, HTTP_MULTIPART_MIN_SIZE,  # type: ignore
+                                         is_multipart_upload)
+from .._misc.image import ImageLimits
 from .. import exceptions
 from .._captcha import CaptchaType
 from ..common import CaptchaAlphabet
 
+SOFT_ID = 4745
+
 __all__ = [
     'Service', 'GetBalanceRequest', 'GetStatusRequest',
-    'ReportGoodRequest', 'ReportBadRequest',
+    'ReportGoodRequest', 'ReportBadRequest', 'BulkSolutionRequest',
     'ImageCaptchaTaskRequest', 'ImageCaptchaSolutionRequest',
     'RecaptchaV2TaskRequest', 'RecaptchaV2SolutionRequest',
     'RecaptchaV3TaskRequest', 'RecaptchaV3SolutionRequest',
@@ -59,42 +65,41 @@ class Request(HTTPRequestJSON):
         if response_data.pop("status") == 1:
             return response_data
 
-        ###############
-        # handle errors
-        ###############
-        error_code = response_data["request"]
-        error_text = response_data.get("error_text", "")
+        raise self.get_exception(response_data["request"], response_data.get("error_text", ""))
+
+    @staticmethod
+    def get_exception(error_code: str, error_text: str = "") -> exceptions.UnicapsException:
+        """ Returns an exception that corresponds to the error code """
+
         error_msg = f"{error_code}: {error_text}"
 
-        if error_code == 'CAPCHA_NOT_READY':  # pylint: disable=no-else-raise
-            raise exceptions.SolutionNotReadyYet()
-        elif error_code in ('ERROR_WRONG_USER_KEY', 'ERROR_KEY_DOES_NOT_EXIST',
-                            'ERROR_IP_NOT_ALLOWED', 'IP_BANNED'):
-            raise exceptions.AccessDeniedError(error_msg)
-        elif error_code in ('ERROR_ZERO_BALANCE',):
-            raise exceptions.LowBalanceError(error_msg)
-        elif error_code in ('ERROR_NO_SLOT_AVAILABLE',):
-            # If server returns ERROR_NO_SLOT_AVAILABLE make a 5 seconds timeout before sending
-            # next request.
-            # time.sleep(5)
-            raise exceptions.ServiceTooBusy(error_msg)
-        elif error_code in ('MAX_USER_TURN',) or error_code.startswith('ERROR:'):
-            raise exceptions.TooManyRequestsError(error_msg)
-        elif error_code in ('ERROR_WRONG_ID_FORMAT', 'ERROR_WRONG_CAPTCHA_ID'):
-            raise exceptions.MalformedRequestError(error_msg)
-        elif error_code in ('ERROR_ZERO_CAPTCHA_FILESIZE', 'ERROR_TOO_BIG_CAPTCHA_FILESIZE',
-                            'ERROR_WRONG_FILE_EXTENSION', 'ERROR_IMAGE_TYPE_NOT_SUPPORTED',
-                            'ERROR_UPLOAD', 'ERROR_PAGEURL', 'ERROR_BAD_TOKEN_OR_PAGEURL',
-                            'ERROR_GOOGLEKEY', 'ERROR_BAD_PARAMETERS', 'ERROR_TOKEN_EXPIRED',
-                            'ERROR_EMPTY_ACTION'):
-            raise exceptions.BadInputDataError(error_msg)
-        elif error_code in ('ERROR_CAPTCHAIMAGE_BLOCKED', 'ERROR_CAPTCHA_UNSOLVABLE',
-                            'ERROR_BAD_DUPLICATES'):
-            raise exceptions.UnableToSolveError(error_msg)
-        elif error_code in ('ERROR_BAD_PROXY', 'ERROR_PROXY_CONNECTION_FAILED'):
-            raise exceptions.ProxyError(error_msg)
-
-        raise exceptions.ServiceError(error_msg)
+        if error_code == 'CAPCHA_NOT_READY':
+            return exceptions.SolutionNotReadyYet()
+        if error_code in ('ERROR_WRONG_USER_KEY', 'ERROR_KEY_DOES_NOT_EXIST',
+                          'ERROR_IP_NOT_ALLOWED', 'IP_BANNED'):
+            return exceptions.AccessDeniedError(error_msg)
+        if error_code in ('ERROR_ZERO_BALANCE',):
+            return exceptions.LowBalanceError(error_msg)
+        if error_code in ('ERROR_NO_SLOT_AVAILABLE',):
+            # new tasks are held back by BusyGate of the service (if enabled)
+            return exceptions.ServiceTooBusy(error_msg)
+        if error_code in ('MAX_USER_TURN',) or error_code.startswith('ERROR:'):
+            return exceptions.TooManyRequestsError(error_msg)
+        if error_code in ('ERROR_WRONG_ID_FORMAT', 'ERROR_WRONG_CAPTCHA_ID'):
+            return exceptions.MalformedRequestError(error_msg)
+        if error_code in ('ERROR_ZERO_CAPTCHA_FILESIZE', 'ERROR_TOO_BIG_CAPTCHA_FILESIZE',
+                          'ERROR_WRONG_FILE_EXTENSION', 'ERROR_IMAGE_TYPE_NOT_SUPPORTED',
+                          'ERROR_UPLOAD', 'ERROR_PAGEURL', 'ERROR_BAD_TOKEN_OR_PAGEURL',
+                          'ERROR_GOOGLEKEY', 'ERROR_BAD_PARAMETERS', 'ERROR_TOKEN_EXPIRED',
+                          'ERROR_EMPTY_ACTION'):
+            return exceptions.BadInputDataError(error_msg)
+        if error_code in ('ERROR_CAPTCHAIMAGE_BLOCKED', 'ERROR_CAPTCHA_UNSOLVABLE',
+                          'ERROR_BAD_DUPLICATES'):
+            return exceptions.UnableToSolveError(error_msg)
+        if error_code in ('ERROR_BAD_PROXY', 'ERROR_PROXY_CONNECTION_FAILED'):
+            return exceptions.ProxyError(error_msg)
+
+        return exceptions.ServiceError(error_msg)
 
 
 class InRequest(Request):
@@ -203,6 +208,8 @@ class ReportBadRequest(ResRequest):
 class TaskRequest(InRequest):
     """ Common Task Request class """
 
+    IDEMPOTENT = False  # a repeated request creates another task
+
     # pylint: disable=arguments-differ,unused-argument
     def prepare(self, captcha, proxy, user_agent, cookies):
         """ Prepare a request """
@@ -298,9 +305,68 @@ class SolutionRequest(ResRequest):
         )
 
 
+class BulkSolutionRequest(ResRequest):
+    """ Solution request for several tasks at once (action=get&ids=...) """
+
+    # the bulk response contains plain answers only, so CAPTCHAs with structured
+    # solutions or extra fields in the single response (useragent, respKey) are
+    # polled one by one
+    CAPTCHA_TYPES = (CaptchaType.IMAGE, CaptchaType.TEXT, CaptchaType.RECAPTCHAV2,
+                     CaptchaType.RECAPTCHAV3, CaptchaType.FUNCAPTCHA)
+    MAX_TASKS = 100  # max number of task IDs in one request
+
+    # pylint: disable=arguments-differ
+    def prepare(self, tasks) -> dict:  # type: ignore
+        """ Prepare request """
+
+        request = super().prepare(tasks=tasks)
+        request["params"].update(
+            dict(action="get", ids=','.join(task.task_id for task in tasks))
+        )
+        return request
+
+    def parse_response(self, response) -> dict:
+        """
+        Parse response and return a dict of results by task ID. A result is either a dict
+        with solution data or an exception. Tasks which answers can't be recognized are
+        absent in the dict.
+        """
+
+        tasks = self.source_data['tasks']
+
+        try:
+            response_data = super().parse_response(response)
+        except exceptions.SolutionNotReadyYet:
+            return {task.task_id: exceptions.SolutionNotReadyYet() for task in tasks}
+
+        answers = str(response_data.pop("request")).split('|')
+        # an answer may contain the separator itself
+        if len(answers) != len(tasks):
+            return {}
+
+        results = {}
+        for task, answer in zip(tasks, answers):
+            if answer == 'CAPCHA_NOT_READY' or answer.startswith('ERROR'):
+                results[task.task_id] = self.get_exception(answer)
+            else:
+                results[task.task_id] = dict(
+                    solution=task.captcha.get_solution_class()(answer),
+                    cost=None,
+                    extra={}
+                )
+        return results
+
+
 class ImageCaptchaTaskRequest(TaskRequest):
     """ ImageCaptchaTask Request class """
 
+    # images accepted by the service
+    IMAGE_LIMITS = ImageLimits(max_size=100 * 1024,
+                               image_types=frozenset({'jpeg', 'png', 'gif'}))
+
+    # min image size to upload as a file (None to always send base64)
+    MULTIPART_MIN_SIZE: Optional[int] = HTTP_MULTIPART_MIN_SIZE
+
     # pylint: disable=arguments-differ,unused-argument,signature-differs
     def prepare(self, captcha, proxy, user_agent, cookies) -> dict:  # type: ignore
         """ Prepare request """
@@ -313,12 +379,16 @@ class ImageCaptchaTaskRequest(TaskRequest):
         )
 
         # add required params
-        request['data'].update(
-            dict(
-                method="base64",
-                body=captcha.get_image_base64().decode('ascii')
+        if is_multipart_upload(captcha.get_image_bytes(), self.MULTIPART_MIN_SIZE):
+            request['data']['method'] = "post"
+            request['files'] = dict(file=captcha.get_image_file())
+        else:
+            request['data'].update(
+                dict(
+                    method="base64",
+                    body=captcha.get_image_base64().decode('ascii')
+                )
             )
-        )
 
         # add optional params
         request['data'].update(
@@ -2,17 +2,20 @@
 """
 CaptchaSolver class
 """
+import collections
+import concurrent.futures
 import io
 import pathlib
-from typing import Union
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Union
 
-from .captcha import (
-    ImageCaptcha, TextCaptcha, RecaptchaV2, RecaptchaV3, HCaptcha, FunCaptcha, KeyCaptcha, GeeTest,
-    GeeTestV4, CapyPuzzle, TikTokCaptcha, TurnstileCaptcha
-)
+from ._batch import BatchItem, BatchResult, BATCH_CONCURRENCY
+from ._captcha import CaptchaType, get_captcha_class
 from ._captcha.base import BaseCaptcha  # type: ignore
+from ._misc.proxy import ProxyServer
 from ._service import CaptchaSolvingService, SOLVING_SERVICE
 from ._service.base import SolvedCaptcha, CaptchaTask
+from .exceptions import UnicapsException
 
 
 class CaptchaSolver:
@@ -20,9 +23,49 @@ class CaptchaSolver:
 
     :param service_name: captcha solving service to use (enum CaptchaSolvingService or str).
     :param api_key: API key to access the solving service.
+    :param bulk_polling: (optional) Poll results of concurrent tasks with bulk requests
+        (2captcha-like services only, the cost of solved CAPTCHAs is unknown in this mode).
+    :param shared_polling: (optional) Poll all pending tasks of the solver from a single
+        scheduler (a coroutine or a daemon thread) instead of a polling loop per task.
+        The sync scheduler thread sends due polls via a pool of max_concurrent_polls
+        threads, so a slow response doesn't delay the other polls.
+    :param max_concurrent_polls: (optional) Max number of concurrent poll requests of
+        the shared poller.
+    :param adaptive_polling: (optional) Poll tasks at quantiles of observed solve times
+        (True to keep statistics in memory or a path to the file to persist them).
+    :param circuit_breaker: (optional) Fail fast with CircuitOpenError while the service
+        is down (too many network errors or "no slots" responses recently).
+    :param rate_limit: (optional) Limit the request rate of the API key (shared by all solvers
+        in the process), slowing down on "too many requests" errors. True for default limits
+        or a tuple of max task creations and other requests per second (replacing the limits
+        set by other solvers of the API key).
+    :param busy_backoff: (optional) Pause creation of new tasks of all solvers in the process
+        when the service reports no free slots, queueing callers instead of failing.
+    :param busy_max_wait: (optional) Max seconds to wait for free slots of the service
+        (unlimited by default), ServiceTooBusy is raised then.
+    :param speculative_resubmit: (optional) Submit a duplicate of a task pending longer than
+        the quantile (0.9 if True) of recent solve times of its CAPTCHA type, the first solution
+        wins (can't be used with shared_polling).
+    :param speculative_max_per_minute: (optional) Max number of duplicate tasks per minute.
+    :param http2: (optional) Use HTTP/2, so concurrent requests share one connection
+        (on by default for services available via HTTPS).
+    :param max_connections: (optional) Max number of connections to the service.
+    :param max_keepalive_connections: (optional) Max number of idle connections kept alive.
+    :param keepalive_expiry: (optional) Seconds to keep an idle connection alive.
+    :param image_preprocessing: (optional) Shrink images to fit limits of the service with
+        ImagePreprocessor (requires Pillow), or pass your own one (see multicaps.image).
+        Images still not fitting the limits fail with BadInputDataError before uploading.
+    :param solution_cache: (optional) Reuse solutions of repeated image and text CAPTCHAs
+        kept in memory, or pass a cache to share or persist them (see multicaps.cache).
+    :param similar_images: (optional) Reuse solutions of near-duplicate images (e.g. re-encoded
+        ones) found by perceptual hashes (requires NumPy and Pillow), or pass your own
+        PerceptualIndex (see multicaps.cache). Enables the solution cache.
+    :param max_workers: (optional) Max number of threads solving CAPTCHAs submitted
+        with submit(), map() and as_completed().
     """
 
-    def __init__(self, service_name: Union[CaptchaSolvingService, str], api_key: str):
+    def __init__(self, service_name: Union[CaptchaSolvingService, str], api_key: str,
+                 max_workers: int = BATCH_CONCURRENCY, **kwargs):
         # check service_name
         if isinstance(service_name, CaptchaSolvingService):
             self.service_name = service_name
@@ -42,20 +85,63 @@ class CaptchaSolver:
             )
 
         self.api_key = api_key
-        self._service = SOLVING_SERVICE[self.service_name].Service(api_key)  # type: ignore
+        self._service = SOLVING_SERVICE[self.service_name].Service(  # type: ignore
+            api_key, **kwargs
+        )
 
-    def _solve_captcha(self, captcha_class, *args, **kwargs):
+        self._init_executor(max_workers)
+
+    def _init_executor(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='multicaps'
+                )
+            return self._executor
+
+    def _shutdown_executor(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _solve_captcha(self, captcha_type: CaptchaType, *args, **kwargs):
         proxy = kwargs.pop('proxy') if 'proxy' in kwargs else None
         user_agent = kwargs.pop('user_agent') if 'user_agent' in kwargs else None
         cookies = kwargs.pop('cookies') if 'cookies' in kwargs else None
 
+        captcha_class = get_captcha_class(captcha_type)
+        return self._solve(captcha_class(*args, **kwargs), proxy, user_agent, cookies)
+
+    def _solve(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer],
+               user_agent: Optional[str], cookies: Optional[Dict[str, str]]) -> SolvedCaptcha:
         return self._service.solve_captcha(
-            captcha_class(*args, **kwargs),
+            captcha,
             proxy=proxy,
             user_agent=user_agent,
             cookies=cookies
         )
 
+    def solve_captcha(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer] = None,
+                      user_agent: Optional[str] = None,
+                      cookies: Optional[Dict[str, str]] = None) -> SolvedCaptcha:
+        r"""Solves CAPTCHA object of any type.
+
+        :param captcha: Captcha to solve.
+        :param proxy: (optional) Proxy to use while solving the CAPTCHA.
+        :param user_agent: (optional) User-Agent to use while solving the CAPTCHA.
+        :param cookies: (optional) Cookies to use while solving the CAPTCHA.
+        :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
+        :rtype: multicaps.SolvedCaptcha
+        """
+        return self._solve(captcha, proxy, user_agent, cookies)
+
     def solve_image_captcha(self,
                             image: Union[bytes, io.RawIOBase, io.BufferedIOBase, pathlib.Path],
                             **kwargs) -> SolvedCaptcha:
@@ -75,7 +161,7 @@ class CaptchaSolver:
         :rtype: multicaps.SolvedCaptcha
         """
 
-        return self._solve_captcha(ImageCaptcha, image, **kwargs)
+        return self._solve_captcha(CaptchaType.IMAGE, image, **kwargs)
 
     def solve_text_captcha(self, text: str, **kwargs) -> SolvedCaptcha:
         r"""Solves text CAPTCHA.
@@ -86,7 +172,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(TextCaptcha, text, **kwargs)
+        return self._solve_captcha(CaptchaType.TEXT, text, **kwargs)
 
     def solve_recaptcha_v2(self, site_key: str, page_url: str, **kwargs) -> SolvedCaptcha:
         r"""Solves reCAPTCHA v2.
@@ -103,7 +189,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(RecaptchaV2, site_key, page_url, **kwargs)
+        return self._solve_captcha(CaptchaType.RECAPTCHAV2, site_key, page_url, **kwargs)
 
     def solve_recaptcha_v3(self, site_key: str, page_url: str, **kwargs) -> SolvedCaptcha:
         r"""Solves reCAPTCHA v3.
@@ -120,7 +206,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(RecaptchaV3, site_key, page_url, **kwargs)
+        return self._solve_captcha(CaptchaType.RECAPTCHAV3, site_key, page_url, **kwargs)
 
     def solve_hcaptcha(self, site_key: str, page_url: str, **kwargs) -> SolvedCaptcha:
         r"""Solves hCaptcha.
@@ -135,7 +221,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(HCaptcha, site_key, page_url, **kwargs)
+        return self._solve_captcha(CaptchaType.HCAPTCHA, site_key, page_url, **kwargs)
 
     def solve_funcaptcha(self, public_key: str, page_url: str, **kwargs) -> SolvedCaptcha:
         r"""Solves FunCaptcha.
@@ -151,7 +237,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(FunCaptcha, public_key, page_url, **kwargs)
+        return self._solve_captcha(CaptchaType.FUNCAPTCHA, public_key, page_url, **kwargs)
 
     def solve_keycaptcha(self, page_url: str, user_id: str, session_id: str, ws_sign: str,
                          ws_sign2: str, **kwargs) -> SolvedCaptcha:
@@ -166,7 +252,7 @@ class CaptchaSolver:
         :rtype: multicaps.SolvedCaptcha
         """
         return self._solve_captcha(
-            KeyCaptcha, page_url, user_id, session_id, ws_sign, ws_sign2, **kwargs
+            CaptchaType.KEYCAPTCHA, page_url, user_id, session_id, ws_sign, ws_sign2, **kwargs
         )
 
     def solve_geetest(self, page_url: str, gt_key: str, challenge: str,
@@ -180,7 +266,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(GeeTest, page_url, gt_key, challenge, **kwargs)
+        return self._solve_captcha(CaptchaType.GEETEST, page_url, gt_key, challenge, **kwargs)
 
     def solve_geetest_v4(self, page_url: str, captcha_id: str, **kwargs) -> SolvedCaptcha:
         r"""Solves GeeTestV4.
@@ -190,7 +276,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(GeeTestV4, page_url, captcha_id, **kwargs)
+        return self._solve_captcha(CaptchaType.GEETESTV4, page_url, captcha_id, **kwargs)
 
     def solve_capy_puzzle(self, site_key: str, page_url: str, **kwargs) -> SolvedCaptcha:
         r"""Solves Capy Puzzle CAPTCHA.
@@ -204,7 +290,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(CapyPuzzle, site_key, page_url, **kwargs)
+        return self._solve_captcha(CaptchaType.CAPY, site_key, page_url, **kwargs)
 
     def solve_tiktok(self, page_url: str, **kwargs) -> SolvedCaptcha:
         r"""Solves TikTokCaptcha.
@@ -218,7 +304,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(TikTokCaptcha, page_url, **kwargs)
+        return self._solve_captcha(CaptchaType.TIKTOK, page_url, **kwargs)
 
     def solve_turnstile(self, site_key: str, page_url: str, **kwargs) -> SolvedCaptcha:
         r"""Solves Cloudflare Turnstile.
@@ -232,7 +318,7 @@ class CaptchaSolver:
         :return: :class:`SolvedCaptcha <SolvedCaptcha>` object
         :rtype: multicaps.SolvedCaptcha
         """
-        return self._solve_captcha(TurnstileCaptcha, site_key, page_url, **kwargs)
+        return self._solve_captcha(CaptchaType.TURNSTILE, site_key, page_url, **kwargs)
 
     def create_task(self, captcha: BaseCaptcha) -> CaptchaTask:
         """Create task to solve CAPTCHA
@@ -243,6 +329,113 @@ class CaptchaSolver:
         """
         return self._service.create_task(captcha)
 
+    def submit(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer] = None,
+               user_agent: Optional[str] = None,
+               cookies: Optional[Dict[str, str]] = None) -> concurrent.futures.Future:
+        """Submits CAPTCHA for solving in the background
+
+        :param captcha: Captcha to solve.
+        :param proxy: (optional) Proxy to use while solving the CAPTCHA.
+        :param user_agent: (optional) User-Agent to use while solving the CAPTCHA.
+        :param cookies: (optional) Cookies to use while solving the CAPTCHA.
+        :return: :class:`Future <concurrent.futures.Future>` of
+            :class:`SolvedCaptcha <SolvedCaptcha>` object
+        :rtype: concurrent.futures.Future
+        """
+        return self._get_executor().submit(self._solve, captcha, proxy, user_agent, cookies)
+
+    def map(self, captchas: Iterable, concurrency: Optional[int] = None) -> Iterator[BatchResult]:
+        """Solves a batch of CAPTCHAs and yields results in the input order
+
+        Input items are taken lazily, so there are at most ``concurrency`` items in memory.
+
+        :param captchas: Iterable of CAPTCHA objects or :class:`BatchItem <BatchItem>` objects
+            (CAPTCHA with proxy, user_agent and cookies).
+        :param concurrency: (optional) Max number of CAPTCHAs solved at the same time
+            (max_workers by default).
+        :return: iterator of :class:`BatchResult <BatchResult>` objects
+            with SolvedCaptcha objects or exceptions
+        """
+
+        concurrency = self._get_batch_concurrency(concurrency)
+        pending: collections.deque = collections.deque()
+        try:
+            for index, item in enumerate(captchas):
+                pending.append(self._submit_batch_item(index, item))
+                if len(pending) >= concurrency:
+                    yield _get_batch_result(*pending.popleft())
+            while pending:
+                yield _get_batch_result(*pending.popleft())
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    def as_completed(self, captchas: Iterable,
+                     concurrency: Optional[int] = None) -> Iterator[BatchResult]:
+        """Solves a batch of CAPTCHAs and yields results as they are ready
+
+        Input items are taken lazily, so there are at most ``concurrency`` items in memory.
+
+        :param captchas: Iterable of CAPTCHA objects or :class:`BatchItem <BatchItem>` objects
+            (CAPTCHA with proxy, user_agent and cookies).
+        :param concurrency: (optional) Max number of CAPTCHAs solved at the same time
+            (max_workers by default).
+        :return: iterator of :class:`BatchResult <BatchResult>` objects
+            with SolvedCaptcha objects or exceptions
+        """
+
+        concurrency = self._get_batch_concurrency(concurrency)
+        items = enumerate(captchas)
+        pending = {}
+        is_exhausted = False
+        try:
+            while True:
+                while not is_exhausted and len(pending) < concurrency:
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        is_exhausted = True
+                        break
+                    index, item, future = self._submit_batch_item(index, item)
+                    pending[future] = (index, item)
+
+                if not pending:
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield _get_batch_result(*pending.pop(future), future)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _get_batch_concurrency(self, concurrency: Optional[int]) -> int:
+        concurrency = self.max_workers if concurrency is None else concurrency
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive number")
+        return concurrency
+
+    def _submit_batch_item(self, index: int, item) -> tuple:
+        try:
+            item = BatchItem.from_input(item)
+        except UnicapsException as exc:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            future.set_exception(exc)
+            return index, item, future
+
+        return index, item, self.submit(item.captcha, item.proxy, item.user_agent, item.cookies)
+
+    @property
+    def circuit_state(self) -> str:
+        """Circuit breaker state of the service: 'closed', 'open' or 'half_open'
+
+        :return: :str:State (always 'closed' if the circuit breaker is disabled)
+        :rtype: str
+        """
+        return self._service.circuit_state.value
+
     def get_balance(self) -> float:
         """Get account balance
 
@@ -261,6 +454,7 @@ class CaptchaSolver:
 
     def close(self) -> None:
         """Close all connections"""
+        self._shutdown_executor()
         self._service.close()
 
     def __enter__(self):
@@ -268,3 +462,10 @@ class CaptchaSolver:
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
+
+
+def _get_batch_result(index: int, item, future: concurrent.futures.Future) -> BatchResult:
+    try:
+        return BatchResult(index, item, solved_captcha=future.result())
+    except Exception as exc:  # pylint: disable=broad-except
+        return BatchResult(index, item, exception=exc)
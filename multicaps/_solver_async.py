@@ -1,15 +1,16 @@
 """
 AsyncCaptchaSolver class
 """
+import asyncio
+import collections
 import io
 import pathlib
-from typing import Union
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Union
 
-from .captcha import (
-    ImageCaptcha, TextCaptcha, RecaptchaV2, RecaptchaV3, HCaptcha, FunCaptcha, KeyCaptcha, GeeTest,
-    GeeTestV4, CapyPuzzle, TikTokCaptcha, TurnstileCaptcha
-)
+from ._batch import BatchItem, BatchResult, BATCH_CONCURRENCY
+from ._captcha import CaptchaType, get_captcha_class
 from ._captcha.base import BaseCaptcha  # type: ignore
+from ._misc.proxy import ProxyServer
 from ._service.base import AsyncSolvedCaptcha, AsyncCaptchaTask
 from ._solver import CaptchaSolver
 
@@ -19,20 +20,42 @@ class AsyncCaptchaSolver(CaptchaSolver):
 
     :param service_name: captcha solving service to use (enum CaptchaSolvingService or str).
     :param api_key: API key to access the solving service.
+    :param kwargs: (optional) Options of the service (see CaptchaSolver).
     """
 
-    async def _solve_captcha_async(self, captcha_class, *args, **kwargs):
+    async def _solve_captcha_async(self, captcha_type: CaptchaType, *args, **kwargs):
         proxy = kwargs.pop('proxy') if 'proxy' in kwargs else None
         user_agent = kwargs.pop('user_agent') if 'user_agent' in kwargs else None
         cookies = kwargs.pop('cookies') if 'cookies' in kwargs else None
 
+        captcha_class = get_captcha_class(captcha_type)
+        return await self._solve_async(captcha_class(*args, **kwargs), proxy, user_agent, cookies)
+
+    async def _solve_async(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer],
+                           user_agent: Optional[str],
+                           cookies: Optional[Dict[str, str]]) -> AsyncSolvedCaptcha:
         return await self._service.solve_captcha_async(
-            captcha_class(*args, **kwargs),
+            captcha,
             proxy=proxy,
             user_agent=user_agent,
             cookies=cookies
         )
 
+    async def solve_captcha(self, captcha: BaseCaptcha,  # type: ignore
+                            proxy: Optional[ProxyServer] = None,
+                            user_agent: Optional[str] = None,
+                            cookies: Optional[Dict[str, str]] = None) -> AsyncSolvedCaptcha:
+        r"""Solves CAPTCHA object of any type.
+
+        :param captcha: Captcha to solve.
+        :param proxy: (optional) Proxy to use while solving the CAPTCHA.
+        :param user_agent: (optional) User-Agent to use while solving the CAPTCHA.
+        :param cookies: (optional) Cookies to use while solving the CAPTCHA.
+        :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
+        :rtype: multicaps.AsyncSolvedCaptcha
+        """
+        return await self._solve_async(captcha, proxy, user_agent, cookies)
+
     async def solve_image_captcha(self,  # type: ignore
                                   image: Union[bytes, io.RawIOBase, io.BufferedIOBase,
                                                pathlib.Path],
@@ -53,7 +76,7 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :rtype: multicaps.AsyncSolvedCaptcha
         """
 
-        return await self._solve_captcha_async(ImageCaptcha, image, **kwargs)
+        return await self._solve_captcha_async(CaptchaType.IMAGE, image, **kwargs)
 
     async def solve_text_captcha(self, text: str, **kwargs) -> AsyncSolvedCaptcha:  # type: ignore
         r"""Solves text CAPTCHA.
@@ -64,7 +87,7 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(TextCaptcha, text, **kwargs)
+        return await self._solve_captcha_async(CaptchaType.TEXT, text, **kwargs)
 
     async def solve_recaptcha_v2(self, site_key: str, page_url: str,  # type: ignore
                                  **kwargs) -> AsyncSolvedCaptcha:
@@ -82,7 +105,9 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(RecaptchaV2, site_key, page_url, **kwargs)
+        return await self._solve_captcha_async(
+            CaptchaType.RECAPTCHAV2, site_key, page_url, **kwargs
+        )
 
     async def solve_recaptcha_v3(self, site_key: str, page_url: str,  # type: ignore
                                  **kwargs) -> AsyncSolvedCaptcha:
@@ -100,7 +125,9 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(RecaptchaV3, site_key, page_url, **kwargs)
+        return await self._solve_captcha_async(
+            CaptchaType.RECAPTCHAV3, site_key, page_url, **kwargs
+        )
 
     async def solve_hcaptcha(self, site_key: str, page_url: str,  # type: ignore
                              **kwargs) -> AsyncSolvedCaptcha:
@@ -116,7 +143,7 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(HCaptcha, site_key, page_url, **kwargs)
+        return await self._solve_captcha_async(CaptchaType.HCAPTCHA, site_key, page_url, **kwargs)
 
     async def solve_funcaptcha(self, public_key: str, page_url: str,  # type: ignore
                                **kwargs) -> AsyncSolvedCaptcha:
@@ -133,7 +160,9 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(FunCaptcha, public_key, page_url, **kwargs)
+        return await self._solve_captcha_async(
+            CaptchaType.FUNCAPTCHA, public_key, page_url, **kwargs
+        )
 
     async def solve_keycaptcha(self, page_url: str, user_id: str, session_id: str,   # type: ignore
                                ws_sign: str, ws_sign2: str, **kwargs) -> AsyncSolvedCaptcha:
@@ -148,7 +177,7 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :rtype: multicaps.AsyncSolvedCaptcha
         """
         return await self._solve_captcha_async(
-            KeyCaptcha, page_url, user_id, session_id, ws_sign, ws_sign2, **kwargs
+            CaptchaType.KEYCAPTCHA, page_url, user_id, session_id, ws_sign, ws_sign2, **kwargs
         )
 
     async def solve_geetest(self, page_url: str, gt_key: str, challenge: str,  # type: ignore
@@ -162,7 +191,9 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(GeeTest, page_url, gt_key, challenge, **kwargs)
+        return await self._solve_captcha_async(
+            CaptchaType.GEETEST, page_url, gt_key, challenge, **kwargs
+        )
 
     async def solve_geetest_v4(self, page_url: str, captcha_id: str,  # type: ignore
                                **kwargs) -> AsyncSolvedCaptcha:
@@ -173,7 +204,9 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(GeeTestV4, page_url, captcha_id, **kwargs)
+        return await self._solve_captcha_async(
+            CaptchaType.GEETESTV4, page_url, captcha_id, **kwargs
+        )
 
     async def solve_capy_puzzle(self, site_key: str, page_url: str,  # type: ignore
                                 **kwargs) -> AsyncSolvedCaptcha:
@@ -188,7 +221,7 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(CapyPuzzle, site_key, page_url, **kwargs)
+        return await self._solve_captcha_async(CaptchaType.CAPY, site_key, page_url, **kwargs)
 
     async def solve_tiktok(self, page_url: str, **kwargs) -> AsyncSolvedCaptcha:  # type: ignore
         r"""Solves TikTokCaptcha.
@@ -202,7 +235,7 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(TikTokCaptcha, page_url, **kwargs)
+        return await self._solve_captcha_async(CaptchaType.TIKTOK, page_url, **kwargs)
 
     async def solve_turnstile(self, site_key: str, page_url: str,  # type: ignore
                               **kwargs) -> AsyncSolvedCaptcha:
@@ -217,7 +250,7 @@ class AsyncCaptchaSolver(CaptchaSolver):
         :return: :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
         :rtype: multicaps.AsyncSolvedCaptcha
         """
-        return await self._solve_captcha_async(TurnstileCaptcha, site_key, page_url, **kwargs)
+        return await self._solve_captcha_async(CaptchaType.TURNSTILE, site_key, page_url, **kwargs)
 
     async def create_task(self, captcha: BaseCaptcha) -> AsyncCaptchaTask:  # type: ignore
         """Create task to solve CAPTCHA
@@ -228,6 +261,118 @@ class AsyncCaptchaSolver(CaptchaSolver):
         """
         return await self._service.create_task_async(captcha)
 
+    def submit(self, captcha: BaseCaptcha,  # type: ignore
+               proxy: Optional[ProxyServer] = None,
+               user_agent: Optional[str] = None,
+               cookies: Optional[Dict[str, str]] = None) -> asyncio.Task:
+        """Submits CAPTCHA for solving in the background (in the running event loop)
+
+        :param captcha: Captcha to solve.
+        :param proxy: (optional) Proxy to use while solving the CAPTCHA.
+        :param user_agent: (optional) User-Agent to use while solving the CAPTCHA.
+        :param cookies: (optional) Cookies to use while solving the CAPTCHA.
+        :return: :class:`Task <asyncio.Task>` of
+            :class:`AsyncSolvedCaptcha <AsyncSolvedCaptcha>` object
+        :rtype: asyncio.Task
+        """
+        return asyncio.ensure_future(self._solve_async(captcha, proxy, user_agent, cookies))
+
+    async def map(self, captchas: Union[Iterable, AsyncIterable],  # type: ignore
+                  concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[BatchResult]:
+        """Solves a batch of CAPTCHAs and yields results in the input order
+
+        Input items are taken lazily, so there are at most ``concurrency`` items in memory.
+
+        :param captchas: Iterable or async iterable of CAPTCHA objects or
+            :class:`BatchItem <BatchItem>` objects (CAPTCHA with proxy, user_agent and cookies).
+        :param concurrency: (optional) Max number of CAPTCHAs solved at the same time.
+        :return: async iterator of :class:`BatchResult <BatchResult>` objects
+            with SolvedCaptcha objects or exceptions
+        """
+
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive number")
+
+        index = 0
+        pending: collections.deque = collections.deque()
+        try:
+            async for item in _iter_batch_input(captchas):
+                pending.append(asyncio.ensure_future(self._solve_batch_item(index, item)))
+                index += 1
+                if len(pending) >= concurrency:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def as_completed(self, captchas: Union[Iterable, AsyncIterable],
+                           concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[BatchResult]:
+        """Solves a batch of CAPTCHAs and yields results as they are ready
+
+        Input items are taken lazily, so there are at most ``concurrency`` items in memory.
+
+        :param captchas: Iterable or async iterable of CAPTCHA objects or
+            :class:`BatchItem <BatchItem>` objects (CAPTCHA with proxy, user_agent and cookies).
+        :param concurrency: (optional) Max number of CAPTCHAs solved at the same time.
+        :return: async iterator of :class:`BatchResult <BatchResult>` objects
+            with SolvedCaptcha objects or exceptions
+        """
+
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive number")
+
+        items = _iter_batch_input(captchas)
+        index = 0
+        pending = set()
+        is_exhausted = False
+        try:
+            while True:
+                while not is_exhausted and len(pending) < concurrency:
+                    try:
+                        item = await items.__anext__()
+                    except StopAsyncIteration:
+                        is_exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self._solve_batch_item(index, item)))
+                    index += 1
+
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def solve_many(self, captchas: Union[Iterable, AsyncIterable],
+                         concurrency: int = BATCH_CONCURRENCY) -> List[BatchResult]:
+        """Solves a batch of CAPTCHAs
+
+        :param captchas: Iterable or async iterable of CAPTCHA objects or
+            :class:`BatchItem <BatchItem>` objects (CAPTCHA with proxy, user_agent and cookies).
+        :param concurrency: (optional) Max number of CAPTCHAs solved at the same time.
+        :return: list of :class:`BatchResult <BatchResult>` objects in the input order
+        :rtype: list
+        """
+
+        results = [result async for result in self.as_completed(captchas, concurrency)]
+        return sorted(results, key=lambda result: result.index)
+
+    async def _solve_batch_item(self, index: int, item) -> BatchResult:
+        try:
+            item = BatchItem.from_input(item)
+            solved_captcha = await self._solve_async(
+                item.captcha, item.proxy, item.user_agent, item.cookies
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            return BatchResult(index, item, exception=exc)
+        return BatchResult(index, item, solved_captcha=solved_captcha)
+
     async def get_balance(self) -> float:  # type: ignore
         """Get account balance
 
@@ -246,10 +391,24 @@ class AsyncCaptchaSolver(CaptchaSolver):
 
     async def close(self) -> None:  # type: ignore
         """Close all connections"""
+        await self._shutdown_executor_async()
         await self._service.close_async()
 
+    async def _shutdown_executor_async(self):
+        # waiting for the executor threads must not block the event loop
+        await asyncio.to_thread(self._shutdown_executor)
+
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
         await self.close()
+
+
+async def _iter_batch_input(captchas: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if isinstance(captchas, AsyncIterable):
+        async for item in captchas:
+            yield item
+    else:
+        for item in captchas:
+            yield item
@@ -0,0 +1,140 @@
+# -*- coding: UTF-8 -*-
+"""
+FailoverSolver and AsyncFailoverSolver classes
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from ._batch import BATCH_CONCURRENCY
+from ._captcha.base import BaseCaptcha  # type: ignore
+from ._misc.proxy import ProxyServer
+from ._service import CaptchaSolvingService
+from ._service.base import SolvedCaptcha, AsyncSolvedCaptcha
+from ._solver import CaptchaSolver
+from ._solver_async import AsyncCaptchaSolver
+from .exceptions import (UnicapsException, LowBalanceError, ServiceTooBusy, NetworkError,
+                         SolutionWaitTimeout)
+
+# exceptions to solve the CAPTCHA with the next service on
+FAILOVER_EXCEPTIONS: Tuple[Type[BaseException], ...] = (
+    LowBalanceError, ServiceTooBusy, NetworkError, SolutionWaitTimeout
+)
+
+
+class FailoverSolver(CaptchaSolver):
+    """Captcha solver :class:`FailoverSolver <FailoverSolver>` object using several services.
+
+    A CAPTCHA is solved by the first service supporting its type. If the service fails with
+    one of ``failover_exceptions``, the CAPTCHA is solved by the next one and so on.
+    Services with open circuit breaker are tried last.
+
+    The rest of the methods (create_task, get_balance, get_status) use the first service.
+
+    :param services: Ordered list of (service_name, api_key) pairs or CaptchaSolver objects.
+    :param failover_exceptions: (optional) Exception classes to try the next service on.
+    :param max_workers: (optional) Max number of threads solving CAPTCHAs submitted
+        with submit(), map() and as_completed().
+    :param kwargs: (optional) Options of the services (see CaptchaSolver).
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, services: Iterable[Union[Tuple[Union[CaptchaSolvingService, str], str],
+                                                CaptchaSolver]],
+                 failover_exceptions: Tuple[Type[BaseException], ...] = FAILOVER_EXCEPTIONS,
+                 max_workers: int = BATCH_CONCURRENCY, **kwargs):
+        self.solvers: List[CaptchaSolver] = [
+            service if isinstance(service, CaptchaSolver) else CaptchaSolver(*service, **kwargs)
+            for service in services
+        ]
+        if not self.solvers:
+            raise ValueError('"services" param must contain at least one service!')
+        self.failover_exceptions = tuple(failover_exceptions)
+
+        primary_solver = self.solvers[0]
+        self.service_name = primary_solver.service_name
+        self.api_key = primary_solver.api_key
+        self._service = primary_solver._service  # pylint: disable=protected-access
+
+        self._init_executor(max_workers)
+
+    def _get_solvers(self, captcha: BaseCaptcha) -> List[CaptchaSolver]:
+        """ Returns solvers supporting the CAPTCHA in the order to try them """
+
+        captcha_type = captcha.get_type()
+        # pylint: disable=protected-access
+        solvers = [solver for solver in self.solvers
+                   if captcha_type in solver._service.supported_captchas]
+        if not solvers:
+            raise UnicapsException(f"{captcha_type} is not supported by any service!")
+
+        return sorted(solvers, key=lambda solver: solver.circuit_state == 'open')
+
+    def _solve(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer],
+               user_agent: Optional[str], cookies: Optional[Dict[str, str]]) -> SolvedCaptcha:
+        error = None
+        for solver in self._get_solvers(captcha):
+            try:
+                solved = solver._solve(  # pylint: disable=protected-access
+                    captcha, proxy, user_agent, cookies
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                self._on_result(solver, captcha, exc=exc)
+                if not isinstance(exc, self.failover_exceptions):
+                    raise
+                error = exc
+            else:
+                self._on_result(solver, captcha, solved=solved)
+                return solved
+        raise error  # type: ignore
+
+    def _on_result(self, solver: CaptchaSolver, captcha: BaseCaptcha,
+                   solved: Optional[SolvedCaptcha] = None,
+                   exc: Optional[BaseException] = None):
+        """ Called after each attempt to solve the CAPTCHA with the solver """
+
+    def close(self) -> None:
+        """Close all connections"""
+        self._shutdown_executor()
+        for solver in self.solvers:
+            solver.close()
+
+
+class AsyncFailoverSolver(FailoverSolver, AsyncCaptchaSolver):
+    """Captcha solver :class:`AsyncFailoverSolver <AsyncFailoverSolver>` object using several
+    services.
+
+    A CAPTCHA is solved by the first service supporting its type. If the service fails with
+    one of ``failover_exceptions``, the CAPTCHA is solved by the next one and so on.
+    Services with open circuit breaker are tried last.
+
+    The rest of the methods (create_task, get_balance, get_status) use the first service.
+
+    :param services: Ordered list of (service_name, api_key) pairs or CaptchaSolver objects.
+    :param failover_exceptions: (optional) Exception classes to try the next service on.
+    :param kwargs: (optional) Options of the services (see AsyncCaptchaSolver).
+    """
+
+    async def _solve_async(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer],
+                           user_agent: Optional[str],
+                           cookies: Optional[Dict[str, str]]) -> AsyncSolvedCaptcha:
+        error = None
+        for solver in self._get_solvers(captcha):
+            try:
+                # pylint: disable=protected-access
+                solved = await solver._service.solve_captcha_async(
+                    captcha, proxy=proxy, user_agent=user_agent, cookies=cookies
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                self._on_result(solver, captcha, exc=exc)
+                if not isinstance(exc, self.failover_exceptions):
+                    raise
+                error = exc
+            else:
+                self._on_result(solver, captcha, solved=solved)
+                return solved
+        raise error  # type: ignore
+
+    async def close(self) -> None:  # type: ignore
+        """Close all connections"""
+        await self._shutdown_executor_async()
+        for solver in self.solvers:
+            await solver._service.close_async()  # pylint: disable=protected-access
@@ -0,0 +1,178 @@
+# -*- coding: UTF-8 -*-
+"""
+AsyncHedgedSolver class
+"""
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple, Type, Union
+
+from ._captcha.base import BaseCaptcha  # type: ignore
+from ._misc.proxy import ProxyServer
+from ._service import CaptchaSolvingService
+from ._service.base import AsyncSolvedCaptcha, AsyncCaptchaTask
+from ._solver import CaptchaSolver
+from ._solver_failover import AsyncFailoverSolver, FAILOVER_EXCEPTIONS
+
+HEDGE_DELAY = 0.0  # seconds to wait for the first service before submitting to the second one
+
+
+@dataclass
+class HedgeStats:
+    """ Statistics of hedged solving """
+
+    solved: int = 0  # number of solved CAPTCHAs
+    hedged: int = 0  # number of CAPTCHAs submitted to the second service
+    hedge_wins: int = 0  # number of CAPTCHAs solved by the second service first
+    extra_tasks: int = 0  # number of tasks created in vain (losers of the race)
+    cost: float = 0.0  # total cost of solved CAPTCHAs (if known)
+    extra_cost: float = 0.0  # cost of the losers estimated by the cost of the winners
+
+    @property
+    def hedge_win_rate(self) -> float:
+        """ Share of hedged CAPTCHAs solved by the second service first """
+        return self.hedge_wins / self.hedged if self.hedged else 0.0
+
+
+class AsyncHedgedSolver(AsyncFailoverSolver):
+    """Captcha solver :class:`AsyncHedgedSolver <AsyncHedgedSolver>` object racing two services
+    to cut the tail latency.
+
+    A CAPTCHA is submitted to the first service supporting its type and, unless it's solved
+    within ``hedge_delay`` seconds, to the second one as well. The first solution is returned,
+    polling of the other task is stopped at once. If both services fail with one of
+    ``failover_exceptions``, the rest of the services are tried one by one. Other errors
+    of the first service (e.g. unsolvable CAPTCHA) are raised without hedging.
+
+    :param services: Ordered list of (service_name, api_key) pairs or CaptchaSolver objects.
+    :param hedge_delay: (optional) Seconds to wait for the first service before submitting
+        the CAPTCHA to the second one (zero to submit to both at once).
+    :param report_loser: (optional) Report the task of the losing service as bad (where
+        the service allows it).
+    :param failover_exceptions: (optional) Exception classes to try the next service on.
+    :param kwargs: (optional) Options of the services (see AsyncCaptchaSolver).
+    """
+
+    def __init__(self, services: Iterable[Union[Tuple[Union[CaptchaSolvingService, str], str],
+                                                CaptchaSolver]],
+                 hedge_delay: float = HEDGE_DELAY, report_loser: bool = False,
+                 failover_exceptions: Tuple[Type[BaseException], ...] = FAILOVER_EXCEPTIONS,
+                 **kwargs):
+        super().__init__(services, failover_exceptions=failover_exceptions, **kwargs)
+        self.hedge_delay = hedge_delay
+        self.report_loser = report_loser
+        self.hedge_stats = HedgeStats()
+        self._reports: Set[asyncio.Task] = set()
+
+    async def _solve_async(self, captcha: BaseCaptcha, proxy: Optional[ProxyServer],
+                           user_agent: Optional[str],
+                           cookies: Optional[Dict[str, str]]) -> AsyncSolvedCaptcha:
+        solvers = self._get_solvers(captcha)
+        if len(solvers) < 2:
+            return await super()._solve_async(captcha, proxy, user_agent, cookies)
+
+        # started tasks of the services and the services creating a task now
+        started: Dict[CaptchaSolver, AsyncCaptchaTask] = {}
+        creating: Set[CaptchaSolver] = set()
+
+        async def solve(solver: CaptchaSolver) -> AsyncSolvedCaptcha:
+            service = solver._service  # pylint: disable=protected-access
+            start_time = datetime.now()
+            creating.add(solver)
+            try:
+                task = await service.create_task_async(captcha, proxy, user_agent, cookies)
+            finally:
+                creating.discard(solver)
+            started[solver] = task
+            solution, cost, extra = await service.wait_for_solution_async(task)
+            return AsyncSolvedCaptcha(task, solution, start_time, datetime.now(),
+                                      cost=cost, extra=extra)
+
+        primary, secondary = solvers[:2]
+        attempts = {asyncio.ensure_future(solve(primary)): primary}
+        errors = []
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=self.hedge_delay)
+            error = next(iter(done)).exception() if done else None
+            if error is not None and not isinstance(error, self.failover_exceptions):
+                # the CAPTCHA itself can't be solved, the second service won't help
+                self._on_result(primary, captcha, exc=error)
+                raise error
+            if not done or error is not None:
+                attempts[asyncio.ensure_future(solve(secondary))] = secondary
+                self.hedge_stats.hedged += 1
+
+            while attempts:
+                done, _ = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    solver = attempts.pop(attempt)
+                    if attempt.exception() is None:
+                        solved = attempt.result()
+                        self._on_result(solver, captcha, solved=solved)
+                        self._on_hedge_won(solved, solver is secondary, attempts, started,
+                                           creating)
+                        return solved
+
+                    self._on_result(solver, captcha, exc=attempt.exception())
+                    errors.append(attempt.exception())
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+        for exc in errors:
+            if not isinstance(exc, self.failover_exceptions):
+                raise exc
+
+        # both services failed, try the rest of them one by one
+        for solver in solvers[2:]:
+            try:
+                solved = await solve(solver)
+            except Exception as exc:  # pylint: disable=broad-except
+                self._on_result(solver, captcha, exc=exc)
+                if not isinstance(exc, self.failover_exceptions):
+                    raise
+                errors.append(exc)
+            else:
+                self._on_result(solver, captcha, solved=solved)
+                self._on_hedge_won(solved, False, {}, started, creating)
+                return solved
+        raise errors[-1]
+
+    def _on_hedge_won(self, solved: AsyncSolvedCaptcha, is_hedge: bool,
+                      losers: Dict[asyncio.Future, CaptchaSolver],
+                      started: Dict[CaptchaSolver, AsyncCaptchaTask],
+                      creating: Set[CaptchaSolver]):
+        """ Updates the statistics and reports the tasks of the losers """
+
+        stats = self.hedge_stats
+        stats.solved += 1
+        stats.cost += solved.cost or 0.0
+        if is_hedge:
+            stats.hedge_wins += 1
+
+        for solver in losers.values():
+            if solver not in started and solver not in creating:  # not submitted yet
+                continue
+            # the task being created is likely created by the service anyway
+            stats.extra_tasks += 1
+            stats.extra_cost += solved.cost or 0.0
+
+            # the ID of the task being created is unknown, so it can't be reported
+            if self.report_loser and solver in started:
+                # the task of the loser isn't solved, so it's reported by its ID
+                report = asyncio.ensure_future(self._report_bad(started[solver]))
+                self._reports.add(report)
+                report.add_done_callback(self._reports.discard)
+
+    @staticmethod
+    async def _report_bad(task: AsyncCaptchaTask):
+        try:
+            await task._service.report_task_bad_async(task)  # pylint: disable=protected-access
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    async def close(self) -> None:  # type: ignore
+        """Close all connections"""
+        if self._reports:
+            await asyncio.gather(*self._reports)
+        await super().close()
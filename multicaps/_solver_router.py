@@ -0,0 +1,131 @@
+# -*- coding: UTF-8 -*-
+"""
+RoutingSolver and AsyncRoutingSolver classes
+"""
+import collections
+import hashlib
+import random
+from typing import Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from ._batch import BATCH_CONCURRENCY
+from ._captcha.base import BaseCaptcha  # type: ignore
+from ._misc.routing import (RouterStats, Objective, fastest, ROUTER_EXPLORATION,
+                            ROUTER_MIN_SAMPLES)
+from ._service import CaptchaSolvingService
+from ._service.base import SolvedCaptcha
+from ._solver import CaptchaSolver
+from ._solver_failover import FailoverSolver, AsyncFailoverSolver, FAILOVER_EXCEPTIONS
+
+
+class RoutingSolver(FailoverSolver):
+    """Captcha solver :class:`RoutingSolver <RoutingSolver>` object choosing a service for
+    each CAPTCHA by live statistics.
+
+    Solve times (p50/p95), costs and errors of recent attempts are kept for every service and
+    CAPTCHA type. A CAPTCHA is solved by the service best meeting the ``objective``, the rest
+    of services are used as failover (see FailoverSolver). Each service is tried a few times
+    before its statistics are trusted, and a small share of CAPTCHAs is sent to a random service
+    to keep the statistics of all services fresh.
+
+    Statistics are kept by service names. If several accounts of a service are used, each one
+    is tracked separately under the service name followed by a digest of its API key
+    (e.g. "2captcha.com#1a2b3c4d").
+
+    :param services: List of (service_name, api_key) pairs or CaptchaSolver objects.
+    :param objective: (optional) Function returning a sort key of service statistics (the lower
+        the better), see multicaps.router. The fastest service by p95 solve time by default.
+    :param exploration: (optional) Share of CAPTCHAs to solve with a random service.
+    :param min_samples: (optional) Number of attempts to make with a service before trusting
+        its statistics.
+    :param stats: (optional) Statistics to use (e.g. shared by several solvers).
+    :param failover_exceptions: (optional) Exception classes to try the next service on.
+    :param max_workers: (optional) Max number of threads solving CAPTCHAs submitted
+        with submit(), map() and as_completed().
+    :param kwargs: (optional) Options of the services (see CaptchaSolver).
+    """
+
+    def __init__(self, services: Iterable[Union[Tuple[Union[CaptchaSolvingService, str], str],
+                                                CaptchaSolver]],
+                 objective: Optional[Objective] = None,
+                 exploration: float = ROUTER_EXPLORATION,
+                 min_samples: int = ROUTER_MIN_SAMPLES,
+                 stats: Optional[RouterStats] = None,
+                 failover_exceptions: Tuple[Type[BaseException], ...] = FAILOVER_EXCEPTIONS,
+                 max_workers: int = BATCH_CONCURRENCY, **kwargs):
+        super().__init__(services, failover_exceptions=failover_exceptions,
+                         max_workers=max_workers, **kwargs)
+        self.objective = objective or fastest()
+        self.exploration = exploration
+        self.min_samples = min_samples
+        self.stats = stats or RouterStats()
+
+        counts = collections.Counter(solver.service_name for solver in self.solvers)
+        self._stats_names: Dict[int, str] = {
+            id(solver): (solver.service_name.value if counts[solver.service_name] == 1 else
+                         f'{solver.service_name.value}#'
+                         f'{hashlib.sha256(solver.api_key.encode()).hexdigest()[:8]}')
+            for solver in self.solvers
+        }
+
+    def _get_stats_name(self, solver: CaptchaSolver) -> str:
+        """ Returns the name the statistics of the solver are kept by """
+        return self._stats_names[id(solver)]
+
+    def _get_solvers(self, captcha: BaseCaptcha) -> List[CaptchaSolver]:
+        """ Returns solvers supporting the CAPTCHA, the best one first """
+
+        captcha_type = captcha.get_type()
+
+        def get_rank(solver: CaptchaSolver):
+            count, score = self.stats.evaluate(self._get_stats_name(solver), captcha_type,
+                                               self.objective)
+            # services without enough statistics go first to collect them
+            return solver.circuit_state == 'open', count >= self.min_samples, score
+
+        solvers = sorted(super()._get_solvers(captcha), key=get_rank)
+
+        available = [solver for solver in solvers[1:] if solver.circuit_state != 'open']
+        if available and random.random() < self.exploration:
+            solver = random.choice(available)
+            solvers.remove(solver)
+            solvers.insert(0, solver)
+        return solvers
+
+    def _on_result(self, solver: CaptchaSolver, captcha: BaseCaptcha,
+                   solved: Optional[SolvedCaptcha] = None,
+                   exc: Optional[BaseException] = None):
+        if solved is None:
+            self.stats.record(self._get_stats_name(solver), captcha.get_type(), exc=exc)
+            return
+        if solved.is_cached:
+            return  # cached solutions say nothing about the service
+
+        self.stats.record(self._get_stats_name(solver), captcha.get_type(),
+                          solve_time=(solved.end_time - solved.start_time).total_seconds(),
+                          cost=solved.cost)
+
+
+class AsyncRoutingSolver(RoutingSolver, AsyncFailoverSolver):
+    """Captcha solver :class:`AsyncRoutingSolver <AsyncRoutingSolver>` object choosing
+    a service for each CAPTCHA by live statistics.
+
+    Solve times (p50/p95), costs and errors of recent attempts are kept for every service and
+    CAPTCHA type. A CAPTCHA is solved by the service best meeting the ``objective``, the rest
+    of services are used as failover (see AsyncFailoverSolver). Each service is tried a few
+    times before its statistics are trusted, and a small share of CAPTCHAs is sent to a random
+    service to keep the statistics of all services fresh.
+
+    Statistics are kept by service names. If several accounts of a service are used, each one
+    is tracked separately under the service name followed by a digest of its API key
+    (e.g. "2captcha.com#1a2b3c4d").
+
+    :param services: List of (service_name, api_key) pairs or CaptchaSolver objects.
+    :param objective: (optional) Function returning a sort key of service statistics (the lower
+        the better), see multicaps.router. The fastest service by p95 solve time by default.
+    :param exploration: (optional) Share of CAPTCHAs to solve with a random service.
+    :param min_samples: (optional) Number of attempts to make with a service before trusting
+        its statistics.
+    :param stats: (optional) Statistics to use (e.g. shared by several solvers).
+    :param failover_exceptions: (optional) Exception classes to try the next service on.
+    :param kwargs: (optional) Options of the services (see AsyncCaptchaSolver).
+    """
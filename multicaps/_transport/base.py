@@ -10,6 +10,9 @@ from typing import Optional, Any
 class BaseRequest(ABC):
     """ Base request class """
 
+    # whether the request can be safely repeated if it's unknown if the service received it
+    IDEMPOTENT = True
+
     def __init__(self, service):
         # solving service instance
         self._service = service
@@ -60,6 +63,14 @@ class BaseTransport(ABC):  # pylint: disable=too-few-public-methods
         response = await self._make_request_async(request.prepare(*args))
         return request.process_response(response)
 
+    def make_probe_request(self, request: BaseRequest, *args) -> dict:
+        """ Makes a request to probe the service (a single attempt) """
+        return BaseTransport.make_request(self, request, *args)
+
+    async def make_probe_request_async(self, request: BaseRequest, *args) -> dict:
+        """ Makes a request to probe the service (a single attempt) """
+        return await BaseTransport.make_request_async(self, request, *args)
+
     @abstractmethod
     def close(self):
         """ Close connections """
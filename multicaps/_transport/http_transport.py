@@ -3,8 +3,20 @@
 Transport and requests for HTTP protocol
 """
 
+import asyncio
+import base64
+import json
+import random
+import ssl
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from json.decoder import JSONDecodeError
-from typing import Optional, Dict
+from typing import (Any, AsyncIterator, Callable, Dict, Iterator, Optional, Sequence, Tuple,
+                    Union)
+from urllib.parse import urlsplit
+from uuid import uuid4
 
 import httpx
 
@@ -16,29 +28,333 @@ from ..__version__ import __version__  # type: ignore
 HTTP_RETRY_MAX_COUNT = 5  # max retry count in case of http(s) errors
 HTTP_RETRY_BACKOFF_FACTOR = 0.5  # backoff factor for Retry
 HTTP_RETRY_STATUS_FORCELIST = {500, 502, 503, 504}  # status forcelist for Retry
+HTTP_RETRY_MAX_BACKOFF = 30  # max seconds to wait before a retry
+HTTP_RETRY_BUDGET = 60  # max seconds spent on retries of a single call
+HTTP_PROBE_TIMEOUT = 5  # seconds to wait for a response to a probe of the service
+HTTP_MAX_CONNECTIONS = 100  # max number of connections of an HTTP client
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20  # max number of idle connections kept alive
+HTTP_KEEPALIVE_EXPIRY = 5.0  # seconds to keep an idle connection alive
+HTTP_MULTIPART_MIN_SIZE = 8 * 1024  # min size of a file to upload as is instead of base64
+HTTP_BASE64_STREAM_MIN_SIZE = 64 * 1024  # min size of a file to encode to base64 while sending
+HTTP_BASE64_CHUNK_SIZE = 48 * 1024  # bytes of a file encoded to base64 at once (multiple of 3)
+
+# errors raised before the request is sent, so any request can be retried
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.ProxyError)
+
+_SSL_CONTEXT: Optional[ssl.SSLContext] = None
+_SSL_CONTEXT_LOCK = threading.Lock()
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """ Returns SSL context with CA certificates loaded (shared by all transports) """
+
+    global _SSL_CONTEXT  # pylint: disable=global-statement
+    with _SSL_CONTEXT_LOCK:
+        if _SSL_CONTEXT is None:
+            _SSL_CONTEXT = httpx.create_ssl_context()
+        return _SSL_CONTEXT
+
+
+class _SharedClient:  # pylint: disable=too-few-public-methods
+    """ HTTP client shared by several transports """
+
+    def __init__(self, client):
+        self.client = client
+        self.refs = 0
+
+
+_SHARED_CLIENTS: Dict[Tuple, _SharedClient] = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+
+
+def acquire_client(key: Tuple, factory: Callable[[], Any]) -> Any:
+    """ Returns the HTTP client shared in the process by the key (made by factory if needed) """
+
+    with _SHARED_CLIENTS_LOCK:
+        # async clients of closed event loops can't be used anymore
+        for stale_key in [client_key for client_key in _SHARED_CLIENTS
+                          if _is_loop_closed(client_key[-1])]:
+            del _SHARED_CLIENTS[stale_key]
+
+        if key not in _SHARED_CLIENTS:
+            _SHARED_CLIENTS[key] = _SharedClient(factory())
+        shared_client = _SHARED_CLIENTS[key]
+        shared_client.refs += 1
+        return shared_client.client
+
+
+def _is_loop_closed(value) -> bool:
+    return isinstance(value, asyncio.AbstractEventLoop) and value.is_closed()
+
+
+def release_client(key: Tuple) -> Optional[Any]:
+    """ Releases a reference to the shared HTTP client, returns the client to close if unused """
+
+    with _SHARED_CLIENTS_LOCK:
+        shared_client = _SHARED_CLIENTS.get(key)
+        if shared_client is None:
+            return None
+        shared_client.refs -= 1
+        if shared_client.refs > 0:
+            return None
+        del _SHARED_CLIENTS[key]
+        return shared_client.client
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed HTTP request is retried.
+
+    Delays grow exponentially with full jitter (or follow the Retry-After header).
+    Requests that can't be safely repeated (task creation) are retried only if they have not
+    reached the server: on connection errors and on HTTP 429 response.
+
+    :param max_retries: Max number of retries.
+    :param backoff_factor: Base of the exponential backoff in seconds.
+    :param max_backoff: Max seconds to wait before a retry.
+    :param budget: Max seconds to spend on retries of a single call.
+    :param status_forcelist: HTTP statuses to retry idempotent requests on.
+    """
+
+    def __init__(self, max_retries: int = HTTP_RETRY_MAX_COUNT,
+                 backoff_factor: float = HTTP_RETRY_BACKOFF_FACTOR,
+                 max_backoff: float = HTTP_RETRY_MAX_BACKOFF,
+                 budget: float = HTTP_RETRY_BUDGET,
+                 status_forcelist=frozenset(HTTP_RETRY_STATUS_FORCELIST)):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self.status_forcelist = frozenset(status_forcelist)
+
+    def get_delay(self, attempt: int, start_time: float, is_idempotent: bool,
+                  error: Union[httpx.HTTPError, httpx.Response]) -> Optional[float]:
+        """
+        Returns seconds to wait before the next attempt or None if the request must not be
+        retried. The error is an httpx exception or a response with a bad status.
+        """
+
+        if attempt >= self.max_retries:
+            return None
+
+        response = None
+        if isinstance(error, httpx.Response):
+            response = error
+        elif isinstance(error, httpx.HTTPStatusError):
+            response = error.response
+
+        if response is not None:
+            if response.status_code == 429:
+                pass
+            elif not is_idempotent or response.status_code not in self.status_forcelist:
+                return None
+        elif not isinstance(error, httpx.TransportError):
+            return None
+        elif not is_idempotent and not isinstance(error, CONNECT_ERRORS):
+            return None
+
+        delay = _get_retry_after(response) if response is not None else None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff,
+                                          self.backoff_factor * 2 ** attempt))
+
+        if time.monotonic() - start_time + delay > self.budget:
+            return None
+        return delay
+
+
+def _get_retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
 
 
 class StandardHTTPTransport(BaseTransport):  # pylint: disable=too-few-public-methods
-    """ Standard HTTP Transport """
+    """
+    Standard HTTP Transport.
+
+    If the ``base_url`` of the service is set, HTTP clients are shared in the process by all
+    transports talking to the same host with the same settings.
+    """
 
     def __init__(self, settings: Optional[Dict] = None):
         super().__init__(settings)
         self.settings.setdefault('max_retries', HTTP_RETRY_MAX_COUNT)
+        self.settings.setdefault('retry_budget', HTTP_RETRY_BUDGET)
         self.settings.setdefault('handle_http_errors', True)
+        self.settings.setdefault('http2', False)
+        self.settings.setdefault('max_connections', HTTP_MAX_CONNECTIONS)
+        self.settings.setdefault('max_keepalive_connections', HTTP_MAX_KEEPALIVE_CONNECTIONS)
+        self.settings.setdefault('keepalive_expiry', HTTP_KEEPALIVE_EXPIRY)
 
-        default_headers = {
-            'User-Agent': f'python-unicaps/{__version__}'
-        }
+        # HTTP clients are created on first use, so a solver doesn't carry an idle pool
+        self._session: Optional[httpx.Client] = None
+        self._session_async: Optional[httpx.AsyncClient] = None
+        self._session_key: Optional[Tuple] = None
+        self._session_async_key: Optional[Tuple] = None
+        self._session_lock = threading.Lock()
 
-        self.session = httpx.Client(
-            headers=default_headers,
-            timeout=httpx.Timeout(timeout=30)
-        )
-        self.session_async = httpx.AsyncClient(
-            headers=default_headers,
-            timeout=httpx.Timeout(timeout=30)
+    def _get_client_kwargs(self) -> Dict:
+        return dict(
+            headers={'User-Agent': f'python-unicaps/{__version__}'},
+            timeout=httpx.Timeout(timeout=30),
+            verify=get_ssl_context(),
+            http2=self.settings['http2'],
+            limits=httpx.Limits(
+                max_connections=self.settings['max_connections'],
+                max_keepalive_connections=self.settings['max_keepalive_connections'],
+                keepalive_expiry=self.settings['keepalive_expiry']
+            )
         )
 
+    def _get_shared_client_key(self, is_async: bool) -> Optional[Tuple]:
+        """ Returns the key to share the HTTP client by (None if it's not shared) """
+
+        if not self.settings.get('base_url'):
+            return None
+
+        key: Tuple = (urlsplit(self.settings['base_url']).netloc, is_async, self.settings['http2'],
+                      self.settings['max_connections'],
+                      self.settings['max_keepalive_connections'],
+                      self.settings['keepalive_expiry'])
+        if is_async:
+            # connections of an async client are bound to the event loop
+            try:
+                key += (asyncio.get_running_loop(),)
+            except RuntimeError:
+                return None
+        return key
+
+    @property
+    def session(self) -> httpx.Client:
+        """ HTTP client (created on first use) """
+
+        with self._session_lock:
+            if self._session is None:
+                self._session_key = self._get_shared_client_key(is_async=False)
+                if self._session_key is None:
+                    self._session = httpx.Client(**self._get_client_kwargs())
+                else:
+                    self._session = acquire_client(
+                        self._session_key, lambda: httpx.Client(**self._get_client_kwargs())
+                    )
+            return self._session
+
+    @session.setter
+    def session(self, value: httpx.Client):
+        self._session = value
+        self._session_key = None
+
+    @property
+    def session_async(self) -> httpx.AsyncClient:
+        """ Async HTTP client (created on first use) """
+
+        with self._session_lock:
+            if self._session_async is None:
+                self._session_async_key = self._get_shared_client_key(is_async=True)
+                if self._session_async_key is None:
+                    self._session_async = httpx.AsyncClient(**self._get_client_kwargs())
+                else:
+                    self._session_async = acquire_client(
+                        self._session_async_key,
+                        lambda: httpx.AsyncClient(**self._get_client_kwargs())
+                    )
+            return self._session_async
+
+    @session_async.setter
+    def session_async(self, value: httpx.AsyncClient):
+        self._session_async = value
+        self._session_async_key = None
+
+    def _get_retry_policy(self) -> RetryPolicy:
+        return RetryPolicy(max_retries=self.settings['max_retries'],
+                           budget=self.settings['retry_budget'])
+
+    def make_request(self, request: BaseRequest, *args) -> dict:
+        """ Makes a request to the service retrying it in case of network errors """
+
+        # the request data is prepared once and sent as is on every attempt
+        request_data = request.prepare(*args)
+        retry_policy = self._get_retry_policy()
+        is_idempotent = getattr(request, 'IDEMPOTENT', True)
+        start_time = time.monotonic()
+
+        attempt = 0
+        while True:
+            try:
+                response = self._make_request(request_data)
+            except NetworkError as exc:
+                delay = retry_policy.get_delay(attempt, start_time, is_idempotent, exc.__cause__)
+                if delay is None:
+                    raise
+            else:
+                if not _has_retry_status(response, retry_policy):
+                    break
+                delay = retry_policy.get_delay(attempt, start_time, is_idempotent, response)
+                if delay is None:
+                    break
+
+            time.sleep(delay)
+            attempt += 1
+
+        return request.process_response(response)
+
+    async def make_request_async(self, request: BaseRequest, *args) -> dict:
+        """ Makes a request to the service retrying it in case of network errors """
+
+        # the request data is prepared once and sent as is on every attempt
+        request_data = request.prepare(*args)
+        retry_policy = self._get_retry_policy()
+        is_idempotent = getattr(request, 'IDEMPOTENT', True)
+        start_time = time.monotonic()
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._make_request_async(request_data)
+            except NetworkError as exc:
+                delay = retry_policy.get_delay(attempt, start_time, is_idempotent, exc.__cause__)
+                if delay is None:
+                    raise
+            else:
+                if not _has_retry_status(response, retry_policy):
+                    break
+                delay = retry_policy.get_delay(attempt, start_time, is_idempotent, response)
+                if delay is None:
+                    break
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        return request.process_response(response)
+
+    def make_probe_request(self, request: BaseRequest, *args) -> dict:
+        """ Makes a request to probe the service: a single attempt with a short timeout """
+
+        request_data = request.prepare(*args)
+        request_data['timeout'] = HTTP_PROBE_TIMEOUT
+        return request.process_response(self._make_request(request_data))
+
+    async def make_probe_request_async(self, request: BaseRequest, *args) -> dict:
+        """ Makes a request to probe the service: a single attempt with a short timeout """
+
+        request_data = request.prepare(*args)
+        request_data['timeout'] = HTTP_PROBE_TIMEOUT
+        return request.process_response(await self._make_request_async(request_data))
+
     def _make_request(self, request_data: Dict) -> httpx.Response:
         if 'headers' not in request_data:
             request_data['headers'] = {}
@@ -61,6 +377,8 @@ class StandardHTTPTransport(BaseTransport):  # pylint: disable=too-few-public-me
     async def _make_request_async(self, request_data: Dict) -> httpx.Response:
         if 'headers' not in request_data:
             request_data['headers'] = {}
+        if isinstance(request_data.get('content'), Base64JSONBody):
+            request_data = dict(request_data, content=request_data['content'].aiter())
 
         try:
             response = await self.session_async.request(**request_data)
@@ -78,12 +396,92 @@ class StandardHTTPTransport(BaseTransport):  # pylint: disable=too-few-public-me
         return response
 
     def close(self):
-        """ Close connections """
-        self.session.close()
+        """ Close connections (of the shared client when the last transport using it is closed) """
+        with self._session_lock:
+            session, self._session = self._session, None
+            key, self._session_key = self._session_key, None
+        if key is not None:
+            session = release_client(key)
+        if session is not None:
+            session.close()
 
     async def close_async(self):
         """ Close connections (async) """
-        await self.session_async.aclose()
+        with self._session_lock:
+            session, self._session_async = self._session_async, None
+            key, self._session_async_key = self._session_async_key, None
+        if key is not None:
+            session = release_client(key)
+        if session is not None:
+            await session.aclose()
+
+
+def is_multipart_upload(content: bytes, min_size: Optional[int] = HTTP_MULTIPART_MIN_SIZE) -> bool:
+    """ Checks if the content is big enough to upload it as a file instead of base64 """
+    return min_size is not None and len(content) >= min_size
+
+
+class Base64JSONBody:
+    """
+    JSON request body with a file encoded to base64 chunk by chunk while sending.
+
+    Neither the base64 string nor the whole body is kept in memory, only the file and a chunk
+    being sent. The body can be sent several times (e.g. on retries).
+
+    :param data: JSON data.
+    :param path: Keys of the base64 field in the data (e.g. ('task', 'body')).
+    :param content: File content.
+    :param chunk_size: (optional) Bytes of the file encoded at once.
+    """
+
+    def __init__(self, data: Dict, path: Sequence[str], content: bytes,
+                 chunk_size: int = HTTP_BASE64_CHUNK_SIZE):
+        placeholder = uuid4().hex
+        data = _replace_value(data, path, placeholder)
+        prefix, suffix = json.dumps(data).split(placeholder, 1)
+
+        self._prefix = prefix.encode('utf-8')
+        self._suffix = suffix.encode('utf-8')
+        self._content = memoryview(content)
+        self._chunk_size = chunk_size - chunk_size % 3
+
+    def __len__(self) -> int:
+        base64_size = (len(self._content) + 2) // 3 * 4
+        return len(self._prefix) + base64_size + len(self._suffix)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._prefix
+        for offset in range(0, len(self._content), self._chunk_size):
+            yield base64.b64encode(self._content[offset:offset + self._chunk_size])
+        yield self._suffix
+
+    async def aiter(self) -> AsyncIterator[bytes]:
+        """ Iterates over the body chunks (async) """
+        for chunk in self:
+            yield chunk
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """ Headers describing the body """
+        return {'Content-Type': 'application/json', 'Content-Length': str(len(self))}
+
+
+def _replace_value(data: Dict, path: Sequence[str], value: Any) -> Dict:
+    """ Returns a copy of the nested dicts with the value at the path replaced """
+
+    data = dict(data)
+    if len(path) == 1:
+        data[path[0]] = value
+    else:
+        data[path[0]] = _replace_value(data[path[0]], path[1:], value)
+    return data
+
+
+def _has_retry_status(response, retry_policy: RetryPolicy) -> bool:
+    # a response with a bad status is returned (not raised) if HTTP errors are not handled
+    return isinstance(response, httpx.Response) and (
+        response.status_code == 429 or response.status_code in retry_policy.status_forcelist
+    )
 
 
 class HTTPRequestJSON(BaseRequest):
@@ -0,0 +1,9 @@
+# -*- coding: UTF-8 -*-
+"""
+Batch solving
+"""
+
+# pylint: disable=unused-import,import-error
+from ._batch import BatchItem, BatchResult
+
+__all__ = 'BatchItem', 'BatchResult'
@@ -0,0 +1,11 @@
+# -*- coding: UTF-8 -*-
+"""
+Cache of solutions of image and text CAPTCHAs
+"""
+
+# pylint: disable=unused-import,import-error
+from ._misc.cache import SolutionCache, MemoryCache, SQLiteCache, get_cache_key
+from ._misc.phash import PerceptualIndex, dhash, phash
+
+__all__ = ('SolutionCache', 'MemoryCache', 'SQLiteCache', 'get_cache_key', 'PerceptualIndex',
+           'dhash', 'phash')
@@ -36,6 +36,12 @@ class ProxyError(UnicapsException):
     """
 
 
+class CircuitOpenError(NetworkError):
+    """
+    Service is considered down (too many recent failures), the request is not sent
+    """
+
+
 class AccessDeniedError(ServiceError):
     """
     Wrong API key
@@ -0,0 +1,9 @@
+# -*- coding: UTF-8 -*-
+"""
+Image limits of services and preprocessing of images
+"""
+
+# pylint: disable=unused-import,import-error
+from ._misc.image import ImageLimits, ImagePreprocessor, PreprocessingStats
+
+__all__ = 'ImageLimits', 'ImagePreprocessor', 'PreprocessingStats'
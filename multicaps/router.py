@@ -0,0 +1,9 @@
+# -*- coding: UTF-8 -*-
+"""
+Routing of CAPTCHAs to services by live statistics
+"""
+
+# pylint: disable=unused-import,import-error
+from ._misc.routing import RouterStats, ServiceStats, Objective, fastest, cheapest, most_reliable
+
+__all__ = 'RouterStats', 'ServiceStats', 'Objective', 'fastest', 'cheapest', 'most_reliable'
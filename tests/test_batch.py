@@ -0,0 +1,233 @@
+# -*- coding: UTF-8 -*-
+"""
+Batch solving tests
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from multicaps import AsyncCaptchaSolver, CaptchaSolver
+from multicaps.batch import BatchItem
+from multicaps.captcha import RecaptchaV2
+from multicaps.exceptions import UnableToSolveError
+
+API_KEY = 'TEST_API_KEY'
+
+
+class FakeService:
+    """ Solves RecaptchaV2 with site key as the result, "bad" site keys fail """
+
+    def __init__(self):
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def solve_captcha_async(self, captcha, proxy=None, user_agent=None, cookies=None):
+        self.calls.append((captcha, proxy, user_agent, cookies))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01 if captcha.site_key != 'slow' else 0.05)
+        finally:
+            self.running -= 1
+
+        if captcha.site_key == 'bad':
+            raise UnableToSolveError()
+        return f'solved:{captcha.site_key}'
+
+
+@pytest.fixture()
+def solver():
+    solver = AsyncCaptchaSolver('2captcha.com', API_KEY)
+    solver._service = FakeService()
+    return solver
+
+
+def test_solve_many(solver):
+    captchas = [RecaptchaV2('slow', 'url'), RecaptchaV2('bad', 'url'),
+                BatchItem(RecaptchaV2('key', 'url'), user_agent='UA', cookies={'a': 'b'}),
+                'not a captcha']
+
+    results = asyncio.run(solver.solve_many(captchas, concurrency=2))
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert results[0].result() == 'solved:slow'
+    assert isinstance(results[1].exception, UnableToSolveError)
+    assert not results[1].ok
+    assert results[2].solved_captcha == 'solved:key'
+    assert results[2].captcha.site_key == 'key'
+    assert results[3].captcha is None
+    with pytest.raises(Exception):
+        results[3].result()
+
+    assert solver._service.calls[2][2:] == ('UA', {'a': 'b'})
+    assert solver._service.max_running == 2
+
+
+def test_as_completed_yields_in_completion_order(solver):
+    async def main():
+        return [result.index async for result in solver.as_completed(
+            [RecaptchaV2('slow', 'url'), RecaptchaV2('key', 'url')]
+        )]
+
+    assert asyncio.run(main()) == [1, 0]
+
+
+def test_as_completed_pulls_input_lazily(solver):
+    pulled = []
+
+    async def captchas():
+        for i in range(1000):
+            pulled.append(i)
+            yield RecaptchaV2(f'key{i}', 'url')
+
+    async def main():
+        max_ahead = 0
+        count = 0
+        async for _ in solver.as_completed(captchas(), concurrency=5):
+            count += 1
+            max_ahead = max(max_ahead, len(pulled) - count)
+            if count == 20:
+                break
+        return max_ahead
+
+    assert asyncio.run(main()) <= 5
+    assert len(pulled) < 30
+
+
+def test_async_submit(solver):
+    async def main():
+        task = solver.submit(RecaptchaV2('key', 'url'), user_agent='UA')
+        assert isinstance(task, asyncio.Task)
+        return await task
+
+    assert asyncio.run(main()) == 'solved:key'
+    assert solver._service.calls[0][2] == 'UA'
+
+
+def test_async_map_keeps_input_order(solver):
+    async def captchas():
+        for site_key in ('slow', 'bad', 'key'):
+            yield RecaptchaV2(site_key, 'url')
+        yield 'not a captcha'
+
+    async def main():
+        return [result async for result in solver.map(captchas(), concurrency=2)]
+
+    results = asyncio.run(main())
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert results[0].solved_captcha == 'solved:slow'
+    assert isinstance(results[1].exception, UnableToSolveError)
+    assert results[2].solved_captcha == 'solved:key'
+    assert not results[3].ok
+    assert solver._service.max_running == 2
+
+
+def test_async_close_does_not_block_event_loop(solver):
+    solver._service.close_async = lambda: asyncio.sleep(0)
+    executor = solver._get_executor()
+    release = threading.Event()
+    executor.submit(release.wait, 1)
+
+    async def main():
+        closing = asyncio.ensure_future(solver.close())
+        await asyncio.sleep(0.05)
+        assert not closing.done()
+        release.set()
+        await closing
+
+    asyncio.run(main())
+
+
+def test_as_completed_bad_concurrency(solver):
+    async def main():
+        async for _ in solver.as_completed([], concurrency=0):
+            pass
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+
+class FakeSyncService:
+    """ Solves RecaptchaV2 with site key as the result, "bad" site keys fail """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.closed = False
+
+    def solve_captcha(self, captcha, proxy=None, user_agent=None, cookies=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(0.2 if captcha.site_key == 'slow' else 0.01)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+        if captcha.site_key == 'bad':
+            raise UnableToSolveError()
+        return f'solved:{captcha.site_key}:{user_agent}'
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture()
+def sync_solver():
+    solver = CaptchaSolver('2captcha.com', API_KEY, max_workers=3)
+    solver._service = FakeSyncService()
+    return solver
+
+
+def test_submit(sync_solver):
+    future = sync_solver.submit(RecaptchaV2('key', 'url'), user_agent='UA')
+    assert future.result() == 'solved:key:UA'
+
+    future = sync_solver.submit(RecaptchaV2('bad', 'url'))
+    with pytest.raises(UnableToSolveError):
+        future.result()
+
+
+def test_map_keeps_input_order(sync_solver):
+    captchas = [RecaptchaV2('slow', 'url'), RecaptchaV2('bad', 'url'),
+                BatchItem(RecaptchaV2('key', 'url'), user_agent='UA'), 'not a captcha']
+
+    results = list(sync_solver.map(captchas))
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert results[0].solved_captcha == 'solved:slow:None'
+    assert isinstance(results[1].exception, UnableToSolveError)
+    assert results[2].solved_captcha == 'solved:key:UA'
+    assert not results[3].ok
+
+
+def test_sync_as_completed(sync_solver):
+    pulled = []
+
+    def captchas():
+        for i in range(100):
+            pulled.append(i)
+            yield RecaptchaV2('slow' if i == 0 else f'key{i}', 'url')
+
+    results = sync_solver.as_completed(captchas(), concurrency=2)
+    indexes = [next(results).index for _ in range(5)]
+    results.close()
+
+    assert 0 not in indexes
+    assert len(pulled) <= 7
+    assert sync_solver._service.max_running <= 2
+
+
+def test_close_waits_for_submitted_tasks(sync_solver):
+    futures = [sync_solver.submit(RecaptchaV2('slow', 'url')) for _ in range(3)]
+    sync_solver.close()
+
+    assert all(future.done() for future in futures)
+    assert sync_solver._service.closed
@@ -0,0 +1,132 @@
+# -*- coding: UTF-8 -*-
+"""
+Solution cache tests
+"""
+
+import asyncio
+from unittest import mock
+
+import httpx
+import pytest
+
+from multicaps import CaptchaSolver
+from multicaps._service import twocaptcha
+from multicaps.cache import MemoryCache, SQLiteCache, get_cache_key
+from multicaps.captcha import ImageCaptcha, RecaptchaV2, TextCaptcha
+from multicaps.common import CaptchaCharType, WorkerLanguage
+
+IMAGE = b'\x89PNG\r\n\x1a\n' + bytes(100)
+
+
+def make_service(cache):
+    """ Returns a service solving CAPTCHAs with "answer" and a list of sent requests """
+
+    service = twocaptcha.Service('key', solution_cache=cache)
+    for settings in service.settings.values():
+        settings.polling_delay = 0
+        settings.polling_interval = 0
+    sent = []
+
+    def handler(request):
+        sent.append(request.url.path)
+        return httpx.Response(
+            200, json={'status': 1, 'request': '1' if request.url.path == '/in.php' else 'answer'}
+        )
+
+    service._transport.session = httpx.Client(transport=httpx.MockTransport(handler))
+    service._transport.session_async = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service, sent
+
+
+def test_cache_key():
+    assert get_cache_key(ImageCaptcha(IMAGE)) == get_cache_key(ImageCaptcha(IMAGE))
+    assert get_cache_key(ImageCaptcha(IMAGE)) != get_cache_key(ImageCaptcha(IMAGE + b'\x00'))
+    assert get_cache_key(ImageCaptcha(IMAGE)) != get_cache_key(
+        ImageCaptcha(IMAGE, char_type=CaptchaCharType.NUMERIC)
+    )
+    assert (get_cache_key(TextCaptcha(' What is  2 + 2? '))
+            == get_cache_key(TextCaptcha('what is 2 + 2?')))
+    assert (get_cache_key(TextCaptcha('What is 2 + 2?'))
+            != get_cache_key(TextCaptcha('What is 2 + 2?', language=WorkerLanguage.ENGLISH)))
+    assert get_cache_key(RecaptchaV2('key', 'url')) is None
+
+
+@pytest.mark.parametrize('make_cache', [MemoryCache, lambda **kwargs: SQLiteCache(':memory:',
+                                                                                  **kwargs)])
+def test_cache_evicts_entries(make_cache):
+    cache = make_cache(max_size=2)
+    cache.set('a', {'value': 1})
+    cache.set('b', {'value': 2})
+    assert cache.get('a') == {'value': 1}
+
+    cache.set('c', {'value': 3})  # "b" is the least recently used one
+    assert cache.get('b') is None
+    assert len(cache) == 2
+
+    cache.delete('a')
+    assert cache.get('a') is None and cache.get('c') == {'value': 3}
+
+    with mock.patch('time.monotonic', return_value=1e12), mock.patch('time.time',
+                                                                     return_value=1e12):
+        assert cache.get('c') is None
+
+
+def test_sqlite_cache_is_persistent(tmp_path):
+    cache = SQLiteCache(tmp_path / 'cache.sqlite')
+    cache.set('a', {'value': 1})
+    cache.close()
+
+    cache = SQLiteCache(tmp_path / 'cache.sqlite')
+    assert cache.get('a') == {'value': 1}
+    cache.close()
+
+
+def test_service_reuses_solutions():
+    service, sent = make_service(True)
+
+    solved = service.solve_captcha(ImageCaptcha(IMAGE))
+    assert not solved.is_cached and len(sent) == 2
+
+    cached = service.solve_captcha(ImageCaptcha(IMAGE))
+    assert cached.is_cached and cached.cost == 0.0
+    assert cached.solution.text == 'answer' and cached.captcha_id == solved.captcha_id
+    # the task result has the same shape as the result of a solved task
+    assert cached.task.get_result() == (cached.solution, 0.0, cached.extra)
+    assert cached.task.is_done()
+    assert len(sent) == 2
+
+    assert cached.report_good() and cached.report_bad()
+    assert len(sent) == 2
+    assert not service.solve_captcha(ImageCaptcha(IMAGE)).is_cached
+
+
+def test_report_bad_evicts_solution():
+    service, sent = make_service(MemoryCache())
+
+    service.solve_captcha(TextCaptcha('What is 2 + 2?')).report_bad()
+    assert sent[-1] == '/res.php' and len(service.solution_cache) == 0
+    assert not service.solve_captcha(TextCaptcha('What is 2 + 2?')).is_cached
+
+
+def test_service_reuses_solutions_async(tmp_path):
+    service, sent = make_service(SQLiteCache(tmp_path / 'cache.sqlite'))
+
+    async def solve():
+        solved = await service.solve_captcha_async(ImageCaptcha(IMAGE))
+        cached = await service.solve_captcha_async(ImageCaptcha(IMAGE))
+        assert not solved.is_cached and cached.is_cached
+        assert await cached.report_bad()
+        assert not (await service.solve_captcha_async(ImageCaptcha(IMAGE))).is_cached
+
+    asyncio.run(solve())
+    assert len(sent) == 4
+
+
+def test_solver_option():
+    assert CaptchaSolver('2captcha.com', 'key')._service.solution_cache is None
+    assert isinstance(CaptchaSolver('2captcha.com', 'key', solution_cache=True)._service
+                      .solution_cache, MemoryCache)
+
+    cache = MemoryCache()  # empty
+    solver = CaptchaSolver('2captcha.com', 'key', solution_cache=cache)
+    assert solver._service.solution_cache is cache
@@ -0,0 +1,136 @@
+# -*- coding: UTF-8 -*-
+"""
+Circuit breaker tests
+"""
+
+import asyncio
+from unittest import mock
+
+import pytest
+
+from multicaps import CaptchaSolver
+from multicaps._service import twocaptcha
+from multicaps._service.circuit_breaker import CircuitBreaker, CircuitState
+from multicaps._transport.http_transport import HTTP_PROBE_TIMEOUT, HTTP_RETRY_MAX_COUNT
+from multicaps.exceptions import (CircuitOpenError, NetworkError, ServiceTooBusy,
+                                  UnableToSolveError)
+
+
+@pytest.fixture()
+def breaker():
+    return CircuitBreaker(window=60, min_calls=4, failure_rate=0.5, open_time=0.05)
+
+
+def test_circuit_breaker_opens_on_failure_rate(breaker):
+    breaker.on_result()
+    breaker.on_result(UnableToSolveError())  # not a service failure
+    breaker.on_result(NetworkError())
+    assert breaker.state is CircuitState.CLOSED
+
+    breaker.on_result(ServiceTooBusy())
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.retry_after > 0
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_circuit_breaker_half_open(breaker):
+    for _ in range(4):
+        breaker.on_result(NetworkError())
+    assert breaker.state is CircuitState.OPEN
+
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.before_call() is True
+    # only one caller probes the service
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.on_probe(False)
+    assert breaker.state is CircuitState.OPEN
+
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.before_call() is True
+    breaker.on_probe(True)
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.before_call() is False
+
+
+def make_service(handler):
+    service = twocaptcha.Service('test', circuit_breaker=CircuitBreaker(
+        min_calls=2, failure_rate=0.5, open_time=0.05))
+    sent = []
+
+    def make_request(request_data):
+        sent.append(request_data['params']['action'])
+        return handler(request_data)
+
+    async def make_request_async(request_data):
+        return make_request(request_data)
+
+    service._transport._make_request = make_request
+    service._transport._make_request_async = make_request_async
+    service._transport.settings['max_retries'] = 0
+    return service, sent
+
+
+def test_service_circuit_breaker():
+    is_down = True
+
+    def handler(request_data):
+        if is_down:
+            raise NetworkError('Timeout')
+        response = mock.Mock()
+        response.json = lambda: {'status': 1, 'request': '10.0'}
+        return response
+
+    service, sent = make_service(handler)
+    for _ in range(2):
+        with pytest.raises(NetworkError):
+            service.get_balance()
+    assert service.circuit_state is CircuitState.OPEN
+
+    # fails fast
+    with pytest.raises(CircuitOpenError):
+        service.get_balance()
+    assert len(sent) == 2
+
+    # probe fails
+    asyncio.run(asyncio.sleep(0.06))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(service.get_balance_async())
+    assert sent[2] == 'getbalance' and len(sent) == 3
+
+    # probe succeeds
+    is_down = False
+    asyncio.run(asyncio.sleep(0.06))
+    assert service.get_balance() == 10.0
+    assert len(sent) == 5
+    assert service.circuit_state is CircuitState.CLOSED
+
+
+def test_service_probe_is_not_retried():
+    timeouts = []
+
+    def handler(request_data):
+        timeouts.append(request_data.get('timeout'))
+        raise NetworkError('Timeout')
+
+    service, sent = make_service(handler)
+    for _ in range(2):
+        with pytest.raises(NetworkError):
+            service.get_balance()
+    service._transport.settings['max_retries'] = HTTP_RETRY_MAX_COUNT
+
+    # a single attempt with a short timeout instead of retries within the retry budget
+    for probe in (service.get_balance, lambda: asyncio.run(service.get_balance_async())):
+        asyncio.run(asyncio.sleep(0.06))
+        with pytest.raises(CircuitOpenError):
+            probe()
+    assert len(sent) == 4 and timeouts[2:] == [HTTP_PROBE_TIMEOUT] * 2
+    assert service.circuit_state is CircuitState.OPEN
+
+
+def test_solver_circuit_state():
+    solver = CaptchaSolver('2captcha.com', 'test')
+    assert solver.circuit_state == 'closed'
@@ -0,0 +1,97 @@
+# -*- coding: UTF-8 -*-
+"""
+FailoverSolver tests
+"""
+
+import asyncio
+from unittest import mock
+
+import pytest
+
+from multicaps import FailoverSolver, AsyncFailoverSolver, CaptchaSolvingService
+from multicaps.captcha import RecaptchaV2, TextCaptcha
+from multicaps.exceptions import (LowBalanceError, NetworkError, UnableToSolveError,
+                                  UnicapsException)
+
+
+def mock_service(solver, result):
+    """ Replaces solving functions of the service with mocks returning or raising result """
+
+    service = solver._service
+    side_effect = [result] if isinstance(result, Exception) else None
+    service.solve_captcha = mock.Mock(return_value=result, side_effect=side_effect)
+    service.solve_captcha_async = mock.AsyncMock(return_value=result, side_effect=side_effect)
+    return service
+
+
+@pytest.fixture(params=[FailoverSolver, AsyncFailoverSolver])
+def failover_solver(request):
+    return request.param([
+        (CaptchaSolvingService.ANTI_CAPTCHA, 'key1'),
+        ('2captcha.com', 'key2'),
+        (CaptchaSolvingService.RUCAPTCHA, 'key3'),
+    ])
+
+
+def solve(solver, captcha):
+    if isinstance(solver, AsyncFailoverSolver):
+        return asyncio.run(solver.solve_captcha(captcha))
+    return solver.solve_captcha(captcha)
+
+
+def test_failover_to_next_service(failover_solver):
+    first, second, third = (mock_service(solver, result) for solver, result in zip(
+        failover_solver.solvers, [LowBalanceError(), NetworkError(), 'solved']
+    ))
+
+    assert solve(failover_solver, RecaptchaV2('key', 'url')) == 'solved'
+    for service in (first, second, third):
+        assert (service.solve_captcha.call_count + service.solve_captcha_async.call_count) == 1
+
+
+def test_failover_not_on_captcha_errors(failover_solver):
+    mock_service(failover_solver.solvers[0], UnableToSolveError())
+    second = mock_service(failover_solver.solvers[1], 'solved')
+
+    with pytest.raises(UnableToSolveError):
+        solve(failover_solver, RecaptchaV2('key', 'url'))
+    assert not second.solve_captcha.called and not second.solve_captcha_async.called
+
+
+def test_failover_skips_unsupported_services(failover_solver):
+    first = mock_service(failover_solver.solvers[0], 'solved0')
+    mock_service(failover_solver.solvers[1], NetworkError())
+    mock_service(failover_solver.solvers[2], 'solved2')
+
+    # TextCaptcha is not supported by anti-captcha.com
+    assert solve(failover_solver, TextCaptcha('text')) == 'solved2'
+    assert not first.solve_captcha.called and not first.solve_captcha_async.called
+
+
+def test_failover_all_services_failed(failover_solver):
+    for solver in failover_solver.solvers:
+        mock_service(solver, NetworkError())
+
+    with pytest.raises(NetworkError):
+        solve(failover_solver, RecaptchaV2('key', 'url'))
+
+
+def test_failover_custom_exceptions():
+    solver = FailoverSolver([('2captcha.com', 'key1'), ('rucaptcha.com', 'key2')],
+                            failover_exceptions=(UnableToSolveError,))
+    mock_service(solver.solvers[0], UnableToSolveError())
+    mock_service(solver.solvers[1], 'solved')
+    assert solver.solve_recaptcha_v2('key', 'url') == 'solved'
+
+    mock_service(solver.solvers[0], NetworkError())
+    with pytest.raises(NetworkError):
+        solver.solve_recaptcha_v2('key', 'url')
+
+
+def test_failover_bad_init():
+    with pytest.raises(ValueError):
+        FailoverSolver([])
+
+    solver = FailoverSolver([('anti-captcha.com', 'key1')])
+    with pytest.raises(UnicapsException):
+        solver.solve_captcha(TextCaptcha('text'))
@@ -0,0 +1,157 @@
+# -*- coding: UTF-8 -*-
+"""
+AsyncHedgedSolver tests
+"""
+
+import asyncio
+import itertools
+from unittest import mock
+
+import pytest
+
+from multicaps import AsyncHedgedSolver, CaptchaSolvingService
+from multicaps._service.base import AsyncCaptchaTask
+from multicaps.exceptions import NetworkError, UnableToSolveError
+
+SERVICES = [
+    (CaptchaSolvingService.TWOCAPTCHA, 'key1'),
+    (CaptchaSolvingService.ANTI_CAPTCHA, 'key2'),
+    (CaptchaSolvingService.DEATHBYCAPTCHA, 'user:password'),
+]
+
+
+def mock_service(solver, solve_time, result=('solution', 0.002, {})):
+    """ Replaces task creation and polling of the service with mocks """
+
+    service = solver._service
+    service.polls_cancelled = 0
+    for settings in service.settings.values():
+        settings.polling_delay = 0
+        settings.polling_interval = 0
+
+    async def get_task_result_async(task):
+        try:
+            await asyncio.sleep(solve_time)
+        except asyncio.CancelledError:
+            service.polls_cancelled += 1
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    task_ids = itertools.count(1)
+    service.create_task_async = mock.AsyncMock(
+        side_effect=lambda captcha, *args: AsyncCaptchaTask(service, captcha, str(next(task_ids)))
+    )
+    service.get_task_result_async = mock.Mock(side_effect=get_task_result_async)
+    # report requests
+    service._make_request_async = mock.AsyncMock(return_value=True)
+    return service
+
+
+def solve(solver):
+    async def run():
+        try:
+            return await solver.solve_recaptcha_v2('key', 'url')
+        finally:
+            await solver.close()
+    return asyncio.run(run())
+
+
+def test_hedge_fastest_wins():
+    solver = AsyncHedgedSolver(SERVICES, report_loser=True)
+    first = mock_service(solver.solvers[0], 0.5)
+    second = mock_service(solver.solvers[1], 0.01, ('solution2', 0.003, {}))
+    third = mock_service(solver.solvers[2], 0.01)
+
+    solved = solve(solver)
+    assert solved.solution == 'solution2'
+    assert solved.task._service is second
+    assert first.polls_cancelled == 1
+    assert not third.create_task_async.called
+
+    # the unsolved task of the loser is reported by its ID
+    request_class, report = first._make_request_async.call_args.args
+    assert request_class == 'ReportBad' and report.captcha_id == '1'
+    assert first._make_request_async.call_count == 1
+    assert not second._make_request_async.called
+
+    stats = solver.hedge_stats
+    assert (stats.solved, stats.hedged, stats.hedge_wins, stats.extra_tasks) == (1, 1, 1, 1)
+    assert stats.hedge_win_rate == 1
+    assert stats.cost == pytest.approx(0.003)
+    assert stats.extra_cost == pytest.approx(0.003)
+
+
+def test_hedge_delay():
+    solver = AsyncHedgedSolver(SERVICES, hedge_delay=0.2)
+    first = mock_service(solver.solvers[0], 0.01)
+    second = mock_service(solver.solvers[1], 0.01)
+
+    assert solve(solver).task._service is first
+    assert not second.create_task_async.called
+    assert not first._make_request_async.called
+    assert solver.hedge_stats.hedged == 0 and solver.hedge_stats.hedge_win_rate == 0
+
+    solver = AsyncHedgedSolver(SERVICES, hedge_delay=0.05)
+    first = mock_service(solver.solvers[0], 0.3)
+    second = mock_service(solver.solvers[1], 0.01)
+
+    assert solve(solver).task._service is second
+    assert first.polls_cancelled == 1
+    assert not first._make_request_async.called
+    assert solver.hedge_stats.hedge_wins == 1
+
+
+def test_hedge_early_failure():
+    solver = AsyncHedgedSolver(SERVICES, hedge_delay=10)
+    mock_service(solver.solvers[0], 0.01, NetworkError())
+    second = mock_service(solver.solvers[1], 0.01)
+
+    # the second service is used at once after the first one failed
+    assert solve(solver).task._service is second
+
+
+def test_hedge_both_failed():
+    solver = AsyncHedgedSolver(SERVICES)
+    mock_service(solver.solvers[0], 0.01, NetworkError())
+    mock_service(solver.solvers[1], 0.02, NetworkError())
+    third = mock_service(solver.solvers[2], 0.01)
+
+    assert solve(solver).task._service is third
+
+    solver = AsyncHedgedSolver(SERVICES)
+    mock_service(solver.solvers[0], 0.01, UnableToSolveError())
+    mock_service(solver.solvers[1], 0.02, NetworkError())
+    third = mock_service(solver.solvers[2], 0.01)
+
+    with pytest.raises(UnableToSolveError):
+        solve(solver)
+    assert not third.create_task_async.called
+
+
+def test_hedge_not_on_captcha_errors():
+    solver = AsyncHedgedSolver(SERVICES, hedge_delay=10)
+    mock_service(solver.solvers[0], 0.01, UnableToSolveError())
+    second = mock_service(solver.solvers[1], 0.01)
+
+    with pytest.raises(UnableToSolveError):
+        solve(solver)
+    assert not second.create_task_async.called
+    assert solver.hedge_stats.hedged == 0
+
+
+def test_hedge_loser_cancelled_while_creating_task():
+    solver = AsyncHedgedSolver(SERVICES, report_loser=True)
+    first = mock_service(solver.solvers[0], 0.01)
+    mock_service(solver.solvers[1], 0.01)
+
+    async def create_task_async(captcha, *args):
+        await asyncio.sleep(0.5)
+    first.create_task_async = mock.AsyncMock(side_effect=create_task_async)
+
+    assert solve(solver).task._service is solver.solvers[1]._service
+
+    # the task is counted, but it can't be reported without its ID
+    assert solver.hedge_stats.extra_tasks == 1
+    assert not first._make_request_async.called
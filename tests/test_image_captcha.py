@@ -1,10 +1,21 @@
 # -*- coding: UTF-8 -*-
 
+import asyncio
 import base64
+import copy
+import dataclasses
+import importlib
+import mmap
 import os.path
 import pathlib
+import pickle
+import threading
 
+import httpx
 import pytest
+from multicaps._captcha import image as image_module
+from multicaps._service import twocaptcha
+from multicaps._transport.http_transport import HTTP_MULTIPART_MIN_SIZE
 from multicaps.captcha import ImageCaptcha
 from multicaps.exceptions import BadInputDataError
 
@@ -49,3 +60,160 @@ def test_bad_image():
     """ Bad image input test """
     with pytest.raises(BadInputDataError):
         ImageCaptcha(image=b'bad_image_data')
+
+
+def test_image_file(image_bytes):
+    """ Image file to upload test """
+    captcha = ImageCaptcha(image=image_bytes)
+    assert captcha.get_image_file() == ('captcha.png', image_bytes, 'image/png')
+
+    jpeg_bytes = b'\xff\xd8\xff' + bytes(20)
+    captcha = ImageCaptcha(image=jpeg_bytes)
+    assert captcha.get_image_file() == ('captcha.jpg', jpeg_bytes, 'image/jpeg')
+
+
+@pytest.mark.parametrize("service_name, file_field", [
+    ('twocaptcha', 'file'), ('rucaptcha', 'file'), ('sctg', 'file'), ('azcaptcha', 'file'),
+    ('cptch_net', 'file'), ('deathbycaptcha', 'captchafile')
+])
+def test_image_upload(image_bytes, service_name, file_field):
+    """ Big images are uploaded as multipart files, small ones as base64 """
+
+    service_module = importlib.import_module('multicaps._service.' + service_name)
+    service = service_module.Service('api_key')
+    request = service_module.ImageCaptchaTaskRequest(service)
+
+    small_image = ImageCaptcha(image=image_bytes)
+    request_data = request.prepare(small_image, None, None, None)
+    assert 'files' not in request_data
+    assert base64.b64encode(image_bytes).decode('ascii') in str(request_data['data'])
+
+    big_image = ImageCaptcha(image=image_bytes + bytes(HTTP_MULTIPART_MIN_SIZE))
+    request_data = request.prepare(big_image, None, None, None)
+    assert request_data['files'] == {file_field: big_image.get_image_file()}
+    assert 'body' not in request_data['data'] and 'captchafile' not in request_data['data']
+    if file_field == 'file':
+        assert request_data['data']['method'] == 'post'
+
+    sent = []
+
+    def handler(http_request):
+        sent.append(http_request.read())
+        return httpx.Response(200, json={'status': 0, 'captcha': 1, 'is_correct': True}
+                              if service_name == 'deathbycaptcha' else
+                              {'status': 1, 'request': '1'})
+
+    service._transport.session = httpx.Client(transport=httpx.MockTransport(handler))
+    assert service.create_task(big_image).task_id == '1'
+    assert big_image.get_image_bytes() in sent[0]
+    assert len(sent[0]) < len(big_image.get_image_base64())
+
+
+def test_image_file_read_on_first_use(tmp_path, image_bytes):
+    """ Image file is read on first use """
+    image_path = tmp_path / 'image.png'
+    captcha = ImageCaptcha(image=image_path)
+
+    image_path.write_bytes(image_bytes)
+    assert captcha.get_image_bytes() == image_bytes
+    assert captcha.get_image_type() == 'png'
+
+    with pytest.raises(BadInputDataError):
+        (tmp_path / 'bad_image').write_bytes(b'bad_image_data')
+        ImageCaptcha(image=tmp_path / 'bad_image').get_image_bytes()
+
+
+def test_big_image_file_mapped(tmp_path, image_bytes, monkeypatch):
+    """ Big image file is mapped into memory """
+    monkeypatch.setattr(image_module, 'IMAGE_MMAP_MIN_SIZE', HTTP_MULTIPART_MIN_SIZE)
+    content = image_bytes + os.urandom(HTTP_MULTIPART_MIN_SIZE)
+    image_path = tmp_path / 'image.png'
+    image_path.write_bytes(content)
+
+    captcha = ImageCaptcha(image=image_path)
+    assert isinstance(captcha.get_image_bytes(), mmap.mmap)
+    assert captcha.get_image_type() == 'png'
+    assert captcha.get_image_base64() == base64.b64encode(content)
+
+    # uploads read the file independently
+    _, first_reader, _ = captcha.get_image_file()
+    _, second_reader, _ = captcha.get_image_file()
+    assert first_reader.read(100) == content[:100]
+    assert second_reader.read() == content
+    assert first_reader.read() == content[100:]
+
+    service = twocaptcha.Service('api_key')
+    sent = []
+
+    def handler(http_request):
+        sent.append(http_request)
+        return httpx.Response(200, json={'status': 1, 'request': '1'})
+
+    service._transport.session = httpx.Client(transport=httpx.MockTransport(handler))
+    service.create_task(captcha)
+    assert content in sent[0].content
+    assert sent[0].headers['Content-Length'] == str(len(sent[0].content))
+
+
+def test_big_image_file_unmapped(tmp_path, image_bytes, monkeypatch):
+    """ Memory map of an image file is closed with the CAPTCHA """
+    monkeypatch.setattr(image_module, 'IMAGE_MMAP_MIN_SIZE', HTTP_MULTIPART_MIN_SIZE)
+    content = image_bytes + os.urandom(HTTP_MULTIPART_MIN_SIZE)
+    image_path = tmp_path / 'image.png'
+    image_path.write_bytes(content)
+
+    with ImageCaptcha(image=image_path) as captcha:
+        image_map = captcha.get_image_bytes()
+        _, reader, _ = captcha.get_image_file()
+        assert reader.read(100) == content[:100]
+        reader.close()
+    assert image_map.closed
+
+    # the file is mapped again on next use
+    assert captcha.get_image_bytes()[:] == content
+    captcha.close()
+
+
+def test_image_captcha_copies(tmp_path, image_bytes, monkeypatch):
+    """ Image CAPTCHAs can be copied and pickled """
+    monkeypatch.setattr(image_module, 'IMAGE_MMAP_MIN_SIZE', HTTP_MULTIPART_MIN_SIZE)
+    content = image_bytes + os.urandom(HTTP_MULTIPART_MIN_SIZE)
+    image_path = tmp_path / 'image.png'
+    image_path.write_bytes(content)
+
+    for captcha in (ImageCaptcha(image=image_bytes, comment='test'),
+                    ImageCaptcha(image=image_path, comment='test')):
+        captcha.get_image_bytes()
+        copies = [copy.copy(captcha), copy.deepcopy(captcha),
+                  pickle.loads(pickle.dumps(captcha)), dataclasses.replace(captcha)]
+        for captcha_copy in copies:
+            assert captcha_copy == captcha and captcha_copy._lock is not captcha._lock
+            assert captcha_copy.get_image_bytes()[:] == captcha.get_image_bytes()[:]
+        captcha.close()
+        # copies of a mapped image file map it on their own
+        assert all(captcha_copy.get_image_bytes()[:] == content for captcha_copy in copies
+                   if captcha_copy.image == image_path)
+
+
+def test_image_file_read_in_thread(tmp_path, image_bytes, monkeypatch):
+    """ Image file is read out of the event loop """
+    image_path = tmp_path / 'image.png'
+    image_path.write_bytes(image_bytes)
+    thread_ids = []
+    read_image = image_module._read_image
+
+    def read_image_in_thread(image):
+        thread_ids.append(threading.get_ident())
+        return read_image(image)
+
+    monkeypatch.setattr(image_module, '_read_image', read_image_in_thread)
+
+    async def create_task():
+        service = twocaptcha.Service('api_key')
+        service._transport.session_async = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={'status': 1, 'request': '1'})
+        ))
+        return await service.create_task_async(ImageCaptcha(image=image_path))
+
+    asyncio.run(create_task())
+    assert thread_ids and thread_ids[0] != threading.get_ident()
@@ -0,0 +1,153 @@
+# -*- coding: UTF-8 -*-
+"""
+Image preflight tests
+"""
+
+import asyncio
+import importlib.util
+import io
+import os
+
+import httpx
+import pytest
+
+from multicaps import CaptchaSolver
+from multicaps._service import anti_captcha, deathbycaptcha, twocaptcha
+from multicaps.captcha import ImageCaptcha
+from multicaps.exceptions import BadInputDataError
+from multicaps.image import ImageLimits, ImagePreprocessor
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+HAS_PILLOW = importlib.util.find_spec('PIL') is not None
+
+
+def mock_session(service):
+    """ Replaces the HTTP clients of the service and returns a list of sent requests """
+
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200, json={'status': 1, 'request': '1'})
+
+    service._transport.session = httpx.Client(transport=httpx.MockTransport(handler))
+    service._transport.session_async = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return sent
+
+
+def make_png(width, height, noise=True):
+    """ Returns a PNG image (noise is hard to compress) """
+
+    image_module = pytest.importorskip('PIL.Image')
+    pixels = os.urandom(width * height * 3) if noise else bytes(width * height * 3)
+    output = io.BytesIO()
+    image_module.frombytes('RGB', (width, height), pixels).save(output, format='PNG')
+    return output.getvalue()
+
+
+def test_image_limits():
+    limits = ImageLimits(max_size=100, image_types=frozenset({'png'}))
+    limits.check(ImageCaptcha(PNG_SIGNATURE + bytes(92)))
+
+    with pytest.raises(BadInputDataError, match='too big'):
+        limits.check(ImageCaptcha(PNG_SIGNATURE + bytes(93)))
+    with pytest.raises(BadInputDataError, match='not supported'):
+        limits.check(ImageCaptcha(b'GIF89a' + bytes(10)))
+
+
+@pytest.mark.parametrize('service_module', [twocaptcha, anti_captcha, deathbycaptcha])
+def test_service_image_limits(service_module):
+    limits = service_module.ImageCaptchaTaskRequest.IMAGE_LIMITS
+    assert limits.max_size and {'jpeg', 'png', 'gif'} <= limits.image_types
+
+
+class KeepingPreprocessor(ImagePreprocessor):
+    """ Preprocessor keeping images as is (doesn't require Pillow) """
+
+    def __init__(self):  # pylint: disable=super-init-not-called
+        pass
+
+    def process(self, captcha, limits):
+        return captcha
+
+
+def test_image_checked_before_upload():
+    service = twocaptcha.Service('key', image_preprocessing=KeepingPreprocessor())
+    sent = mock_session(service)
+    limits = twocaptcha.ImageCaptchaTaskRequest.IMAGE_LIMITS
+
+    with pytest.raises(BadInputDataError):
+        service.create_task(ImageCaptcha(PNG_SIGNATURE + bytes(limits.max_size)))
+    with pytest.raises(BadInputDataError):
+        asyncio.run(service.create_task_async(ImageCaptcha(b'RIFF\x00\x00\x00\x00WEBP')))
+    assert not sent
+
+    service.create_task(ImageCaptcha(PNG_SIGNATURE + bytes(1000)))
+    assert len(sent) == 1
+
+
+def test_image_not_checked_without_preprocessing():
+    service = twocaptcha.Service('key')
+    sent = mock_session(service)
+    limits = twocaptcha.ImageCaptchaTaskRequest.IMAGE_LIMITS
+
+    service.create_task(ImageCaptcha(PNG_SIGNATURE + bytes(limits.max_size)))
+    asyncio.run(service.create_task_async(ImageCaptcha(b'RIFF\x00\x00\x00\x00WEBP')))
+    assert len(sent) == 2
+
+
+@pytest.mark.skipif(HAS_PILLOW, reason='Pillow is installed')
+def test_preprocessing_requires_pillow():
+    with pytest.raises(ImportError, match='Pillow'):
+        ImagePreprocessor()
+    with pytest.raises(ImportError):
+        CaptchaSolver('2captcha.com', 'key', image_preprocessing=True)
+
+
+def test_preprocessing_fits_max_size():
+    image = ImageCaptcha(make_png(300, 200))
+    limits = ImageLimits(max_size=50 * 1024, image_types=frozenset({'png', 'jpeg'}))
+    preprocessor = ImagePreprocessor()
+
+    processed = preprocessor.process(image, limits)
+    limits.check(processed)
+    assert processed.comment == image.comment
+    assert preprocessor.stats.shrunk == 1
+    assert preprocessor.stats.bytes_saved == (len(image.get_image_bytes())
+                                              - len(processed.get_image_bytes()))
+
+    # fitting images are sent as is
+    small_image = ImageCaptcha(make_png(30, 20, noise=False))
+    assert preprocessor.process(small_image, limits) is small_image
+
+
+def test_preprocessing_converts_image_type():
+    image = ImageCaptcha(make_png(30, 20))
+    processed = ImagePreprocessor().process(image, ImageLimits(image_types=frozenset({'jpeg'})))
+    assert processed.get_image_type() == 'jpeg'
+
+
+def test_preprocessing_grayscale_and_downscale():
+    image_module = pytest.importorskip('PIL.Image')
+    image = ImageCaptcha(make_png(400, 100))
+    preprocessor = ImagePreprocessor(max_width=200, grayscale=True)
+
+    processed = preprocessor.process(image, ImageLimits())
+    with image_module.open(io.BytesIO(processed.get_image_bytes())) as result:
+        assert result.size == (200, 50)
+        assert result.mode == 'L'
+    assert preprocessor.stats.bytes_saved > 0
+
+
+def test_service_preprocesses_images():
+    image = ImageCaptcha(make_png(400, 300))
+    preprocessor = ImagePreprocessor(image_format='jpeg')
+    service = twocaptcha.Service('key', image_preprocessing=preprocessor)
+    sent = mock_session(service)
+    assert len(image.get_image_bytes()) > twocaptcha.ImageCaptchaTaskRequest.IMAGE_LIMITS.max_size
+
+    task = service.create_task(image)
+    asyncio.run(service.create_task_async(image))
+    assert task.captcha is image
+    assert len(sent) == 2
+    assert preprocessor.stats.images == 2 and preprocessor.stats.bytes_saved > 0
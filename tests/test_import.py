@@ -0,0 +1,44 @@
+# -*- coding: UTF-8 -*-
+"""
+Import time tests
+"""
+
+import json
+import subprocess
+import sys
+
+SERVICE_MODULES = ['anti_captcha', 'azcaptcha', 'captcha_guru', 'cptch_net', 'deathbycaptcha',
+                   'multibot', 'rucaptcha', 'sctg', 'twocaptcha']
+
+
+def get_imported_modules(code):
+    """ Runs the code in a fresh interpreter and returns names of imported modules """
+
+    output = subprocess.check_output([
+        sys.executable, '-c',
+        f'import json, sys\n{code}\nprint(json.dumps(sorted(sys.modules)))'
+    ])
+    return set(json.loads(output))
+
+
+def test_import_is_lazy():
+    modules = get_imported_modules('import multicaps')
+
+    assert 'httpx' not in modules
+    assert not {f'multicaps._service.{name}' for name in SERVICE_MODULES} & modules
+    assert 'multicaps._captcha.recaptcha_v2' not in modules
+    assert 'multicaps._captcha.image' not in modules
+    assert 'sqlite3' not in modules
+
+
+def test_modules_imported_on_first_use():
+    modules = get_imported_modules(
+        'from multicaps import CaptchaSolver\n'
+        'CaptchaSolver("2captcha.com", "key")'
+    )
+    assert {'httpx', 'multicaps._service.twocaptcha'} <= modules
+    assert 'multicaps._service.anti_captcha' not in modules
+
+    modules = get_imported_modules('from multicaps.captcha import RecaptchaV2')
+    assert 'multicaps._captcha.recaptcha_v2' in modules
+    assert 'multicaps._captcha.hcaptcha' in modules  # all public CAPTCHA classes
@@ -0,0 +1,138 @@
+# -*- coding: UTF-8 -*-
+"""
+Perceptual hash tests
+"""
+
+import importlib.util
+import io
+import pathlib
+import random
+
+import httpx
+import pytest
+
+from multicaps import CaptchaSolver
+from multicaps._service import twocaptcha
+from multicaps.cache import PerceptualIndex, dhash, phash
+from multicaps.captcha import ImageCaptcha
+from multicaps.common import CaptchaCharType
+
+IMAGE = (pathlib.Path(__file__).parent / 'data' / 'image.jpg').read_bytes()
+HAS_DEPENDENCIES = (importlib.util.find_spec('numpy') is not None
+                    and importlib.util.find_spec('PIL') is not None)
+
+
+def reencode(image, **kwargs):
+    """ Returns the image re-encoded as JPEG """
+
+    image_module = pytest.importorskip('PIL.Image')
+    pytest.importorskip('numpy')
+    output = io.BytesIO()
+    with image_module.open(io.BytesIO(image)) as source:
+        source.convert('RGB').save(output, format='JPEG', **kwargs)
+    return output.getvalue()
+
+
+def make_service(index):
+    """ Returns a service solving CAPTCHAs with "answer" and a list of sent requests """
+
+    service = twocaptcha.Service('key', similar_images=index)
+    for settings in service.settings.values():
+        settings.polling_delay = 0
+        settings.polling_interval = 0
+    sent = []
+
+    def handler(request):
+        sent.append(request.url.path)
+        return httpx.Response(
+            200, json={'status': 1, 'request': '1' if request.url.path == '/in.php' else 'answer'}
+        )
+
+    service._transport.session = httpx.Client(transport=httpx.MockTransport(handler))
+    return service, sent
+
+
+@pytest.mark.skipif(HAS_DEPENDENCIES, reason='NumPy and Pillow are installed')
+def test_index_requires_numpy():
+    with pytest.raises(ImportError, match='NumPy'):
+        PerceptualIndex()
+    with pytest.raises(ImportError):
+        CaptchaSolver('2captcha.com', 'key', similar_images=True)
+
+
+@pytest.mark.parametrize('hash_function', [dhash, phash])
+def test_hash_of_reencoded_image(hash_function):
+    reencoded = reencode(IMAGE, quality=40)
+    original = hash_function(IMAGE)
+    assert 0 <= original < 2 ** 64
+    assert bin(original ^ hash_function(reencoded)).count('1') <= 8
+    assert hash_function(io.BytesIO(IMAGE)) == original
+
+
+def test_index_query():
+    pytest.importorskip('numpy')
+    pytest.importorskip('PIL')
+    rnd = random.Random(1)
+    index = PerceptualIndex(max_distance=6)
+    hashes = [rnd.getrandbits(64) for _ in range(5000)]
+    for number, image_hash in enumerate(hashes):
+        index.add(image_hash, str(number))
+    assert len(index) == 5000
+
+    query = hashes[10] ^ 0b1011 ^ (1 << 63)  # 4 bits flipped
+    assert index.query(query)[0] == (4, '10')
+    assert index.query(query, max_distance=3) == []
+    # the results are the same as of the full scan
+    for image_hash in (hashes[20] ^ (0b111111 << 30), rnd.getrandbits(64)):
+        expected = sorted((bin(image_hash ^ value).count('1'), str(number))
+                          for number, value in enumerate(hashes)
+                          if bin(image_hash ^ value).count('1') <= 6)
+        assert sorted(index.query(image_hash)) == expected
+
+    index.remove('10')
+    assert index.query(query) == [] and len(index) == 4999
+
+
+def test_index_size_is_bounded_under_churn():
+    pytest.importorskip('numpy')
+    pytest.importorskip('PIL')
+    rnd = random.Random(2)
+    index = PerceptualIndex()
+    hashes = {}
+    for number in range(20000):
+        # re-added and removed keys leave stale positions behind until the index is rebuilt
+        value = str(rnd.randrange(100))
+        if number % 3:
+            hashes[value] = rnd.getrandbits(64)
+            index.add(hashes[value], value)
+        else:
+            hashes.pop(value, None)
+            index.remove(value)
+
+        assert len(index._values) <= 2 * len(index) + 1
+    assert len(index) == len(hashes)
+    assert len(index._hashes) == 1024
+    assert sum(len(bucket) for table in index._tables for bucket in table.values()) \
+        <= 4 * len(index._values)
+    for value, image_hash in hashes.items():
+        assert index.query(image_hash)[0] == (0, value)
+
+
+def test_service_reuses_solutions_of_similar_images():
+    similar_image = reencode(IMAGE, quality=60)
+    service, sent = make_service(PerceptualIndex(max_distance=8))
+    assert service.solution_cache is not None
+
+    solved = service.solve_captcha(ImageCaptcha(IMAGE))
+    cached = service.solve_captcha(ImageCaptcha(similar_image))
+    assert not solved.is_cached and cached.is_cached
+    assert cached.cache_key == solved.cache_key and cached.solution.text == 'answer'
+    assert len(sent) == 2
+
+    # other options need another solution
+    assert not service.solve_captcha(
+        ImageCaptcha(similar_image, char_type=CaptchaCharType.NUMERIC)
+    ).is_cached
+
+    cached.report_bad()
+    assert not service.solve_captcha(ImageCaptcha(similar_image)).is_cached
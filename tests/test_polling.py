@@ -0,0 +1,536 @@
+# -*- coding: UTF-8 -*-
+"""
+Solution polling tests
+"""
+
+import asyncio
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from multicaps._misc import stats as stats_module
+from multicaps._misc.stats import SolveTimeHistogram, SolveTimeStats, get_solve_time_stats
+from multicaps._service import twocaptcha
+from multicaps._service.base import CaptchaTask, AsyncCaptchaTask
+from multicaps._service.polling import AdaptivePolling, MIN_POLLING_INTERVAL, get_solve_time
+from multicaps.captcha import CaptchaType, RecaptchaV2, GeeTest, HCaptcha
+from multicaps.exceptions import SolutionNotReadyYet, SolutionWaitTimeout, UnableToSolveError
+
+
+def json_response(data):
+    response = mock.Mock()
+    response.json = lambda: data
+    return response
+
+
+@pytest.fixture()
+def bulk_service():
+    service = twocaptcha.Service('test', bulk_polling=True)
+    service._bulk_poller.window = 0.05
+    return service
+
+
+def mock_transport(service, handler):
+    """ Replaces the transport request func and returns a list of sent requests """
+
+    sent = []
+
+    def make_request(request_data):
+        sent.append(request_data)
+        return json_response(handler(request_data))
+
+    async def make_request_async(request_data):
+        return make_request(request_data)
+
+    service._transport._make_request = make_request
+    service._transport._make_request_async = make_request_async
+    return sent
+
+
+def bulk_handler(answers):
+    def handler(request_data):
+        ids = request_data['params']['ids'].split(',')
+        return {'status': 1, 'request': '|'.join(answers[i] for i in ids)}
+    return handler
+
+
+def test_bulk_solution_request_parse_response(bulk_service):
+    tasks = [CaptchaTask(bulk_service, RecaptchaV2('key', 'url'), str(i)) for i in range(3)]
+    request = twocaptcha.BulkSolutionRequest(bulk_service)
+    request_data = request.prepare(tasks)
+    assert request_data['params']['action'] == 'get'
+    assert request_data['params']['ids'] == '0,1,2'
+
+    results = request.parse_response(json_response(
+        {'status': 1, 'request': 'token|CAPCHA_NOT_READY|ERROR_CAPTCHA_UNSOLVABLE'}
+    ))
+    assert results['0']['solution'].token == 'token'
+    assert isinstance(results['1'], SolutionNotReadyYet)
+    assert isinstance(results['2'], UnableToSolveError)
+
+
+def test_bulk_solution_request_ambiguous_answers(bulk_service):
+    tasks = [CaptchaTask(bulk_service, RecaptchaV2('key', 'url'), str(i)) for i in range(2)]
+    request = twocaptcha.BulkSolutionRequest(bulk_service)
+    request.prepare(tasks)
+
+    assert request.parse_response(json_response({'status': 1, 'request': 'a|b|c'})) == {}
+
+
+def test_bulk_polling_coalesces_concurrent_polls(bulk_service):
+    answers = {str(i): f'token{i}' for i in range(10)}
+    answers['5'] = 'CAPCHA_NOT_READY'
+    sent = mock_transport(bulk_service, bulk_handler(answers))
+
+    tasks = [CaptchaTask(bulk_service, RecaptchaV2('key', 'url'), str(i)) for i in range(10)]
+    results = {}
+
+    def poll(task):
+        try:
+            results[task.task_id] = task.get_result()[0].token
+        except SolutionNotReadyYet as exc:
+            results[task.task_id] = exc
+
+    threads = [threading.Thread(target=poll, args=(task,)) for task in tasks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sent) == 1
+    assert results['0'] == 'token0'
+    assert isinstance(results['5'], SolutionNotReadyYet)
+
+
+def test_bulk_polling_coalesces_concurrent_polls_async(bulk_service):
+    answers = {str(i): f'token{i}' for i in range(10)}
+    sent = mock_transport(bulk_service, bulk_handler(answers))
+
+    async def main():
+        tasks = [AsyncCaptchaTask(bulk_service, RecaptchaV2('key', 'url'), str(i))
+                 for i in range(10)]
+        return await asyncio.gather(*(task.get_result() for task in tasks))
+
+    results = asyncio.run(main())
+
+    assert len(sent) == 1
+    assert [result[0].token for result in results] == [f'token{i}' for i in range(10)]
+
+
+def test_bulk_polling_skips_structured_solutions(bulk_service):
+    sent = mock_transport(
+        bulk_service,
+        lambda request_data: {'status': 1, 'request': {'geetest_challenge': 'c',
+                                                       'geetest_validate': 'v',
+                                                       'geetest_seccode': 's'}}
+    )
+    task = CaptchaTask(bulk_service, GeeTest('url', 'key', 'challenge'), '1')
+
+    assert task.get_result()[0].challenge == 'c'
+    assert sent[0]['params']['action'] == 'get2'
+
+
+def test_bulk_polling_skips_solutions_with_extra_fields(bulk_service):
+    sent = mock_transport(
+        bulk_service,
+        lambda request_data: {'status': 1, 'request': 'token', 'price': '0.00299',
+                              'useragent': 'UA', 'respKey': 'key'}
+    )
+    task = CaptchaTask(bulk_service, HCaptcha('key', 'url'), '1')
+
+    solution, cost, extra = task.get_result()
+
+    assert solution.token == 'token'
+    assert cost == pytest.approx(0.00299)
+    assert extra == {'useragent': 'UA', 'respKey': 'key'}
+    assert sent[0]['params']['action'] == 'get2'
+
+
+def test_bulk_polling_can_be_skipped_async(bulk_service):
+    sent = mock_transport(bulk_service, lambda request_data: {'status': 1, 'request': 'token'})
+    task = AsyncCaptchaTask(bulk_service, RecaptchaV2('key', 'url'), '1')
+
+    solution = asyncio.run(bulk_service.get_task_result_async(task, bulk=False))[0]
+
+    assert solution.token == 'token'
+    assert sent[0]['params']['action'] == 'get2'
+
+
+@pytest.fixture()
+def scheduled_service():
+    service = twocaptcha.Service('test', shared_polling=True, max_concurrent_polls=2)
+    for settings in service.settings.values():
+        settings.polling_delay = 0.01
+        settings.polling_interval = 0.01
+        settings.solution_timeout = 5
+    return service
+
+
+def test_polling_scheduler_limits_concurrent_polls(scheduled_service):
+    polls = {}
+    in_flight = []
+    max_in_flight = []
+
+    async def make_request_async(request_data):
+        task_id = request_data['params']['id']
+        polls[task_id] = polls.get(task_id, 0) + 1
+        in_flight.append(task_id)
+        max_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.005)
+        in_flight.remove(task_id)
+        if polls[task_id] < 3:
+            return json_response({'status': 0, 'request': 'CAPCHA_NOT_READY'})
+        return json_response({'status': 1, 'request': f'token{task_id}'})
+
+    scheduled_service._transport._make_request_async = make_request_async
+
+    async def main():
+        tasks = [AsyncCaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), str(i))
+                 for i in range(20)]
+        return await asyncio.gather(*(task.wait() for task in tasks))
+
+    results = asyncio.run(main())
+
+    assert [result[0].token for result in results] == [f'token{i}' for i in range(20)]
+    assert all(count == 3 for count in polls.values())
+    assert max(max_in_flight) <= 2
+
+
+def test_polling_scheduler_timeout(scheduled_service):
+    async def make_request_async(request_data):
+        return json_response({'status': 0, 'request': 'CAPCHA_NOT_READY'})
+
+    scheduled_service._transport._make_request_async = make_request_async
+    for settings in scheduled_service.settings.values():
+        settings.solution_timeout = 0.05
+
+    task = AsyncCaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), '1')
+    with pytest.raises(SolutionWaitTimeout):
+        asyncio.run(task.wait())
+
+
+def test_polling_scheduler_drops_cancelled_waiters(scheduled_service):
+    sent = []
+
+    async def make_request_async(request_data):
+        sent.append(request_data)
+        return json_response({'status': 0, 'request': 'CAPCHA_NOT_READY'})
+
+    scheduled_service._transport._make_request_async = make_request_async
+    for settings in scheduled_service.settings.values():
+        settings.polling_delay = 0.05
+
+    async def main():
+        task = AsyncCaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), '1')
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(task.wait(), 0.01)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert not sent
+
+
+def test_solve_time_histogram():
+    histogram = SolveTimeHistogram(max_samples=100)
+    assert histogram.quantile(0.5) is None
+
+    for value in range(100):
+        histogram.add(value / 2)
+    assert histogram.quantile(0.3) == 15
+    assert histogram.quantile(0.9) == 45
+
+    histogram.add(10)
+    assert histogram.count == 50.5
+    assert SolveTimeHistogram.from_dict(histogram.to_dict()).quantile(0.9) == pytest.approx(44.95)
+
+
+def test_adaptive_polling_checkpoints_are_stable():
+    adaptive_polling = AdaptivePolling(SolveTimeStats(), 'test')
+    settings = twocaptcha.Service('test').settings[CaptchaType.IMAGE]
+
+    # every task is solved in 10 seconds and recorded as seen by polling at the checkpoints
+    for _ in range(1000):
+        previous_poll_time = poll_time = 0.0
+        for delay in adaptive_polling.get_delays(CaptchaType.IMAGE, settings):
+            poll_time += delay
+            if poll_time >= 10:
+                break
+            previous_poll_time = poll_time
+        adaptive_polling.record(CaptchaType.IMAGE,
+                                get_solve_time(0, previous_poll_time, poll_time))
+
+    histogram = adaptive_polling.stats.get('test:ImageCaptcha')
+    assert all(8 < histogram.quantile(q) < 12 for q in adaptive_polling.quantiles)
+
+
+def test_solve_time_stats_saved_in_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(stats_module, 'STATS_SAVE_INTERVAL', 0)
+    stats = SolveTimeStats(tmp_path / 'stats.json')
+    threads = []
+    monkeypatch.setattr(threading.Thread, 'start', lambda thread: threads.append(thread))
+
+    stats.record('key', 1)
+    stats.record('key', 2)  # a save is already scheduled
+    assert len(threads) == 1 and not (tmp_path / 'stats.json').exists()
+
+    threads[0].run()
+    assert SolveTimeStats(tmp_path / 'stats.json').get('key').count == 2
+
+
+def test_adaptive_polling_delays(tmp_path):
+    service = twocaptcha.Service('test', adaptive_polling=tmp_path / 'stats.json')
+    settings = service.settings[CaptchaType.RECAPTCHAV2]
+
+    delays = service.get_polling_delays(CaptchaType.RECAPTCHAV2)
+    assert [next(delays) for _ in range(3)] == [settings.polling_delay,
+                                                settings.polling_interval,
+                                                settings.polling_interval]
+
+    task = CaptchaTask(service, RecaptchaV2('key', 'url'), '1')
+    for value in range(100):
+        service.record_solve_time(task, 10 + value / 10)
+
+    delays = service.get_polling_delays(CaptchaType.RECAPTCHAV2)
+    assert [next(delays) for _ in range(5)] == [
+        13, 3, 3, max(settings.polling_interval, MIN_POLLING_INTERVAL),
+        max(settings.polling_interval, MIN_POLLING_INTERVAL)
+    ]
+
+    # statistics are saved on close and loaded by a new service (shared within the process)
+    service.close()
+    assert (tmp_path / 'stats.json').exists()
+    get_solve_time_stats(tmp_path / 'stats.json').load()
+    histogram = get_solve_time_stats(tmp_path / 'stats.json').get('twocaptcha:RecaptchaV2')
+    assert histogram.count == 100
+    assert histogram.quantile(0.9) == 19
+
+
+def test_adaptive_polling_records_solve_times(scheduled_service):
+    scheduled_service._adaptive_polling = twocaptcha.Service(
+        'test', adaptive_polling=True)._adaptive_polling
+
+    async def make_request_async(request_data):
+        return json_response({'status': 1, 'request': 'token'})
+
+    scheduled_service._transport._make_request_async = make_request_async
+
+    task = AsyncCaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), '1')
+    asyncio.run(task.wait())
+
+    histogram = scheduled_service._adaptive_polling.stats.get('twocaptcha:RecaptchaV2')
+    assert histogram.count == 1
+
+
+def test_polling_thread_limits_concurrent_polls(scheduled_service):
+    polls = {}
+    in_flight = []
+    max_in_flight = []
+    lock = threading.Lock()
+
+    def make_request(request_data):
+        task_id = request_data['params']['id']
+        with lock:
+            polls[task_id] = polls.get(task_id, 0) + 1
+            in_flight.append(task_id)
+            max_in_flight.append(len(in_flight))
+        time.sleep(0.005)
+        with lock:
+            in_flight.remove(task_id)
+        if polls[task_id] < 3:
+            return json_response({'status': 0, 'request': 'CAPCHA_NOT_READY'})
+        return json_response({'status': 1, 'request': f'token{task_id}'})
+
+    scheduled_service._transport._make_request = make_request
+
+    tasks = [CaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), str(i)) for i in range(20)]
+    results = {}
+    threads = [threading.Thread(target=lambda t=task: results.update({t.task_id: t.wait()}))
+               for task in tasks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {k: v[0].token for k, v in results.items()} == {str(i): f'token{i}' for i in range(20)}
+    assert all(task.is_done() for task in tasks)
+    assert all(count == 3 for count in polls.values())
+    assert max(max_in_flight) <= 2
+    scheduled_service.close()
+
+
+def test_polling_thread_polls_in_bulk():
+    service = twocaptcha.Service('test', bulk_polling=True, shared_polling=True)
+    for settings in service.settings.values():
+        settings.polling_delay = 0.05
+        settings.polling_interval = 0.01
+
+    answers = {str(i): f'token{i}' for i in range(30)}
+    sent = mock_transport(service, bulk_handler(answers))
+
+    tasks = [CaptchaTask(service, RecaptchaV2('key', 'url'), str(i)) for i in range(30)]
+    futures = [service._polling_thread.schedule(task) for task in tasks]
+
+    assert [future.result(5)[0].token for future in futures] == [f'token{i}' for i in range(30)]
+    assert all(task.is_done() for task in tasks)
+    assert len(sent) < 30
+    service.close()
+
+
+def test_polling_thread_polls_unknown_results_alone():
+    service = twocaptcha.Service('test', bulk_polling=True, shared_polling=True)
+    service._bulk_poller.window = 0.01
+    for settings in service.settings.values():
+        settings.polling_delay = 0.01
+
+    def handler(request_data):
+        if 'ids' in request_data['params']:
+            return {'status': 1, 'request': 'a|b|c'}  # results of the tasks are unknown
+        return {'status': 1, 'request': f"token{request_data['params']['id']}"}
+
+    sent = mock_transport(service, handler)
+    futures = [service._polling_thread.schedule(CaptchaTask(service, RecaptchaV2('key', 'url'),
+                                                            str(i)))
+               for i in range(2)]
+
+    assert [future.result(5)[0].token for future in futures] == ['token0', 'token1']
+    # each task is polled with one bulk request at most and then alone
+    bulk_polls = sum('ids' in request_data['params'] for request_data in sent)
+    assert bulk_polls <= 2 and len(sent) == bulk_polls + 2
+    service.close()
+
+
+def test_polling_thread_restarts_after_close(scheduled_service):
+    mock_transport(scheduled_service, lambda request_data: {'status': 1, 'request': 'token'})
+    polling_thread = scheduled_service._polling_thread
+
+    first = polling_thread.schedule(CaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), '1'))
+    thread = polling_thread._thread
+    polling_thread.close()
+    second = polling_thread.schedule(CaptchaTask(scheduled_service, RecaptchaV2('key', 'url'),
+                                                 '2'))
+
+    assert second.result(5)[0].token == 'token'
+    assert first.cancelled() and not thread.is_alive()
+    scheduled_service.close()
+
+
+def test_polling_thread_timeout(scheduled_service):
+    scheduled_service._transport._make_request = lambda request_data: json_response(
+        {'status': 0, 'request': 'CAPCHA_NOT_READY'}
+    )
+    for settings in scheduled_service.settings.values():
+        settings.solution_timeout = 0.05
+
+    task = CaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), '1')
+    with pytest.raises(SolutionWaitTimeout):
+        task.wait()
+    scheduled_service.close()
+
+
+def test_polling_thread_close_cancels_pending_tasks(scheduled_service):
+    for settings in scheduled_service.settings.values():
+        settings.polling_delay = 10
+
+    future = scheduled_service._polling_thread.schedule(
+        CaptchaTask(scheduled_service, RecaptchaV2('key', 'url'), '1')
+    )
+    scheduled_service.close()
+
+    assert future.cancelled()
+    assert scheduled_service._polling_thread.pending_count == 0
+
+
+def make_speculative_service(is_async=False, original_fails=False):
+    """
+    Returns a service resubmitting tasks after 0.05 seconds, task 1 is never solved
+    (fails once the duplicate is created if original_fails is True)
+    """
+
+    service = twocaptcha.Service('test', speculative_resubmit=True, speculative_max_per_minute=1)
+    service._speculation.get_threshold = lambda captcha_type: 0.05
+    for settings in service.settings.values():
+        settings.polling_delay = 0.01
+        settings.polling_interval = 0.01
+        settings.solution_timeout = 1
+
+    duplicate_polls = []
+
+    def handler(request_data):
+        if request_data['url'].endswith('in.php'):
+            return {'status': 1, 'request': '2'}
+        if request_data['params']['id'] == '2':
+            duplicate_polls.append(request_data)
+            if original_fails and len(duplicate_polls) < 3:
+                return {'status': 0, 'request': 'CAPCHA_NOT_READY'}
+            return {'status': 1, 'request': 'token2'}
+        if original_fails and duplicate_polls:
+            return {'status': 0, 'request': 'ERROR_CAPTCHA_UNSOLVABLE'}
+        return {'status': 0, 'request': 'CAPCHA_NOT_READY'}
+
+    sent = mock_transport(service, handler)
+    task_class = AsyncCaptchaTask if is_async else CaptchaTask
+    task = task_class(service, RecaptchaV2('key', 'url'), '1',
+                      create_args=(None, 'user-agent', None))
+    return service, task, sent
+
+
+def test_speculative_resubmission():
+    service, task, sent = make_speculative_service()
+
+    solution, _, _ = service.wait_for_solution(task)
+    assert solution.token == 'token2'
+    assert task.task_id == '2'
+    assert task.is_done()
+    assert [r for r in sent if r['url'].endswith('in.php')][0]['data']['userAgent'] == 'user-agent'
+
+    # the budget is exhausted, the task is not resubmitted anymore
+    task = CaptchaTask(service, RecaptchaV2('key', 'url'), '1')
+    with pytest.raises(SolutionWaitTimeout):
+        service.wait_for_solution(task)
+    assert len([r for r in sent if r['url'].endswith('in.php')]) == 1
+
+
+def test_speculative_resubmission_async():
+    service, task, sent = make_speculative_service(is_async=True)
+
+    solution, _, _ = asyncio.run(service.wait_for_solution_async(task))
+    assert solution.token == 'token2'
+    assert task.task_id == '2'
+    assert len([r for r in sent if r['url'].endswith('in.php')]) == 1
+
+
+@pytest.mark.parametrize('is_async', [False, True])
+def test_speculative_resubmission_original_fails(is_async):
+    service, task, sent = make_speculative_service(is_async=is_async, original_fails=True)
+
+    if is_async:
+        solution, _, _ = asyncio.run(service.wait_for_solution_async(task))
+    else:
+        solution, _, _ = service.wait_for_solution(task)
+    assert solution.token == 'token2'
+    assert task.task_id == '2'
+    assert len([r for r in sent if r['url'].endswith('in.php')]) == 1
+
+
+def test_speculative_resubmission_with_shared_polling():
+    with pytest.raises(ValueError):
+        twocaptcha.Service('test', speculative_resubmit=True, shared_polling=True)
+
+
+def test_speculative_resubmission_threshold():
+    service = twocaptcha.Service('test', speculative_resubmit=0.5, speculative_max_per_minute=2)
+    speculation = service._speculation
+    task = CaptchaTask(service, RecaptchaV2('key', 'url'), '1')
+
+    assert speculation.get_threshold(CaptchaType.RECAPTCHAV2) is None
+    assert not speculation.should_resubmit(CaptchaType.RECAPTCHAV2, 1000)
+
+    for value in range(20):
+        service.record_solve_time(task, 10 + value)
+    assert speculation.get_threshold(CaptchaType.RECAPTCHAV2) == 20
+    assert not speculation.should_resubmit(CaptchaType.RECAPTCHAV2, 15)
+    assert speculation.should_resubmit(CaptchaType.RECAPTCHAV2, 25)
+    assert speculation.should_resubmit(CaptchaType.RECAPTCHAV2, 25)
+    assert not speculation.should_resubmit(CaptchaType.RECAPTCHAV2, 25)
@@ -0,0 +1,200 @@
+# -*- coding: UTF-8 -*-
+"""
+Rate limiter tests
+"""
+
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from multicaps._service import twocaptcha
+from multicaps._service.circuit_breaker import CircuitBreaker
+from multicaps._service.rate_limit import TokenBucket, BusyGate, RATE_LIMIT_DECREASE
+from multicaps.captcha import RecaptchaV2
+from multicaps.exceptions import (CircuitOpenError, NetworkError, ServiceTooBusy,
+                                  TooManyRequestsError)
+
+
+def test_token_bucket_queues_callers():
+    bucket = TokenBucket(max_rate=10, burst=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    delays = [bucket.reserve() for _ in range(3)]
+    assert delays == sorted(delays)
+    assert delays[0] == pytest.approx(0.1, abs=0.01)
+    assert delays[2] == pytest.approx(0.3, abs=0.01)
+
+
+def test_token_bucket_throttle_and_recovery():
+    bucket = TokenBucket(max_rate=100)
+
+    bucket.throttle()
+    assert bucket.rate == pytest.approx(100 * RATE_LIMIT_DECREASE, rel=0.01)
+    assert bucket.reserve() > 0
+
+    with mock.patch('time.monotonic', return_value=time.monotonic() + 10):
+        assert bucket.rate == pytest.approx(100 * RATE_LIMIT_DECREASE + 10, rel=0.01)
+    with mock.patch('time.monotonic', return_value=time.monotonic() + 1000):
+        assert bucket.rate == 100
+
+
+def make_service(api_key, handler):
+    service = twocaptcha.Service(api_key, rate_limit=(2, 50))
+    sent = []
+
+    def make_request(request_data):
+        sent.append((time.monotonic(), request_data.get('params', {}).get('action')))
+        return handler(request_data)
+
+    async def make_request_async(request_data):
+        return make_request(request_data)
+
+    service._transport._make_request = make_request
+    service._transport._make_request_async = make_request_async
+    return service, sent
+
+
+def test_service_rate_limit():
+    def handler(request_data):
+        response = mock.Mock()
+        if request_data.get('params', {}).get('action') == 'getbalance':
+            response.json = lambda: {'status': 0, 'request': 'MAX_USER_TURN'}
+        else:
+            response.json = lambda: {'status': 1, 'request': '10.0'}
+        return response
+
+    service, sent = make_service('rate-limit-test', handler)
+    # the limiter is shared by services with the same API key
+    assert service._rate_limiter is twocaptcha.Service(
+        'rate-limit-test', rate_limit=True)._rate_limiter
+    assert service._rate_limiter is not twocaptcha.Service(
+        'other-key', rate_limit=True)._rate_limiter
+
+    with pytest.raises(TooManyRequestsError):
+        service.get_balance()
+    assert service._rate_limiter.poll_bucket.rate < 50
+    assert service._rate_limiter.create_bucket.rate == 2
+
+
+def test_service_rate_limit_update():
+    limiter = twocaptcha.Service('rate-limit-test3', rate_limit=(2, 50))._rate_limiter
+    limiter.throttle(is_task_creation=False)
+
+    # explicit limits replace the limits of the shared limiter, True keeps them
+    assert twocaptcha.Service('rate-limit-test3', rate_limit=True)._rate_limiter.rates == (2, 50)
+    assert twocaptcha.Service('rate-limit-test3',
+                              rate_limit=(4, 20))._rate_limiter is limiter
+    assert limiter.rates == (4, 20) and limiter.create_bucket.burst == 4
+    assert limiter.create_bucket.rate == pytest.approx(4, rel=0.01)
+    assert limiter.poll_bucket.rate == pytest.approx(20 * RATE_LIMIT_DECREASE, rel=0.01)
+
+
+def test_service_rate_limit_with_open_circuit():
+    def handler(request_data):
+        raise NetworkError('Timeout')
+
+    service, sent = make_service('rate-limit-test4', handler)
+    service._circuit_breaker = CircuitBreaker(min_calls=1, failure_rate=0.5)
+    service._transport.settings['max_retries'] = 0
+    with pytest.raises(NetworkError):
+        service.get_balance()
+
+    # failing fast doesn't take tokens of the rate limiter
+    tokens = service._rate_limiter.poll_bucket._tokens
+    for _ in range(10):
+        with pytest.raises(CircuitOpenError):
+            service.get_balance()
+    assert service._rate_limiter.poll_bucket._tokens == pytest.approx(tokens, abs=0.1)
+
+
+def test_service_rate_limit_of_task_creation():
+    def handler(request_data):
+        response = mock.Mock()
+        response.json = lambda: {'status': 1, 'request': '1'}
+        return response
+
+    service, sent = make_service('rate-limit-test2', handler)
+
+    async def create_tasks():
+        return await asyncio.gather(*(
+            service.create_task_async(RecaptchaV2('key', 'url')) for _ in range(4)
+        ))
+
+    asyncio.run(create_tasks())
+    times = [sent_time for sent_time, _ in sent]
+    # 2 tasks at once (burst), then 2 per second
+    assert times[3] - times[0] == pytest.approx(1.0, abs=0.15)
+
+
+def test_busy_gate_backoff():
+    gate = BusyGate(min_backoff=0.05, max_backoff=0.15, drain_interval=0.01)
+    assert gate.reserve() == 0
+
+    gate.on_busy()
+    assert gate.is_paused
+    delays = [gate.reserve() for _ in range(3)]
+    assert delays[0] == pytest.approx(0.05, abs=0.01)
+    assert delays[2] - delays[0] == pytest.approx(0.02, abs=0.001)
+
+    # responses to requests sent before the pause don't extend it
+    gate.on_busy()
+    assert gate.backoff == 0.05
+
+    time.sleep(0.06)
+    gate.on_busy()
+    assert gate.backoff == 0.1
+    time.sleep(0.11)
+    gate.on_busy()
+    assert gate.backoff == 0.15
+
+    gate.on_success()
+    assert gate.backoff == 0.05
+
+
+def test_service_busy_backoff():
+    responses = ['ERROR_NO_SLOT_AVAILABLE', 'ERROR_NO_SLOT_AVAILABLE', '1', '2', '3']
+
+    def handler(request_data):
+        response = mock.Mock()
+        answer = responses.pop(0)
+        response.json = lambda: {'status': int(answer.isdigit()), 'request': answer}
+        return response
+
+    service, sent = make_service('busy-test', handler)
+    service._busy_gate = BusyGate(min_backoff=0.05, drain_interval=0.02)
+
+    async def create_tasks():
+        return await asyncio.gather(*(
+            service.create_task_async(RecaptchaV2('key', 'url')) for _ in range(3)
+        ))
+
+    start_time = time.monotonic()
+    tasks = asyncio.run(create_tasks())
+
+    assert sorted(task.task_id for task in tasks) == ['1', '2', '3']
+    # the first busy response pauses all callers, the next one extends the pause
+    assert time.monotonic() - start_time >= 0.15
+    assert len(sent) == 5
+
+
+def test_service_busy_max_wait():
+    def handler(request_data):
+        response = mock.Mock()
+        response.json = lambda: {'status': 0, 'request': 'ERROR_NO_SLOT_AVAILABLE'}
+        return response
+
+    service, sent = make_service('busy-test2', handler)
+    service._busy_gate = BusyGate(min_backoff=0.05)
+    service.busy_max_wait = 0.1
+
+    with pytest.raises(ServiceTooBusy):
+        service.create_task(RecaptchaV2('key', 'url'))
+    assert 1 <= len(sent) <= 2
+
+    # no backoff at all
+    service._busy_gate = None
+    with pytest.raises(ServiceTooBusy):
+        service.create_task(RecaptchaV2('key', 'url'))
@@ -0,0 +1,212 @@
+# -*- coding: UTF-8 -*-
+"""
+RoutingSolver tests
+"""
+
+import asyncio
+import datetime
+from unittest import mock
+
+import pytest
+
+from multicaps import RoutingSolver, AsyncRoutingSolver, CaptchaSolvingService
+from multicaps.captcha import RecaptchaV2, HCaptcha, CaptchaType
+from multicaps.exceptions import NetworkError, UnableToSolveError
+from multicaps.router import RouterStats, ServiceStats, fastest, cheapest, most_reliable
+
+SERVICES = [
+    (CaptchaSolvingService.TWOCAPTCHA, 'key1'),
+    (CaptchaSolvingService.ANTI_CAPTCHA, 'key2'),
+    (CaptchaSolvingService.DEATHBYCAPTCHA, 'user:password'),
+]
+
+
+def make_solved(solve_time, cost=None, is_cached=False):
+    start_time = datetime.datetime(2024, 1, 1)
+    return mock.Mock(start_time=start_time,
+                     end_time=start_time + datetime.timedelta(seconds=solve_time),
+                     cost=cost, is_cached=is_cached)
+
+
+def mock_service(solver, result):
+    """ Replaces solving functions of the service with mocks returning or raising result """
+
+    service = solver._service
+    side_effect = result if isinstance(result, Exception) else None
+    service.solve_captcha = mock.Mock(return_value=result, side_effect=side_effect)
+    service.solve_captcha_async = mock.AsyncMock(return_value=result, side_effect=side_effect)
+    return service
+
+
+def get_calls(service):
+    return service.solve_captcha.call_count + service.solve_captcha_async.call_count
+
+
+def make_stats(solve_times=(), cost=None, errors=0):
+    stats = ServiceStats()
+    for solve_time in solve_times:
+        stats.add_success(solve_time, cost)
+    for _ in range(errors):
+        stats.add_error(NetworkError())
+    return stats
+
+
+def test_service_stats():
+    stats = make_stats([10] * 8 + [30, 50], cost=0.002, errors=2)
+    stats.add_error(UnableToSolveError())
+
+    assert stats.count == 13
+    assert stats.p50 == pytest.approx(10.625)
+    assert stats.p95 == pytest.approx(50.5)
+    assert stats.cost == pytest.approx(0.002)
+    assert stats.error_rate == pytest.approx(3 / 13)
+    assert stats.errors == {'NetworkError': 2, 'UnableToSolveError': 1}
+    assert stats.cost_per_success == pytest.approx(0.002 / (10 / 13))
+    assert stats.to_dict()['errors'] == {'NetworkError': 2, 'UnableToSolveError': 1}
+
+    empty = ServiceStats()
+    assert empty.p95 is None and empty.cost is None and empty.error_rate == 0
+    assert empty.solve_time() == empty.cost_per_success == float('inf')
+
+
+def test_service_stats_window():
+    stats = ServiceStats(window=10)
+    for _ in range(10):
+        stats.add_error(NetworkError())
+    for _ in range(10):
+        stats.add_success(5)
+    assert stats.count == 10
+    assert stats.error_rate == 0
+
+
+def test_objectives():
+    slow_cheap = make_stats([60] * 10, cost=0.001)
+    fast_expensive = make_stats([20] * 10, cost=0.003)
+    fast_unreliable = make_stats([20] * 10, cost=0.002, errors=10)
+
+    ranked = sorted([slow_cheap, fast_expensive, fast_unreliable], key=fastest())
+    assert ranked[-1] is slow_cheap
+
+    ranked = sorted([slow_cheap, fast_expensive, fast_unreliable], key=cheapest())
+    assert ranked == [slow_cheap, fast_expensive, fast_unreliable]
+
+    ranked = sorted([slow_cheap, fast_expensive, fast_unreliable], key=cheapest(40))
+    assert ranked == [fast_expensive, fast_unreliable, slow_cheap]
+
+    ranked = sorted([slow_cheap, fast_expensive, fast_unreliable],
+                    key=cheapest(40, max_error_rate=0.1))
+    assert ranked[0] is fast_expensive
+
+    # nobody meets the limit, the fastest one is preferred
+    ranked = sorted([slow_cheap, fast_expensive], key=cheapest(10))
+    assert ranked[0] is fast_expensive
+
+    ranked = sorted([fast_unreliable, slow_cheap], key=most_reliable())
+    assert ranked[0] is slow_cheap
+
+
+@pytest.fixture(params=[RoutingSolver, AsyncRoutingSolver])
+def routing_solver(request):
+    return request.param(SERVICES, objective=cheapest(40), exploration=0, min_samples=3)
+
+
+def solve(solver, captcha):
+    if isinstance(solver, AsyncRoutingSolver):
+        return asyncio.run(solver.solve_captcha(captcha))
+    return solver.solve_captcha(captcha)
+
+
+def test_routing_by_objective(routing_solver):
+    results = [make_solved(60, 0.001), make_solved(20, 0.003), make_solved(20, 0.002)]
+    services = [mock_service(solver, result)
+                for solver, result in zip(routing_solver.solvers, results)]
+
+    # warming up: every service is tried min_samples times first
+    for _ in range(9):
+        solve(routing_solver, RecaptchaV2('key', 'url'))
+    assert [get_calls(service) for service in services] == [3, 3, 3]
+
+    for _ in range(5):
+        assert solve(routing_solver, RecaptchaV2('key', 'url')) is results[2]
+    assert get_calls(services[2]) == 8
+
+    stats = routing_solver.stats.to_dict()
+    assert stats['RecaptchaV2']['deathbycaptcha.com']['count'] == 8
+    assert stats['RecaptchaV2']['2captcha.com']['p95'] == pytest.approx(60.95)
+
+    # statistics are kept by CAPTCHA type
+    solve(routing_solver, HCaptcha('key', 'url'))
+    assert routing_solver.stats.get('2captcha.com', CaptchaType.HCAPTCHA).count == 1
+
+
+def test_routing_records_errors(routing_solver):
+    first, second, third = (mock_service(solver, result) for solver, result in zip(
+        routing_solver.solvers, [NetworkError(), UnableToSolveError(), make_solved(30, 0.002)]
+    ))
+
+    # NetworkError fails over to the next service, UnableToSolveError is raised
+    with pytest.raises(UnableToSolveError):
+        solve(routing_solver, RecaptchaV2('key', 'url'))
+    assert get_calls(first) == get_calls(second) == 1 and get_calls(third) == 0
+
+    stats = routing_solver.stats
+    assert stats.get('2captcha.com', CaptchaType.RECAPTCHAV2).errors == {'NetworkError': 1}
+    assert stats.get('anti-captcha.com', CaptchaType.RECAPTCHAV2).error_rate == 1
+
+    for _ in range(5):
+        try:
+            solve(routing_solver, RecaptchaV2('key', 'url'))
+        except UnableToSolveError:
+            pass
+
+    # services failing all the time are not preferred anymore
+    calls = get_calls(third)
+    assert get_calls(second) == 3
+    solve(routing_solver, RecaptchaV2('key', 'url'))
+    assert get_calls(third) == calls + 1
+    assert get_calls(second) == 3
+
+
+def test_routing_skips_cached_solutions(routing_solver):
+    mock_service(routing_solver.solvers[0], make_solved(0, 0.0, is_cached=True))
+
+    solve(routing_solver, RecaptchaV2('key', 'url'))
+    assert routing_solver.stats.get('2captcha.com', CaptchaType.RECAPTCHAV2).count == 0
+
+
+def test_routing_exploration():
+    solver = RoutingSolver(SERVICES[:2], exploration=0.5, min_samples=1)
+    first = mock_service(solver.solvers[0], make_solved(10))
+    second = mock_service(solver.solvers[1], make_solved(50))
+
+    for _ in range(200):
+        solver.solve_recaptcha_v2('key', 'url')
+    assert 40 < get_calls(second) < 160
+    assert get_calls(first) + get_calls(second) == 200
+
+
+def test_routing_shared_stats():
+    stats = RouterStats()
+    solver1 = RoutingSolver(SERVICES[:2], stats=stats)
+    solver2 = RoutingSolver(SERVICES[:2], stats=stats)
+    mock_service(solver1.solvers[0], make_solved(10))
+    solver1.solve_recaptcha_v2('key', 'url')
+    assert solver2.stats.get('2captcha.com', CaptchaType.RECAPTCHAV2).count == 1
+
+
+def test_routing_stats_by_account():
+    solver = RoutingSolver([(CaptchaSolvingService.TWOCAPTCHA, 'key1'),
+                            (CaptchaSolvingService.TWOCAPTCHA, 'key2'),
+                            (CaptchaSolvingService.ANTI_CAPTCHA, 'key3')],
+                           exploration=0, min_samples=1)
+    slow = mock_service(solver.solvers[0], make_solved(50))
+    fast = mock_service(solver.solvers[1], make_solved(10))
+    mock_service(solver.solvers[2], make_solved(30))
+
+    for _ in range(5):
+        solver.solve_recaptcha_v2('key', 'url')
+    assert get_calls(slow) == 1 and get_calls(fast) == 3
+
+    names = list(solver.stats.to_dict()['RecaptchaV2'])
+    assert len(names) == 3 and 'anti-captcha.com' in names
+    assert all(name.startswith('2captcha.com#') for name in names if name != 'anti-captcha.com')
@@ -12,6 +12,8 @@ import pytest
 
 from multicaps._captcha import CaptchaType
 from multicaps._service import SOLVING_SERVICE
+from multicaps._service.dispatch import get_dispatch_table
+from multicaps.exceptions import UnicapsException
 
 from data.data import (BASE_TASK_REQUEST_DATA, INPUT_TEST_DATA_FOR_TASK_PREPARE_FUNC,
                        OUTPUT_TEST_DATA_FOR_TASK_PREPARE_FUNC,
@@ -99,6 +101,26 @@ def test_if_service_class_is_present(service_module):
     check_if_class_is_present(service_module, 'Service')
 
 
+def test_dispatch_table(service_module):
+    """ Checks the dispatch table of the service module """
+
+    table = get_dispatch_table(service_module)
+    assert get_dispatch_table(service_module) is table
+    service_name = service_module.__name__.rsplit('.', 1)[-1]
+    assert table.supported_captcha_set == set(SERVICE_MODULES_FOR_TEST[service_name])
+    assert table.supported_captchas == tuple(
+        captcha_type for captcha_type in CaptchaType if captcha_type in table.supported_captcha_set
+    )
+    for req in BASE_REQUESTS:
+        assert table.get_request_class(req) is getattr(service_module, req + 'Request')
+    assert table.bulk_request_class is getattr(service_module, 'BulkSolutionRequest', None)
+
+    with pytest.raises(TypeError):
+        table.request_classes['Unknown'] = object
+    with pytest.raises(UnicapsException):
+        table.get_request_class('Unknown')
+
+
 @pytest.mark.parametrize("req", BASE_REQUESTS)
 def test_if_base_request_is_present(service_module, req):
     """ Checks if all of the base requests are present in the module file """
@@ -0,0 +1,306 @@
+# -*- coding: UTF-8 -*-
+"""
+HTTP transport tests
+"""
+
+import asyncio
+import base64
+import json
+import os
+import time
+import tracemalloc
+
+import httpx
+import pytest
+
+from multicaps import CaptchaSolver, CaptchaSolvingService
+from multicaps._service import anti_captcha, twocaptcha, deathbycaptcha, rucaptcha
+from multicaps._transport.http_transport import (StandardHTTPTransport, HTTPRequestJSON,
+                                                 RetryPolicy, get_ssl_context,
+                                                 HTTP_MAX_CONNECTIONS,
+                                                 HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                                                 HTTP_KEEPALIVE_EXPIRY, Base64JSONBody,
+                                                 HTTP_BASE64_STREAM_MIN_SIZE,
+                                                 HTTP_BASE64_CHUNK_SIZE)
+from multicaps.captcha import ImageCaptcha
+from multicaps.exceptions import NetworkError
+
+
+class PollRequest(HTTPRequestJSON):
+    prepare_count = 0
+
+    def prepare(self):  # pylint: disable=arguments-differ
+        PollRequest.prepare_count += 1
+        request = super().prepare()
+        request.update(method='POST', url='http://service.test/res', data={'image': 'x' * 100})
+        return request
+
+
+class CreateRequest(PollRequest):
+    IDEMPOTENT = False
+
+
+def make_transport(responses, is_async=False):
+    """ Returns a transport replying with given responses (or raising given exceptions) """
+
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    transport = StandardHTTPTransport()
+    transport._get_retry_policy = lambda: RetryPolicy(backoff_factor=0.001, budget=5)
+    if is_async:
+        transport.session_async = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    else:
+        transport.session = httpx.Client(transport=httpx.MockTransport(handler))
+    return transport, sent
+
+
+def test_retry_idempotent_request():
+    PollRequest.prepare_count = 0
+    transport, sent = make_transport([
+        httpx.Response(502),
+        httpx.ReadTimeout('timeout'),
+        httpx.Response(200, json={'status': 1})
+    ])
+
+    assert transport.make_request(PollRequest(None)) == {'status': 1}
+    assert len(sent) == 3
+    assert PollRequest.prepare_count == 1
+    assert sent[0].content == sent[2].content
+
+
+def test_retry_idempotent_request_async():
+    transport, sent = make_transport([
+        httpx.Response(503),
+        httpx.ConnectError('refused'),
+        httpx.Response(200, json={'status': 1})
+    ], is_async=True)
+
+    assert asyncio.run(transport.make_request_async(PollRequest(None))) == {'status': 1}
+    assert len(sent) == 3
+
+
+@pytest.mark.parametrize('error', [httpx.Response(502), httpx.ReadTimeout('timeout')])
+def test_no_retry_of_task_creation_after_sending(error):
+    transport, sent = make_transport([error, httpx.Response(200, json={'status': 1})])
+
+    with pytest.raises(NetworkError):
+        transport.make_request(CreateRequest(None))
+    assert len(sent) == 1
+
+
+@pytest.mark.parametrize('error', [httpx.Response(429), httpx.ConnectError('refused')])
+def test_retry_of_task_creation_before_sending(error):
+    transport, sent = make_transport([error, httpx.Response(200, json={'status': 1})])
+
+    assert transport.make_request(CreateRequest(None)) == {'status': 1}
+    assert len(sent) == 2
+
+
+def test_retry_max_retries():
+    transport, sent = make_transport([httpx.Response(500)] * 10)
+    transport._get_retry_policy = lambda: RetryPolicy(max_retries=2, backoff_factor=0.001)
+
+    with pytest.raises(NetworkError):
+        transport.make_request(PollRequest(None))
+    assert len(sent) == 3
+
+
+def test_retry_unhandled_http_errors():
+    transport, sent = make_transport([httpx.Response(503), httpx.Response(503, json={})])
+    transport.settings['handle_http_errors'] = False
+    transport._get_retry_policy = lambda: RetryPolicy(max_retries=1, backoff_factor=0.001)
+
+    assert transport.make_request(PollRequest(None)) == {}
+    assert len(sent) == 2
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(backoff_factor=1, max_backoff=4, budget=10)
+    error = httpx.ReadTimeout('timeout')
+    start_time = time.monotonic()
+
+    assert all(0 <= policy.get_delay(attempt, start_time, True, error) <= 4
+               for attempt in range(5))
+    assert policy.get_delay(5, start_time, True, error) is None
+    assert policy.get_delay(0, start_time, True, httpx.Response(503, headers={
+        'Retry-After': '7'})) == 7
+    # doesn't fit into the retry budget
+    assert policy.get_delay(0, start_time, True, httpx.Response(503, headers={
+        'Retry-After': '70'})) is None
+    assert policy.get_delay(0, start_time, True, httpx.Response(400)) is None
+    assert policy.get_delay(0, start_time, True, httpx.Response(503, headers={
+        'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0
+
+
+def test_clients_created_on_first_use():
+    transport = StandardHTTPTransport()
+    assert transport._session is None and transport._session_async is None
+
+    # nothing to close
+    transport.close()
+    asyncio.run(transport.close_async())
+    assert transport._session is None and transport._session_async is None
+
+    session = transport.session
+    assert transport.session is session
+    assert transport._session_async is None
+
+    transport.close()
+    assert transport._session is None
+    assert session.is_closed
+
+
+def test_clients_share_ssl_context():
+    transport1, transport2 = StandardHTTPTransport(), StandardHTTPTransport()
+    assert transport1._get_client_kwargs()['verify'] is get_ssl_context()
+    assert transport2._get_client_kwargs()['verify'] is get_ssl_context()
+
+    async def run():
+        session = transport1.session_async
+        assert transport1._session is None
+        await transport1.close_async()
+        return session
+
+    assert asyncio.run(run()).is_closed
+    assert transport1._session_async is None
+
+
+def test_http2_and_pool_limits():
+    service = twocaptcha.Service('key', max_connections=5, max_keepalive_connections=2,
+                                 keepalive_expiry=30)
+    kwargs = service._transport._get_client_kwargs()
+    assert kwargs['http2'] is True
+    assert kwargs['limits'] == httpx.Limits(max_connections=5, max_keepalive_connections=2,
+                                            keepalive_expiry=30)
+    assert not service._transport.session.is_closed  # h2 is installed with httpx[http2]
+
+    # HTTP/2 is on by default for HTTPS services only
+    assert deathbycaptcha.Service('user:password')._transport.settings['http2'] is False
+    assert twocaptcha.Service('key', http2=False)._transport.settings['http2'] is False
+    assert StandardHTTPTransport()._get_client_kwargs()['limits'] == httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+    service.close()
+
+
+def test_solver_passes_http_settings():
+    solver = CaptchaSolver(CaptchaSolvingService.ANTI_CAPTCHA, 'key', http2=False,
+                           max_connections=7)
+    settings = solver._service._transport.settings
+    assert settings['http2'] is False and settings['max_connections'] == 7
+    solver.close()
+
+
+def test_clients_shared_by_host():
+    services = [twocaptcha.Service(f'key{i}') for i in range(3)]
+    other_host = rucaptcha.Service('key')
+    other_settings = twocaptcha.Service('key', max_connections=5)
+
+    session = services[0]._transport.session
+    assert all(service._transport.session is session for service in services)
+    assert other_host._transport.session is not session
+    assert other_settings._transport.session is not session
+
+    # the client is closed with the last service using it
+    services[0].close()
+    services[1].close()
+    assert not session.is_closed
+    services[2].close()
+    assert session.is_closed
+    assert twocaptcha.Service('key')._transport.session is not session
+
+    other_host.close()
+    other_settings.close()
+
+
+def test_async_clients_shared_by_event_loop():
+    services = [twocaptcha.Service(f'key{i}') for i in range(2)]
+
+    async def get_sessions():
+        return [service._transport.session_async for service in services]
+
+    first_sessions = asyncio.run(get_sessions())
+    assert first_sessions[0] is first_sessions[1]
+
+    # the clients of a closed event loop are not reused
+    for service in services:
+        service._transport._session_async = None
+    second_sessions = asyncio.run(get_sessions())
+    assert second_sessions[0] is second_sessions[1]
+    assert second_sessions[0] is not first_sessions[0]
+
+    async def close():
+        for service in services:
+            await service.close_async()
+
+    asyncio.run(close())
+    assert second_sessions[0].is_closed
+
+
+def test_base64_json_body():
+    content = bytes(range(256)) * 1000 + b'12'
+    data = {'clientKey': 'key', 'task': {'type': 'ImageToTextTask', 'body': '', 'case': True}}
+    body = Base64JSONBody(data, ('task', 'body'), content, chunk_size=1000)
+
+    expected = dict(data, task=dict(data['task'], body=base64.b64encode(content).decode()))
+    sent = b''.join(body)
+    assert json.loads(sent) == expected
+    assert len(body) == len(sent) == int(body.headers['Content-Length'])
+    assert b''.join(body) == sent  # the body can be sent again
+    assert data['task']['body'] == ''  # the data isn't changed
+
+
+def test_base64_json_body_sent():
+    image = ImageCaptcha(b'\x89PNG\r\n\x1a\n' + bytes(HTTP_BASE64_STREAM_MIN_SIZE))
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200, json={'errorId': 0, 'taskId': 1})
+
+    service = anti_captcha.Service('key')
+    service._transport.session = httpx.Client(transport=httpx.MockTransport(handler))
+    service._transport.session_async = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    service.create_task(image)
+    asyncio.run(service.create_task_async(image))
+    for request in sent:
+        assert request.headers['Content-Length'] == str(len(request.content))
+        assert json.loads(request.content)['task']['body'] == image.get_image_base64().decode()
+
+
+def test_base64_json_body_memory():
+    """ Only a chunk of base64 is in memory while the body is sent """
+
+    image = ImageCaptcha(b'\x89PNG\r\n\x1a\n' + os.urandom(2 * 1024 * 1024))
+    request = anti_captcha.ImageCaptchaTaskRequest(anti_captcha.Service('key'))
+
+    def send(request_data):
+        if 'content' in request_data:
+            return sum(len(chunk) for chunk in request_data['content'])
+        return len(json.dumps(request_data['json']).encode())
+
+    def get_peak_memory():
+        tracemalloc.start()
+        try:
+            size = send(request.prepare(image, None, None, None))
+            return size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    size, peak = get_peak_memory()
+    assert size > len(image.get_image_bytes()) * 4 / 3
+    assert peak < 4 * HTTP_BASE64_CHUNK_SIZE
+
+    request.BASE64_STREAM_MIN_SIZE = None
+    _, peak_in_memory = get_peak_memory()
+    assert peak_in_memory > 2 * size